@@ -3,6 +3,15 @@ ASGI config for DDS project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live update stream of the operations list (``/api/live/``, Server-Sent
+Events) is served only through this entry point, e.g.::
+
+    uvicorn DDS.asgi:application --workers 2
+
+Each worker process runs a single broadcaster that polls the change log and
+fans events out to all open pages. Under WSGI the stream answers 204 and
+the page works without live updates.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -43,12 +43,20 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Статика из STATIC_ROOT: файлы с хэшем в имени - с кэшированием на год,
+    # сжатые копии (.gz, .br) - по Accept-Encoding
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Текущая организация запроса: заголовок X-Organization, выбор на сайте,
+    # поддомен или CASH_FLOW_DEFAULT_ORGANIZATION
+    'cash_flow.tenancy.OrganizationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Профилирование запросов по ?_profile=1 (только при CASH_FLOW_PROFILING_ENABLED)
+    'cash_flow.profiling.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'DDS.urls'
@@ -58,16 +66,26 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Шаблоны приложения находит загрузчик app_directories, поэтому здесь
+        # остаются только глобальные каталоги - без повторного перебора
+        # cash_flow/templates при каждом поиске шаблона
         'DIRS': [
             os.path.join(BASE_DIR, 'templates'),  # Для глобальных шаблонов
-            os.path.join(BASE_DIR, 'cash_flow', 'templates'),  # Для шаблонов приложения
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cash_flow.tenancy.organizations_context',
+            ],
+            # Скомпилированные шаблоны кэшируются в памяти процесса
+            # (в режиме разработки кэш сбрасывается автоперезагрузкой)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -87,6 +105,44 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# При запуске нескольких процессов нужен общий бэкенд (Redis, Memcached),
+# иначе версии справочников для кэша фрагментов не будут согласованы
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dds-default',
+    }
+}
+
+# Время жизни кэшированных фрагментов шаблонов (секунды)
+CASH_FLOW_FRAGMENT_CACHE_TIMEOUT = 600
+
+# Аналитический движок в памяти для отчетов (требуется numpy)
+CASH_FLOW_ANALYTICS_ENABLED = False
+
+# Как часто движок проверяет изменения операций (секунды)
+CASH_FLOW_ANALYTICS_REFRESH_SECONDS = 5
+
+# Как часто поток изменений страницы операций опрашивает журнал (секунды)
+CASH_FLOW_LIVE_POLL_SECONDS = 1
+
+# Сколько последних месяцев держать в горячих таблицах: закрытые месяцы
+# старше переносит в архив команда archive_cashflows
+CASH_FLOW_ARCHIVE_MONTHS = 24
+
+# Профилирование отдельных запросов сотрудников (?_profile=1): профили
+# сохраняются в CASH_FLOW_PROFILE_DIR, хранятся последние CASH_FLOW_PROFILE_KEEP
+CASH_FLOW_PROFILING_ENABLED = False
+CASH_FLOW_PROFILE_DIR = BASE_DIR / 'profiles'
+CASH_FLOW_PROFILE_KEEP = 50
+
+# Код организации, если запрос не указывает ее иначе
+CASH_FLOW_DEFAULT_ORGANIZATION = 'main'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -123,6 +179,19 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic добавляет к именам файлов хэш содержимого и сохраняет рядом
+# сжатые gzip и brotli копии; {% static %} выдает имена с хэшем
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
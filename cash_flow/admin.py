@@ -1,3 +1,381 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 
-# Register your models here.
+from . import periods, read_model, recurring, services, typeahead
+from .forms import BudgetForm, OrganizationChoicesMixin
+from .models import (
+    ArchivedCashFlow, Budget, CashFlow, CashFlowRow, Status, Type, Category, SubCategory,
+    BalanceCheckpoint, ClosedPeriod, PeriodSnapshot, ChangeLogEntry, RecurringOperation, Organization,
+)
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Пагинатор с ограниченным подсчетом строк.
+
+    Полный COUNT(*) по миллионам операций дорог; считаем не дальше CAP строк,
+    дальше сужать выборку предлагается датой (date_hierarchy).
+    """
+    CAP = 100000
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by()[:self.CAP].count()
+
+
+# ======================== ОРГАНИЗАЦИИ ========================
+@admin.register(Organization)
+class OrganizationAdmin(admin.ModelAdmin):
+    """
+    Организации. Остальные разделы админки показывают данные текущей
+    организации - выбранной на сайте или по поддомену.
+    """
+    list_display = ['name', 'slug', 'created_at']
+    search_fields = ['name', 'slug']
+
+
+# ======================== СПРАВОЧНИКИ ========================
+class DictionaryAdmin(admin.ModelAdmin):
+    """
+    Справочник в админке.
+
+    Поиск (и автодополнение в операциях) - по префиксу названия через
+    уникальный индекс LOWER(name), а не LIKE '%...%' по всей таблице.
+    Удаление - мягкое, через services.delete_dictionary, как на сайте:
+    записи и их операции попадают в корзину, без каскада ORM.
+    """
+    search_fields = ['name']
+    ordering = ['name']
+    list_per_page = 100
+    show_full_result_count = False
+    actions = ['delete_dictionaries']
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return typeahead.prefix_filter(queryset, search_term), False
+
+    def get_actions(self, request):
+        """
+        Стандартное удаление выбранных заменено на delete_dictionaries:
+        оно загружает и удаляет через каскад ORM каждую зависимую операцию.
+        """
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def has_delete_permission(self, request, obj=None):
+        """Записи с операциями закрытых периодов не удаляются (их можно объединить)"""
+        if obj is not None:
+            snapshots = PeriodSnapshot.objects.filter(**{read_model.DICTIONARY_FIELDS[type(obj)]: obj})
+            if snapshots.exists():
+                return False
+        return super().has_delete_permission(request, obj)
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Подтверждение удаления без списка каскада: операции не загружаются,
+        выводится только их число.
+        """
+        objs = list(objs)
+        operations = sum(services.dependent_operations(obj).count() for obj in objs)
+        model_count = {self.model._meta.verbose_name_plural: len(objs)}
+        if operations:
+            model_count[CashFlow._meta.verbose_name_plural] = operations
+        return [str(obj) for obj in objs], model_count, set(), []
+
+    def delete_model(self, request, obj):
+        try:
+            services.delete_dictionary(obj)
+        except ValidationError as exc:
+            self.message_user(request, f'{obj}: {exc.messages[0]}', messages.ERROR)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
+
+    @admin.action(description='Удалить выбранные записи в корзину', permissions=['delete'])
+    def delete_dictionaries(self, request, queryset):
+        """Мягкое удаление: по несколько UPDATE на запись, без подтверждения со списком каскада"""
+        deleted, operations = 0, 0
+        for obj in queryset:
+            try:
+                operations += services.delete_dictionary(obj)
+            except ValidationError as exc:
+                self.message_user(request, f'{obj}: {exc.messages[0]}', messages.ERROR)
+            else:
+                deleted += 1
+        if deleted:
+            self.message_user(request, f'Удалено записей: {deleted}, операций: {operations}. '
+                                       'Восстановить их можно в корзине', messages.SUCCESS)
+
+
+@admin.register(Status)
+class StatusAdmin(DictionaryAdmin):
+    list_display = ['name']
+
+
+@admin.register(Type)
+class TypeAdmin(DictionaryAdmin):
+    list_display = ['name', 'is_income']
+    list_filter = ['is_income']
+
+
+@admin.register(Category)
+class CategoryAdmin(DictionaryAdmin):
+    list_display = ['name']
+
+
+@admin.register(SubCategory)
+class SubCategoryAdmin(DictionaryAdmin):
+    list_display = ['name', 'category']
+    list_select_related = ['category']
+    autocomplete_fields = ['category']
+
+
+# ======================== ОПЕРАЦИИ ========================
+class CashFlowAdminForm(forms.ModelForm):
+    """Форма операции в админке с проверками формы сайта"""
+
+    class Meta:
+        model = CashFlow
+        fields = '__all__'
+
+    def clean_date(self):
+        """Операции нельзя переносить в закрытые месяцы"""
+        value = self.cleaned_data['date']
+        if value and periods.is_closed(value):
+            raise ValidationError('Период %(month)s закрыт, изменения в нем запрещены',
+                                  params={'month': value.strftime('%m.%Y')})
+        return value
+
+    def clean(self):
+        """Подкатегория должна принадлежать выбранной категории"""
+        cleaned_data = super().clean()
+        category = cleaned_data.get('category')
+        subcategory = cleaned_data.get('subcategory')
+        if category and subcategory and subcategory.category_id != category.pk:
+            self.add_error('subcategory', 'Подкатегория не относится к выбранной категории')
+        return cleaned_data
+
+
+def _autocomplete(field_name):
+    """Виджет автодополнения для поля формы массовых действий"""
+    return AutocompleteSelect(CashFlow._meta.get_field(field_name), admin.site)
+
+
+class CashFlowActionForm(OrganizationChoicesMixin, ActionForm):
+    """Параметры массовых действий: новое значение справочника"""
+    status = forms.ModelChoiceField(
+        Status.objects.all(), required=False, label='Статус', widget=_autocomplete('status'))
+    type = forms.ModelChoiceField(
+        Type.objects.all(), required=False, label='Тип', widget=_autocomplete('type'))
+    subcategory = forms.ModelChoiceField(
+        SubCategory.objects.select_related('category'), required=False, label='Подкатегория',
+        widget=_autocomplete('subcategory'))
+
+
+@admin.register(CashFlow)
+class CashFlowAdmin(admin.ModelAdmin):
+    """
+    Операции в админке для таблиц в миллионы строк.
+
+    Справочники подгружаются одним JOIN, полный подсчет строк отключен,
+    выбор справочников - автодополнением; массовые действия выполняются
+    одним UPDATE/DELETE через services.
+    """
+    form = CashFlowAdminForm
+    action_form = CashFlowActionForm
+    list_display = ['date', 'status', 'type', 'category', 'subcategory_name', 'amount', 'comment']
+    list_select_related = ['status', 'type', 'category', 'subcategory']
+    date_hierarchy = 'date'
+    ordering = ['-date', '-id']
+    autocomplete_fields = ['status', 'type', 'category', 'subcategory']
+    readonly_fields = ['created_at', 'updated_at']
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    list_per_page = 100
+    actions = ['set_status', 'set_type', 'set_subcategory', 'delete_cashflows']
+
+    @admin.display(description='Подкатегория', ordering='subcategory__name')
+    def subcategory_name(self, obj):
+        # Без __str__ подкатегории: он обращается к ее категории
+        return obj.subcategory.name
+
+    def get_actions(self, request):
+        """
+        Стандартное удаление выбранных заменено на delete_cashflows:
+        оно выводит на подтверждение каждый удаляемый объект.
+        """
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def has_change_permission(self, request, obj=None):
+        """Операции закрытых месяцев только для просмотра"""
+        if obj is not None and periods.is_closed(obj.date):
+            return False
+        return super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and periods.is_closed(obj.date):
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def delete_model(self, request, obj):
+        services.delete_cashflows(CashFlow.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        services.delete_cashflows(queryset)
+
+    def _reassign(self, request, queryset, field):
+        """Смена записи справочника у выбранных операций одним UPDATE"""
+        form = self.action_form(request.POST)
+        form.is_valid()
+        value = form.cleaned_data.get(field)
+        if value is None:
+            self.message_user(request, f'Выберите значение "{form.fields[field].label}" рядом с действием',
+                              messages.WARNING)
+            return
+        try:
+            updated = services.update_cashflows(queryset, **{field: value})
+        except ValidationError as exc:
+            self.message_user(request, exc.messages[0], messages.ERROR)
+            return
+        self.message_user(request, f'Изменено операций: {updated}', messages.SUCCESS)
+
+    @admin.action(description='Сменить статус выбранных операций', permissions=['change'])
+    def set_status(self, request, queryset):
+        self._reassign(request, queryset, 'status')
+
+    @admin.action(description='Сменить тип выбранных операций', permissions=['change'])
+    def set_type(self, request, queryset):
+        self._reassign(request, queryset, 'type')
+
+    @admin.action(description='Перенести выбранные операции в подкатегорию', permissions=['change'])
+    def set_subcategory(self, request, queryset):
+        self._reassign(request, queryset, 'subcategory')
+
+    @admin.action(description='Удалить выбранные операции', permissions=['delete'])
+    def delete_cashflows(self, request, queryset):
+        try:
+            deleted = services.delete_cashflows(queryset)
+        except ValidationError as exc:
+            self.message_user(request, exc.messages[0], messages.ERROR)
+            return
+        self.message_user(request, f'Удалено операций: {deleted}', messages.SUCCESS)
+
+
+# ======================== ПОВТОРЯЮЩИЕСЯ ОПЕРАЦИИ ========================
+class RecurringOperationAdminForm(forms.ModelForm):
+    """Шаблон повторяющейся операции"""
+
+    class Meta:
+        model = RecurringOperation
+        fields = '__all__'
+
+    def clean(self):
+        """Подкатегория должна принадлежать категории, конец - не раньше начала"""
+        cleaned_data = super().clean()
+        category = cleaned_data.get('category')
+        subcategory = cleaned_data.get('subcategory')
+        if category and subcategory and subcategory.category_id != category.pk:
+            self.add_error('subcategory', 'Подкатегория не относится к выбранной категории')
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', 'Последний день повторений раньше первого повторения')
+        return cleaned_data
+
+
+@admin.register(RecurringOperation)
+class RecurringOperationAdmin(admin.ModelAdmin):
+    """
+    Шаблоны повторяющихся операций. Операции по ним создает команда
+    materialize_recurring; при смене расписания следующее повторение
+    пересчитывается после последней уже созданной операции.
+    """
+    form = RecurringOperationAdminForm
+    list_display = ['name', 'type', 'category', 'amount', 'period', 'interval', 'next_date', 'is_active']
+    list_select_related = ['type', 'category']
+    list_filter = ['is_active', 'period']
+    search_fields = ['name']
+    autocomplete_fields = ['status', 'type', 'category', 'subcategory']
+    readonly_fields = ['next_date', 'created_at', 'updated_at']
+
+    def save_model(self, request, obj, form, change):
+        if not change or {'start_date', 'period', 'interval'} & set(form.changed_data):
+            recurring.reschedule(obj)
+        super().save_model(request, obj, form, change)
+
+
+# ======================== БЮДЖЕТЫ ========================
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    """Бюджеты месяцев; факт обновляется приложением и командой reconcile_budgets"""
+    form = BudgetForm
+    list_display = ['month', 'category', 'subcategory', 'amount', 'actual']
+    list_select_related = ['category', 'subcategory__category']
+    date_hierarchy = 'month'
+    autocomplete_fields = ['category', 'subcategory']
+    readonly_fields = ['actual']
+
+
+# ======================== СЛУЖЕБНЫЕ ДАННЫЕ ========================
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Производные данные: только просмотр, изменяются приложением и командами"""
+    show_full_result_count = False
+    list_per_page = 100
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CashFlowRow)
+class CashFlowRowAdmin(ReadOnlyAdmin):
+    list_display = ['cashflow_id', 'date', 'status_name', 'type_name', 'category_name',
+                    'subcategory_name', 'amount', 'is_income']
+    date_hierarchy = 'date'
+    paginator = CappedCountPaginator
+
+
+@admin.register(ArchivedCashFlow)
+class ArchivedCashFlowAdmin(ReadOnlyAdmin):
+    list_display = ['id', 'date', 'status_name', 'type_name', 'category_name',
+                    'subcategory_name', 'amount', 'is_income']
+    date_hierarchy = 'date'
+    ordering = ['-date', '-id']
+    paginator = CappedCountPaginator
+
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(ReadOnlyAdmin):
+    list_display = ['date', 'balance', 'created_at']
+
+
+@admin.register(ClosedPeriod)
+class ClosedPeriodAdmin(ReadOnlyAdmin):
+    list_display = ['month', 'closing_balance', 'closed_at', 'archived']
+
+
+@admin.register(PeriodSnapshot)
+class PeriodSnapshotAdmin(ReadOnlyAdmin):
+    list_display = ['period', 'status', 'type', 'category', 'subcategory', 'total', 'count']
+    list_select_related = ['period', 'status', 'type', 'category', 'subcategory__category']
+
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(ReadOnlyAdmin):
+    list_display = ['id', 'model', 'object_id', 'action', 'created_at']
+    list_filter = ['model', 'action']
+    paginator = CappedCountPaginator
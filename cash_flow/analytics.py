@@ -0,0 +1,253 @@
+"""
+Аналитический движок в памяти: операции в виде колонок NumPy.
+
+Включается настройкой CASH_FLOW_ANALYTICS_ENABLED (требуется пакет numpy).
+Колонки: дата (int32, дни от 1970-01-01), месяц (int32, год*12+месяц-1),
+сумма (int64, копейки) и коды справочников (int32, плотная нумерация).
+Группировки и суммы считаются векторно; при обращении данные
+догружаются по updated_at, а не загружаются заново. У каждой организации
+свое хранилище.
+"""
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import BigIntegerField, ExpressionWrapper, F, Max
+
+from . import tenancy
+from .models import CashFlow, Type
+
+try:
+    import numpy as np
+except ImportError:  # numpy - необязательная зависимость
+    np = None
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DIMENSIONS = ('status', 'type', 'category', 'subcategory')
+LOAD_CHUNK_SIZE = 10000
+
+
+def is_enabled():
+    """Включен ли движок (настройка и наличие numpy)"""
+    return np is not None and getattr(settings, 'CASH_FLOW_ANALYTICS_ENABLED', False)
+
+
+def _to_days(day):
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def _to_month(day):
+    return day.year * 12 + day.month - 1
+
+
+def _from_month(code):
+    return date(int(code) // 12, int(code) % 12 + 1, 1)
+
+
+class ColumnStore:
+    """
+    Колоночное хранилище операций.
+
+    Идентификаторы операций хранятся по возрастанию (новые операции получают
+    большие id), поэтому позиция операции находится бинарным поиском.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._checked_at = 0.0
+
+    # ---------- Загрузка и обновление ----------
+    def _reset(self, capacity):
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.days = np.zeros(capacity, dtype=np.int32)
+        self.months = np.zeros(capacity, dtype=np.int32)
+        self.amounts = np.zeros(capacity, dtype=np.int64)
+        self.codes = {dimension: np.zeros(capacity, dtype=np.int32) for dimension in DIMENSIONS}
+        # Словари кодирования: id записи справочника -> код и обратно
+        self.code_of = {dimension: {} for dimension in DIMENSIONS}
+        self.id_of = {dimension: [] for dimension in DIMENSIONS}
+        self.watermark = None
+
+    def _grow(self, needed):
+        """Увеличение емкости колонок (удвоением)"""
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name in ('ids', 'days', 'months', 'amounts'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+        for dimension, column in self.codes.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.codes[dimension] = grown
+
+    def _code(self, dimension, pk):
+        """Код записи справочника (новые записи получают следующий код)"""
+        codes = self.code_of[dimension]
+        code = codes.get(pk)
+        if code is None:
+            code = codes[pk] = len(self.id_of[dimension])
+            self.id_of[dimension].append(pk)
+        return code
+
+    def _write(self, position, row):
+        pk, day, amount, *dictionary_ids, _ = row
+        self.ids[position] = pk
+        self.days[position] = _to_days(day)
+        self.months[position] = _to_month(day)
+        self.amounts[position] = amount
+        for dimension, dictionary_id in zip(DIMENSIONS, dictionary_ids):
+            self.codes[dimension][position] = self._code(dimension, dictionary_id)
+
+    @staticmethod
+    def _rows(queryset):
+        # Сумма читается как есть - целым числом копеек, без Decimal
+        kopecks = ExpressionWrapper(F('amount'), output_field=BigIntegerField())
+        return queryset.order_by('pk').annotate(kopecks=kopecks).values_list(
+            'pk', 'date', 'kopecks', *[f'{dimension}_id' for dimension in DIMENSIONS], 'updated_at'
+        ).iterator(chunk_size=LOAD_CHUNK_SIZE)
+
+    def _load(self):
+        """Полная загрузка операций"""
+        self._reset(CashFlow.objects.count() + 1024)
+        self.watermark = CashFlow.objects.aggregate(watermark=Max('updated_at'))['watermark']
+        queryset = CashFlow.objects.all()
+        if self.watermark:
+            queryset = queryset.filter(updated_at__lte=self.watermark)
+        for row in self._rows(queryset):
+            self._grow(self.size + 1)
+            self._write(self.size, row)
+            self.size += 1
+        self._loaded = True
+
+    def _apply_changes(self):
+        """
+        Догрузка операций, измененных после последней загрузки.
+
+        Возвращает False, если инкрементально обновиться нельзя
+        (операция вне порядка id) - тогда нужна полная загрузка.
+        """
+        if self.watermark is None:
+            return False
+        changed = list(self._rows(CashFlow.objects.filter(updated_at__gt=self.watermark)))
+        for row in changed:
+            ids = self.ids[:self.size]
+            position = int(np.searchsorted(ids, row[0]))
+            if position < self.size and ids[position] == row[0]:
+                self._write(position, row)
+            elif position == self.size:
+                self._grow(self.size + 1)
+                self._write(self.size, row)
+                self.size += 1
+            else:
+                return False
+        if changed:
+            self.watermark = max(row[-1] for row in changed)
+        return True
+
+    def refresh(self, force=False):
+        """
+        Актуализация данных не чаще раза в CASH_FLOW_ANALYTICS_REFRESH_SECONDS.
+
+        Удаления не меняют updated_at: при расхождении количества операций
+        хранилище загружается заново.
+        """
+        interval = getattr(settings, 'CASH_FLOW_ANALYTICS_REFRESH_SECONDS', 5)
+        if not force and self._loaded and time.monotonic() - self._checked_at < interval:
+            return
+        if not self._loaded or not self._apply_changes() or CashFlow.objects.count() != self.size:
+            self._load()
+        # Знак операции берется из типа: тип может смениться без изменения операций
+        income = dict(Type.objects.values_list('pk', 'is_income'))
+        self.type_income = np.array(
+            [income.get(pk, False) for pk in self.id_of['type']] or [False], dtype=bool)
+        self._checked_at = time.monotonic()
+
+    # ---------- Запросы ----------
+    def _mask(self, filters):
+        """Маска строк, подходящих под фильтры списка операций"""
+        mask = np.ones(self.size, dtype=bool)
+        if filters.get('date_from'):
+            days = self.days[:self.size]
+            mask &= (days >= _to_days(filters['date_from'])) & (days <= _to_days(filters['date_to']))
+        for dimension in ('status', 'type', 'category', 'subcategory'):
+            pk = filters.get(dimension)
+            if pk:
+                code = self.code_of[dimension].get(pk)
+                if code is None:
+                    return np.zeros(self.size, dtype=bool)
+                mask &= self.codes[dimension][:self.size] == code
+        return mask
+
+    def monthly_totals(self, filters, group_by=()):
+        """
+        Суммы по месяцам в разрезе group_by - тот же формат, что у
+        reports.monthly_totals: month, <разрез>_id, income, expense, count.
+        """
+        with self._lock:
+            self.refresh()
+            mask = self._mask(filters)
+            columns = [self.months[:self.size][mask]]
+            sizes = [None]
+            for dimension in group_by:
+                columns.append(self.codes[dimension][:self.size][mask])
+                sizes.append(max(len(self.id_of[dimension]), 1))
+            income = self.type_income[self.codes['type'][:self.size][mask]]
+            amounts = self.amounts[:self.size][mask]
+
+            # Составной ключ группы: месяц и коды справочников в одном int64
+            month_base = columns[0].min() if len(columns[0]) else 0
+            keys = (columns[0] - month_base).astype(np.int64)
+            for column, size in zip(columns[1:], sizes[1:]):
+                keys = keys * size + column
+            unique, inverse = np.unique(keys, return_inverse=True)
+            groups = len(unique)
+            # Суммы в int64: bincount с весами складывал бы копейки во float64
+            incomes = np.zeros(groups, dtype=np.int64)
+            expenses = np.zeros(groups, dtype=np.int64)
+            np.add.at(incomes, inverse, np.where(income, amounts, 0))
+            np.add.at(expenses, inverse, np.where(income, 0, amounts))
+            counts = np.bincount(inverse, minlength=groups)
+
+            # Разбор ключа обратно на месяц и коды
+            parts = []
+            rest = unique
+            for size in reversed(sizes[1:]):
+                parts.append(rest % size)
+                rest = rest // size
+            parts.reverse()
+            months = rest + month_base
+            id_lists = [self.id_of[dimension] for dimension in group_by]
+
+        rows = []
+        for i in range(groups):
+            row = {'month': _from_month(months[i])}
+            for dimension, ids, codes in zip(group_by, id_lists, parts):
+                row[f'{dimension}_id'] = ids[int(codes[i])]
+            # Копейки -> рубли без потери точности
+            row['income'] = Decimal(int(incomes[i])).scaleb(-2)
+            row['expense'] = Decimal(int(expenses[i])).scaleb(-2)
+            row['count'] = int(counts[i])
+            rows.append(row)
+        return rows
+
+
+_stores = {}
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Хранилище текущей организации, общее для процесса (создается при первом обращении)"""
+    organization_id = tenancy.current_id()
+    with _store_lock:
+        store = _stores.get(organization_id)
+        if store is None:
+            store = _stores[organization_id] = ColumnStore()
+        return store
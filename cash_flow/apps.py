@@ -12,4 +12,8 @@ class CashFlowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     
     # Имя приложения в формате Python path (как указано в INSTALLED_APPS)
-    name = 'cash_flow'
\ No newline at end of file
+    name = 'cash_flow'
+
+    def ready(self):
+        """Подключение обработчиков сигналов моделей"""
+        from . import signals  # noqa: F401
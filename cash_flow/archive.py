@@ -0,0 +1,173 @@
+"""
+Архив операций: закрытые месяцы старше горизонта переносятся из CashFlow
+и CashFlowRow в ArchivedCashFlow.
+
+Архивируются только закрытые месяцы и строго по порядку, поэтому архив -
+это непрерывная история до boundary(). Остатки и отчеты по целым
+архивным месяцам берутся из ClosedPeriod и PeriodSnapshot; сами архивные
+строки читаются, только когда период фильтра начинается в архиве
+(reaches).
+"""
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Substr
+
+from . import balances, caching, read_model
+from .filters import apply_filters
+from .models import ArchivedCashFlow, CashFlow, CashFlowRow, ClosedPeriod
+
+
+def boundary():
+    """Последний день последнего архивного месяца или None, если архив пуст"""
+    period = ClosedPeriod.objects.filter(archived=True).order_by('-month').first()
+    return balances.month_end(period.month) if period else None
+
+
+def reaches(filters, border=None):
+    """Начинается ли период фильтра в архиве (без периода читаются только горячие данные)"""
+    border = border or boundary()
+    return border is not None and filters['date_from'] is not None and filters['date_from'] <= border
+
+
+def rows(filters):
+    """Архивные строки с фильтрами списка; archived - признак для шаблонов"""
+    return apply_filters(ArchivedCashFlow.objects.all(), filters).annotate(archived=Value(True))
+
+
+class ChainedRows:
+    """
+    Строки нескольких querysets подряд: горячие, затем архивные.
+
+    Поддерживает count() и срезы (для Paginator и API) и итерацию порциями
+    (для экспорта). Части уже отсортированы: архивные строки старше горячих.
+    """
+
+    def __init__(self, *parts):
+        self.parts = parts
+        self._counts = None
+
+    def count(self):
+        if self._counts is None:
+            self._counts = [part.count() for part in self.parts]
+        return sum(self._counts)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if len(self.parts) == 1:
+            return list(self.parts[0][index])
+        start, stop = index.start or 0, index.stop
+        self.count()
+        result = []
+        for part, size in zip(self.parts, self._counts):
+            if stop is not None and stop <= 0:
+                break
+            if start < size:
+                result += part[start:stop if stop is None or stop < size else size]
+            start = max(start - size, 0)
+            stop = None if stop is None else stop - size
+        return result
+
+    def iterator(self, chunk_size=2000):
+        for part in self.parts:
+            yield from part.iterator(chunk_size=chunk_size)
+
+
+# ======================== ПЕРЕНОС В АРХИВ ========================
+# Поля архива и выражения над CashFlow, из которых они заполняются
+ARCHIVE_COLUMNS = {
+    'id': F('pk'),
+    'organization': F('organization_id'),
+    'date': F('date'),
+    'amount': F('amount'),
+    'is_income': F('type__is_income'),
+    'comment_excerpt': Substr(Coalesce('comment', Value('')), 1, read_model.COMMENT_EXCERPT_LENGTH),
+    'comment': F('comment'),
+    'created_at': F('created_at'),
+    'updated_at': F('updated_at'),
+    'status': F('status_id'),
+    'type': F('type_id'),
+    'category': F('category_id'),
+    'subcategory': F('subcategory_id'),
+    'status_name': F('status__name'),
+    'type_name': F('type__name'),
+    'category_name': F('category__name'),
+    'subcategory_name': F('subcategory__name'),
+}
+
+# Поля CashFlow и выражения над архивом для возврата операций
+RESTORE_COLUMNS = {
+    'id': F('id'),
+    'organization': F('organization_id'),
+    'date': F('date'),
+    'amount': F('amount'),
+    'comment': F('comment'),
+    'created_at': F('created_at'),
+    'updated_at': F('updated_at'),
+    'status': F('status_id'),
+    'type': F('type_id'),
+    'category': F('category_id'),
+    'subcategory': F('subcategory_id'),
+}
+
+
+def archivable_periods(months=None):
+    """
+    Закрытые неархивные месяцы старше горизонта (months месяцев до
+    текущего, по умолчанию CASH_FLOW_ARCHIVE_MONTHS) - по порядку.
+    """
+    if months is None:
+        months = getattr(settings, 'CASH_FLOW_ARCHIVE_MONTHS', 24)
+    today = date.today()
+    index = today.year * 12 + today.month - 1 - months
+    horizon = date(index // 12, index % 12 + 1, 1)
+    return ClosedPeriod.objects.filter(archived=False, month__lt=horizon).order_by('month')
+
+
+def archive_month(period):
+    """
+    Перенос операций закрытого месяца в архив: INSERT ... SELECT в архив и
+    DELETE из горячих таблиц в одной транзакции. Месяцы архивируются по
+    порядку. Возвращает число перенесенных операций.
+
+    Удаленные (в корзине) операции месяца остаются в CashFlow до purge_deleted.
+    Записей в журнал изменений перенос не добавляет (см. cash_flow.changefeed).
+    """
+    month_range = [period.month, balances.month_end(period.month)]
+    with transaction.atomic():
+        earlier = ClosedPeriod.objects.filter(archived=False, month__lt=period.month)
+        if period.archived or earlier.exists():
+            raise ValidationError(f'Месяц {period} нельзя архивировать: месяцы архивируются по порядку')
+        operations = CashFlow.objects.filter(date__range=month_range)
+        moved = read_model.copy_rows(operations, ARCHIVE_COLUMNS, ArchivedCashFlow)
+        CashFlowRow.objects.filter(cashflow__in=operations.order_by().values('pk')).delete()
+        operations._raw_delete(operations.db)
+        ClosedPeriod.objects.filter(pk=period.pk).update(archived=True)
+    caching.bump_version(caching.CASHFLOWS)
+    return moved
+
+
+def restore_last():
+    """
+    Возврат операций последнего архивного месяца в CashFlow (например,
+    перед открытием месяца). Возвращает (месяц, число операций) или None.
+    """
+    period = ClosedPeriod.objects.filter(archived=True).order_by('-month').first()
+    if period is None:
+        return None
+    month_range = [period.month, balances.month_end(period.month)]
+    with transaction.atomic():
+        archived = ArchivedCashFlow.objects.filter(date__range=month_range)
+        restored = read_model.copy_rows(archived, RESTORE_COLUMNS, CashFlow)
+        read_model.rebuild(CashFlow.objects.filter(date__range=month_range).values('pk'))
+        archived._raw_delete(archived.db)
+        ClosedPeriod.objects.filter(pk=period.pk).update(archived=False)
+    caching.bump_version(caching.CASHFLOWS)
+    return period.month, restored
@@ -0,0 +1,161 @@
+"""
+Расчет остатков: нарастающий итог в списке операций и остаток на дату.
+
+Знак суммы определяется типом операции: пополнение (Type.is_income)
+увеличивает остаток, остальные типы уменьшают.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, Sum, Value, When, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import TruncMonth
+
+from .filters import apply_filters
+from .models import ArchivedCashFlow, CashFlow, CashFlowRow, BalanceCheckpoint, ClosedPeriod, MoneyField, PeriodSnapshot
+
+# Суммы хранятся в копейках: SUM, CASE и оконные функции считаются
+# в целых числах, в Decimal переводится только результат
+BALANCE_FIELD = MoneyField(max_digits=16)
+
+
+def month_end(day):
+    """Последний день месяца, в котором находится дата day"""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def signed_amount(income_field='type__is_income', amount_field='amount'):
+    """Выражение суммы со знаком: "+" для пополнений, "-" для списаний"""
+    return Case(
+        When(**{income_field: True}, then=F(amount_field)),
+        default=-F(amount_field),
+        output_field=BALANCE_FIELD,
+    )
+
+
+def _income_field(queryset):
+    """Поле признака пополнения: в строках списка и архива он хранится в самой строке"""
+    return 'is_income' if queryset.model in (CashFlowRow, ArchivedCashFlow) else 'type__is_income'
+
+
+def with_running_balance(queryset, opening=Decimal('0')):
+    """
+    Аннотация running_balance - остаток после каждой операции выборки.
+
+    Считается в базе оконной функцией в хронологическом порядке
+    (дата, id), поэтому от сортировки списка не зависит. opening - остаток
+    перед первой строкой выборки: выборка может быть и одной страницей
+    списка, тогда окно не проходит по более старым строкам.
+    """
+    running = Window(
+        expression=Sum(signed_amount(_income_field(queryset))),
+        order_by=[F('date').asc(), F('pk').asc()],
+        frame=RowRange(start=None, end=0),
+    )
+    # Без ExpressionWrapper сумма двух MoneyField считалась бы просто целым
+    return queryset.annotate(running_balance=ExpressionWrapper(
+        running + Value(opening, output_field=BALANCE_FIELD), output_field=BALANCE_FIELD))
+
+
+def total(queryset):
+    """Сумма со знаком по выборке операций (CashFlow, CashFlowRow или ArchivedCashFlow)"""
+    result = queryset.aggregate(
+        total=Sum(signed_amount(_income_field(queryset)), output_field=BALANCE_FIELD))['total']
+    return result if result is not None else Decimal('0.00')
+
+
+def balance_as_of(as_of):
+    """
+    Остаток по всем операциям на конец дня as_of.
+
+    Берется ближайшая опорная точка не позже as_of - контрольная точка или
+    конец закрытого месяца, - к ней добавляются только операции после нее.
+    Возвращает (остаток, дата опорной точки или None).
+    """
+    base_date, opening = None, Decimal('0')
+    checkpoint = BalanceCheckpoint.objects.filter(date__lte=as_of).order_by('-date').first()
+    if checkpoint:
+        base_date, opening = checkpoint.date, checkpoint.balance
+    # Закрытые месяцы, которые заканчиваются не позже as_of
+    closed = (
+        ClosedPeriod.objects.filter(month__lt=(as_of + timedelta(days=1)).replace(day=1))
+        .order_by('-month').first()
+    )
+    if closed and (base_date is None or month_end(closed.month) > base_date):
+        base_date, opening = month_end(closed.month), closed.closing_balance
+
+    queryset = CashFlow.objects.filter(date__lte=as_of)
+    # as_of внутри архивного месяца: операции после опорной точки - в архиве
+    # (для дат вне архива - пустой диапазон индекса по дате)
+    archived = ArchivedCashFlow.objects.filter(date__lte=as_of)
+    if base_date:
+        queryset = queryset.filter(date__gt=base_date)
+        archived = archived.filter(date__gt=base_date)
+    return opening + total(queryset) + total(archived), base_date
+
+
+def filtered_balance_as_of(filters, as_of):
+    """
+    Остаток по операциям с фильтрами списка по справочникам (период filters
+    не учитывается) на конец дня as_of.
+
+    Без фильтров по справочникам - balance_as_of. С фильтрами закрытые
+    месяцы до as_of берутся из итогов PeriodSnapshot, строки списка и
+    архива читаются только после последнего из них.
+    """
+    if not (filters['status'] or filters['type'] or filters['category']):
+        return balance_as_of(as_of)[0]
+    # Закрытые месяцы, которые заканчиваются не позже as_of
+    last = (
+        ClosedPeriod.objects.filter(month__lt=(as_of + timedelta(days=1)).replace(day=1))
+        .order_by('-month').first()
+    )
+    balance = Decimal('0.00')
+    if last:
+        snapshots = apply_filters(PeriodSnapshot.objects.filter(period__month__lte=last.month), filters, dates=False)
+        result = snapshots.aggregate(
+            total=Sum(signed_amount(amount_field='total'), output_field=BALANCE_FIELD))['total']
+        balance += result or 0
+    for model in (CashFlowRow, ArchivedCashFlow):
+        rows = apply_filters(model.objects.filter(date__lte=as_of), filters, dates=False)
+        if last:
+            rows = rows.filter(date__gt=month_end(last.month))
+        balance += total(rows)
+    return balance
+
+
+def invalidate_checkpoints(since=None):
+    """Удаление контрольных точек, которые зависят от операций начиная с даты since"""
+    checkpoints = BalanceCheckpoint.objects.all()
+    if since is not None:
+        checkpoints = checkpoints.filter(date__gte=since)
+    checkpoints.delete()
+
+
+def rebuild_checkpoints(until):
+    """
+    Пересоздание контрольных точек на конец каждого месяца до даты until.
+
+    Один сгруппированный по месяцам запрос, нарастающий итог в Python.
+    Архивные месяцы пропускаются: итог начинается с остатка на конец
+    последнего из них. Возвращает количество созданных точек.
+    """
+    archived = ClosedPeriod.objects.filter(archived=True).order_by('-month').first()
+    monthly = (
+        CashFlow.objects.filter(date__lte=until)
+        .annotate(month=TruncMonth('date'))
+        .order_by('month')
+        .values('month')
+        .annotate(total=Sum(signed_amount(), output_field=BALANCE_FIELD))
+    )
+    checkpoints = []
+    balance = archived.closing_balance if archived else Decimal('0')
+    for row in monthly:
+        balance += row['total']
+        if month_end(row['month']) <= until:
+            checkpoints.append(BalanceCheckpoint(date=month_end(row['month']), balance=balance))
+    with transaction.atomic():
+        BalanceCheckpoint.objects.all().delete()
+        BalanceCheckpoint.objects.bulk_create(checkpoints)
+    return len(checkpoints)
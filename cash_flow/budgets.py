@@ -0,0 +1,188 @@
+"""
+Бюджеты: план расходов на месяц по категории или подкатегории и факт.
+
+Факт (Budget.actual) при просмотре не пересчитывается: каждое изменение
+операций прибавляет к фактам затронутых бюджетов разницу. Сохранение
+операции - обработчики сигналов, массовые изменения и удаления -
+services, повторяющиеся операции - recurring. Приращение - один UPDATE
+среди бюджетов месяца по индексу (организация, месяц). Операции,
+перенесенные в архив, остаются в факте. Расхождения находит и исправляет
+команда reconcile_budgets.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import TruncMonth
+
+from .balances import BALANCE_FIELD, month_end
+from .models import ArchivedCashFlow, Budget, CashFlow
+
+
+def _income_field(queryset):
+    """Поле признака пополнения: в архиве он хранится в самой строке"""
+    return 'is_income' if queryset.model is ArchivedCashFlow else 'type__is_income'
+
+
+def matching(month, category_id, subcategory_id):
+    """
+    Бюджеты, в факт которых входит расход месяца month по подкатегории.
+
+    Бюджет подкатегории отбирается по ней самой, без категории: при переносе
+    подкатегории в другую категорию его факт не меняется.
+    """
+    return Budget.objects.filter(month=month).filter(
+        Q(category_id=category_id, subcategory__isnull=True) | Q(subcategory_id=subcategory_id))
+
+
+def add(month, category_id, subcategory_id, delta):
+    """Прибавление delta к фактам бюджетов расхода (month - первый день месяца)"""
+    if delta:
+        matching(month, category_id, subcategory_id).update(
+            actual=F('actual') + Value(delta, output_field=BALANCE_FIELD))
+
+
+# ======================== ИЗМЕНЕНИЕ ОДНОЙ ОПЕРАЦИИ ========================
+# Поля операции, от которых зависит ее вклад в бюджеты
+STATE_FIELDS = ('date', 'category_id', 'subcategory_id', 'amount', 'type__is_income', 'deleted_at')
+
+
+def state(date, category_id, subcategory_id, amount, is_income, deleted_at):
+    """Вклад операции в бюджеты: (месяц, категория, подкатегория, сумма) или None для пополнений"""
+    if is_income or deleted_at is not None:
+        return None
+    # Сумма несохраненной из формы операции может быть еще строкой
+    return date.replace(day=1), category_id, subcategory_id, CashFlow._meta.get_field('amount').to_python(amount)
+
+
+def cashflow_state(cashflow):
+    return state(cashflow.date, cashflow.category_id, cashflow.subcategory_id, cashflow.amount,
+                 cashflow.type.is_income, cashflow.deleted_at)
+
+
+def apply_change(previous, current):
+    """
+    Приращения фактов при изменении операции с вклада previous на current.
+
+    Смена суммы - одно приращение, смена месяца, категории или подкатегории -
+    вычитание из прежних бюджетов и прибавление к новым.
+    """
+    if previous and current and previous[:3] == current[:3]:
+        add(*current[:3], current[3] - previous[3])
+        return
+    if previous:
+        add(*previous[:3], -previous[3])
+    if current:
+        add(*current[:3], current[3])
+
+
+def overspent(cashflow):
+    """Превышенные бюджеты, в которые входит операция (только бюджеты ее месяца)"""
+    if cashflow.type.is_income:
+        return Budget.objects.none()
+    return matching(cashflow.date.replace(day=1), cashflow.category_id, cashflow.subcategory_id).filter(
+        actual__gt=F('amount')).select_related('category', 'subcategory')
+
+
+# ======================== МАССОВЫЕ ИЗМЕНЕНИЯ ========================
+def _grouped(queryset, expenses_only=True):
+    """Суммы операций queryset по (месяц, категория, подкатегория, пополнение)"""
+    income_field = _income_field(queryset)
+    if expenses_only:
+        queryset = queryset.filter(**{income_field: False})
+    return (
+        queryset.order_by()
+        .annotate(month=TruncMonth('date'), income=F(income_field))
+        .values_list('month', 'category_id', 'subcategory_id', 'income')
+        .annotate(total=Sum('amount', output_field=BALANCE_FIELD))
+    )
+
+
+def apply(queryset, sign=1, expenses_only=True):
+    """
+    Прибавление (sign=1) или вычитание (sign=-1) расходов queryset - одним
+    сгруппированным запросом и приращением на каждую группу.
+
+    expenses_only=False - все операции независимо от знака (смена знака типа).
+    """
+    if not Budget.objects.exists():
+        return
+    for month, category_id, subcategory_id, _, total in _grouped(queryset, expenses_only):
+        add(month, category_id, subcategory_id, sign * total)
+
+
+def reassign(queryset, values):
+    """
+    Перенос расходов операций queryset при перепривязке к другим записям
+    справочников (values - {поле: запись}, как у read_model.reassign).
+
+    Вызывается до UPDATE: группы читаются один раз, новый вклад каждой
+    группы получается подстановкой values.
+    """
+    if not {'type', 'category', 'subcategory'} & values.keys() or not Budget.objects.exists():
+        return
+    for month, category_id, subcategory_id, income, total in _grouped(queryset, expenses_only=False):
+        new_income = values['type'].is_income if 'type' in values else income
+        new_category_id = values['category'].pk if 'category' in values else category_id
+        new_subcategory_id = values['subcategory'].pk if 'subcategory' in values else subcategory_id
+        apply_change(
+            None if income else (month, category_id, subcategory_id, total),
+            None if new_income else (month, new_category_id, new_subcategory_id, total),
+        )
+
+
+def type_sign_changed(instance):
+    """Смена знака типа: все его операции (и архивные) входят в факт или выходят из него"""
+    sign = 1 if not instance.is_income else -1
+    for model in (CashFlow, ArchivedCashFlow):
+        apply(model.objects.filter(type=instance), sign, expenses_only=False)
+
+
+# ======================== ПЕРЕСЧЕТ ========================
+def _key(budget):
+    """Ключ факта бюджета: как в matching - категория или только подкатегория"""
+    if budget.subcategory_id:
+        return budget.month, None, budget.subcategory_id
+    return budget.month, budget.category_id, None
+
+
+def _actuals(budgets):
+    """
+    Факты для бюджетов budgets по операциям и архиву - по сгруппированному
+    запросу к каждой таблице за период от первого до последнего месяца.
+    Возвращает {_key(бюджет): сумма}.
+    """
+    months = {budget.month for budget in budgets}
+    totals = defaultdict(Decimal)
+    for queryset in (CashFlow.objects.all(), ArchivedCashFlow.objects.all()):
+        period = queryset.filter(date__range=[min(months), month_end(max(months))])
+        for month, category_id, subcategory_id, _, total in _grouped(period):
+            totals[month, None, subcategory_id] += total
+            totals[month, category_id, None] += total
+    return totals
+
+
+def compute(budget):
+    """Факт бюджета по операциям (при создании и изменении бюджета)"""
+    return _actuals([budget]).get(_key(budget), Decimal('0.00'))
+
+
+def reconcile(fix=True):
+    """
+    Сверка фактов всех бюджетов с операциями: два сгруппированных запроса
+    и bulk_update расходящихся бюджетов (fix=False - только проверка).
+    Возвращает бюджеты с расхождениями (с верным фактом).
+    """
+    budgets = list(Budget.objects.select_related('category', 'subcategory').order_by('pk'))
+    if not budgets:
+        return []
+    totals = _actuals(budgets)
+    wrong = []
+    for budget in budgets:
+        expected = totals.get(_key(budget), Decimal('0.00'))
+        if budget.actual != expected:
+            budget.actual = expected
+            wrong.append(budget)
+    if fix and wrong:
+        Budget.objects.bulk_update(wrong, ['actual'], batch_size=500)
+    return wrong
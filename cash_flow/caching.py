@@ -0,0 +1,53 @@
+"""
+Версии данных для инвалидации кэша фрагментов шаблонов.
+
+Ключ каждого кэшированного фрагмента содержит номер версии. При изменении
+справочников или операций версия меняется, и старые фрагменты просто
+перестают использоваться (без перебора и удаления ключей). Версии у
+каждой организации свои.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import tenancy
+
+# Пространства имен версий
+DICTIONARIES = 'dictionaries'  # Статусы, типы, категории, подкатегории
+CASHFLOWS = 'cashflows'  # Денежные операции
+
+
+def _version_key(namespace):
+    """Ключ кэша, в котором хранится версия пространства имен текущей организации"""
+    return f'cash_flow:version:{tenancy.current_id()}:{namespace}'
+
+
+def get_version(namespace):
+    """
+    Текущая версия пространства имен (создается при первом обращении).
+
+    С кодом организации: ключи фрагментов разных организаций не совпадают.
+    """
+    version = cache.get_or_set(_version_key(namespace), time.time_ns, timeout=None)
+    return f'{tenancy.current_id()}.{version}'
+
+
+def bump_version(*namespaces):
+    """
+    Смена версии пространств имен.
+
+    Используется метка времени, а не счетчик: после вытеснения ключа из кэша
+    новая версия не совпадет ни с одной из ранее выданных.
+    """
+    for namespace in namespaces:
+        cache.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+def fragment_cache_context():
+    """Данные для тега {% cache %}: время жизни и текущие версии"""
+    return {
+        'fragment_cache_timeout': getattr(settings, 'CASH_FLOW_FRAGMENT_CACHE_TIMEOUT', 600),
+        'dictionaries_version': get_version(DICTIONARIES),
+        'cashflows_version': get_version(CASHFLOWS),
+    }
@@ -0,0 +1,151 @@
+"""
+Лента изменений для синхронизации внешних систем.
+
+Изменения записываются в ChangeLogEntry обработчиками сигналов; удаления
+справочников записывают надгробия и для всех каскадно удаляемых объектов
+(одним INSERT ... SELECT, без загрузки объектов в память). Потребитель читает ленту
+с любого курсора: GET /api/changes/?cursor=<последний seq>.
+
+Перенос операций в архив и возврат из него в ленту не пишутся: архивируются
+только закрытые месяцы, операции в них не меняются, а идентификатор в архиве
+сохраняется. Для потребителя операция остается прежней; ее данные после
+переноса в ленте не выдаются, записи о ней до переноса пропускаются.
+"""
+from django.db import connections, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .models import CashFlow, ChangeLogEntry, ChangeLogPruning, Status, Type, Category, SubCategory
+
+FEED_MODELS = {
+    'cashflow': CashFlow,
+    'status': Status,
+    'type': Type,
+    'category': Category,
+    'subcategory': SubCategory,
+}
+MODEL_NAMES = {model: name for name, model in FEED_MODELS.items()}
+
+# Поля объектов, передаваемые в ленте
+FEED_FIELDS = {
+    'cashflow': ['id', 'date', 'status_id', 'type_id', 'category_id', 'subcategory_id',
+                 'amount', 'comment', 'created_at', 'updated_at'],
+    'status': ['id', 'name'],
+    'type': ['id', 'name', 'is_income'],
+    'category': ['id', 'name'],
+    'subcategory': ['id', 'name', 'category_id'],
+}
+
+
+def record(instance, action):
+    """Запись изменения одного объекта"""
+    ChangeLogEntry.objects.create(organization_id=instance.organization_id, model=MODEL_NAMES[type(instance)],
+                                  object_id=instance.pk, action=action)
+
+
+def record_queryset(model_name, queryset, action):
+    """
+    Запись изменений всех объектов queryset одним INSERT ... SELECT.
+
+    Для массовых операций: идентификаторы не загружаются в Python.
+    """
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    select_sql, params = queryset.order_by().values(
+        changed_id=F('pk'), changed_organization=F('organization_id')).query.sql_with_params()
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    columns = ', '.join(quote(column) for column in ('organization_id', 'model', 'object_id', 'action', 'created_at'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ChangeLogEntry._meta.db_table)} ({columns}) '
+            f'SELECT changed.changed_organization, %s, changed.changed_id, %s, %s FROM ({select_sql}) changed',
+            (model_name, action, created_at, *params),
+        )
+        return cursor.rowcount
+
+
+def record_cascade_delete(instance):
+    """
+    Надгробия для записи справочника и всего, что удалится каскадом.
+
+    Вызывается до удаления в той же транзакции (pre_delete).
+    """
+    if isinstance(instance, Category):
+        dependents = CashFlow.objects.filter(Q(category=instance) | Q(subcategory__category=instance))
+        record_queryset('subcategory', instance.subcategory_set.all(), ChangeLogEntry.DELETE)
+    else:
+        dependents = CashFlow.objects.filter(**{MODEL_NAMES[type(instance)]: instance})
+    record_queryset('cashflow', dependents, ChangeLogEntry.DELETE)
+    record(instance, ChangeLogEntry.DELETE)
+
+
+def prune(border):
+    """
+    Удаление записей журнала старше border и запоминание границы очистки.
+
+    Удаляются все записи до наибольшего id среди старых - без пропусков
+    посередине ленты. Возвращает число удаленных записей.
+    """
+    entries = ChangeLogEntry._base_manager
+    with transaction.atomic():
+        until = entries.filter(created_at__lt=border).aggregate(until=Max('pk'))['until']
+        if until is None:
+            return 0
+        deleted, _ = entries.filter(pk__lte=until).delete()
+        pruning, _ = ChangeLogPruning.objects.get_or_create(pk=1)
+        if until > pruning.pruned_until:
+            pruning.pruned_until = until
+            pruning.save()
+    return deleted
+
+
+def oldest_cursor():
+    """
+    Минимальный курсор, с которого лента еще полна (после очистки журнала).
+
+    Курсор - id журнала, общий для организаций, а журнал очищается целиком:
+    граница считается по всем организациям. Запомненная при очистке граница
+    действует и тогда, когда журнал удален полностью.
+    """
+    pruned_until = ChangeLogPruning.objects.filter(pk=1).values_list('pruned_until', flat=True).first() or 0
+    first = ChangeLogEntry._base_manager.order_by('pk').values_list('pk', flat=True).first()
+    return max(pruned_until, (first or 1) - 1)
+
+
+def read(cursor, limit):
+    """
+    Порция изменений после курсора.
+
+    Один запрос по первичному ключу журнала и по одному запросу на модель
+    за актуальными данными. Повторные изменения одного объекта в порции
+    сворачиваются в последнее. Возвращает (изменения, следующий курсор, есть ли еще).
+    """
+    entries = list(ChangeLogEntry.objects.filter(pk__gt=cursor).order_by('pk')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_cursor = entries[-1].pk if entries else cursor
+
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.model, entry.object_id), None)
+        latest[(entry.model, entry.object_id)] = entry
+
+    upserts = {}
+    for (model_name, pk), entry in latest.items():
+        if entry.action == ChangeLogEntry.UPSERT:
+            upserts.setdefault(model_name, []).append(pk)
+    data = {}
+    for model_name, ids in upserts.items():
+        objects = FEED_MODELS[model_name].objects.filter(pk__in=ids).values(*FEED_FIELDS[model_name])
+        data[model_name] = {obj['id']: obj for obj in objects}
+
+    changes = []
+    for (model_name, pk), entry in latest.items():
+        change = {'seq': entry.pk, 'model': model_name, 'id': pk, 'action': entry.action}
+        if entry.action == ChangeLogEntry.UPSERT:
+            change['data'] = data[model_name].get(pk)
+            if change['data'] is None:
+                continue  # Объект удален позже - надгробие будет в следующих записях
+        changes.append(change)
+    changes.sort(key=lambda change: change['seq'])
+    return changes, next_cursor, has_more
@@ -0,0 +1,62 @@
+"""
+Разбор параметров фильтрации операций из GET-запроса.
+
+Общий код для списка операций, отчетов и API.
+"""
+from datetime import datetime
+
+
+def parse_date(value):
+    """Дата в формате ГГГГ-ММ-ДД или None при пустом/неверном значении"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _parse_id(value):
+    """Идентификатор записи справочника или None ('all', пусто, не число)"""
+    if not value or value == 'all':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def get_filters(params):
+    """
+    Фильтры из параметров запроса.
+
+    Период учитывается только если заданы обе границы.
+    """
+    date_from = parse_date(params.get('date_from'))
+    date_to = parse_date(params.get('date_to'))
+    if not (date_from and date_to):
+        date_from = date_to = None
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'status': _parse_id(params.get('status')),
+        'type': _parse_id(params.get('type')),
+        'category': _parse_id(params.get('category')),
+    }
+
+
+def apply_filters(queryset, filters, dates=True):
+    """
+    Применение фильтров к queryset операций.
+
+    dates=False - только фильтры по справочникам (для остатка на начало периода).
+    """
+    if dates and filters['date_from']:
+        queryset = queryset.filter(date__range=[filters['date_from'], filters['date_to']])
+    if filters['status']:
+        queryset = queryset.filter(status_id=filters['status'])
+    if filters['type']:
+        queryset = queryset.filter(type_id=filters['type'])
+    if filters['category']:
+        queryset = queryset.filter(category_id=filters['category'])
+    return queryset
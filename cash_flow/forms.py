@@ -1,96 +1,109 @@
 from django import forms
-from .models import CashFlow, Status, Type, Category, SubCategory
+from .models import Budget, CashFlow, Status, Type, Category, SubCategory
+from . import periods, tenancy
 from datetime import date
 from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
 
-class StatusForm(forms.ModelForm):
+
+class TypeaheadSelect(forms.Select):
+    """
+    Выпадающий список справочника с поиском по названию.
+
+    В HTML выводятся только пустой вариант и выбранная запись, остальные
+    варианты typeahead.js подгружает порциями из /api/dictionaries/search/ -
+    размер страницы не зависит от размера справочника.
+    """
+
+    class Media:
+        js = ['cash_flow/typeahead.js']
+
+    def __init__(self, model, depends_on=None, attrs=None):
+        attrs = {'class': 'form-select', **(attrs or {})}
+        attrs['data-typeahead'] = model
+        attrs['data-typeahead-url'] = reverse_lazy('search_dictionary')
+        if depends_on:
+            # id поля, значение которого ограничивает поиск (категория для подкатегорий)
+            attrs['data-typeahead-depends'] = depends_on
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        """Варианты только для выбранного значения - без выборки всего справочника"""
+        choices = self.choices
+        field = choices.field
+        options = [] if field.empty_label is None else [('', field.empty_label)]
+        selected = [item for item in value if item not in ('', None)]
+        if selected:
+            try:
+                objects = list(choices.queryset.filter(pk__in=selected))
+            except (ValueError, ValidationError):
+                objects = []
+            options += [(obj.pk, obj.name) for obj in objects]
+        self.choices = options
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+
+class OrganizationChoicesMixin:
+    """
+    Варианты справочников - только текущей организации.
+
+    Queryset полей выбора создается при объявлении класса формы, вне
+    запроса, поэтому отбор по организации добавляется в каждой форме.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        organization_id = tenancy.current_id()
+        if organization_id is not None:
+            for field in self.fields.values():
+                if isinstance(field, forms.ModelChoiceField):
+                    field.queryset = field.queryset.filter(organization_id=organization_id)
+
+
+class UniqueNameFormMixin:
+    """
+    Уникальность названия проверяет уникальный индекс по LOWER(name) при записи.
+
+    Запрос-проверка перед сохранением не выполняется: нарушение индекса
+    превращается в ошибку формы в представлении (UniqueNameViewMixin).
+    """
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        exclude.add('name')
+        return exclude
+
+
+class StatusForm(UniqueNameFormMixin, forms.ModelForm):
     """Форма для создания/редактирования статусов"""
     class Meta:
         model = Status
         fields = ['name']  # Используем только поле name
-        error_messages = {
-            'name': {
-                'unique': _('Статус с таким названием уже существует'),
-            },
-        }
 
-    def clean_name(self):
-        """Валидация уникальности названия статуса (без учета регистра)"""
-        name = self.cleaned_data['name']
-        # Проверяем существование статуса с таким же именем, исключая текущий объект (если он есть)
-        if Status.objects.filter(name__iexact=name).exclude(pk=getattr(self.instance, 'pk', None)).exists():
-            raise ValidationError(_('Статус с таким названием уже существует'))
-        return name
-
-class TypeForm(forms.ModelForm):
+class TypeForm(UniqueNameFormMixin, forms.ModelForm):
     """Форма для работы с типами операций"""
     class Meta:
         model = Type
-        fields = ['name']
-        error_messages = {
-            'name': {
-                'unique': _('Тип с таким названием уже существует'),
-            },
-        }
+        fields = ['name', 'is_income']
 
-    def clean_name(self):
-        """Проверка уникальности названия типа"""
-        name = self.cleaned_data['name']
-        if Type.objects.filter(name__iexact=name).exclude(pk=getattr(self.instance, 'pk', None)).exists():
-            raise ValidationError(_('Тип с таким названием уже существует'))
-        return name
-
-class CategoryForm(forms.ModelForm):
+class CategoryForm(UniqueNameFormMixin, forms.ModelForm):
     """Форма для категорий"""
     class Meta:
         model = Category
         fields = ['name']  # Только поле названия (без привязки к типу)
-        error_messages = {
-            'name': {
-                'unique': _('Категория с таким названием уже существует'),
-            },
-        }
 
-    def clean_name(self):
-        """Валидация уникальности названия категории"""
-        name = self.cleaned_data['name']
-        if Category.objects.filter(name__iexact=name).exclude(pk=getattr(self.instance, 'pk', None)).exists():
-            raise ValidationError(_('Категория с таким названием уже существует'))
-        return name
-
-class SubCategoryForm(forms.ModelForm):
+class SubCategoryForm(OrganizationChoicesMixin, UniqueNameFormMixin, forms.ModelForm):
     """Форма для подкатегорий с привязкой к категории"""
     class Meta:
         model = SubCategory
         fields = ['name', 'category']  # Название и родительская категория
-        error_messages = {
-            'name': {
-                'unique': _('Подкатегория с таким названием уже существует в выбранной категории'),
-            },
+        widgets = {
+            'category': TypeaheadSelect('category'),  # Варианты подгружаются поиском
         }
-
-    def clean(self):
-        """Проверка уникальности пары название+категория"""
-        cleaned_data = super().clean()
-        name = cleaned_data.get('name')
-        category = cleaned_data.get('category')
-        
-        if name and category:
-            # Ищем подкатегории с таким же именем в выбранной категории
-            qs = SubCategory.objects.filter(
-                name__iexact=name,
-                category=category
-            )
-            # Исключаем текущую запись при редактировании
-            if self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
-                
-            if qs.exists():
-                raise ValidationError(
-                    {'name': _('Подкатегория с таким названием уже существует в выбранной категории')}
-                )
-        return cleaned_data
     
     def __init__(self, *args, **kwargs):
         """Инициализация формы с возможностью передачи списка категорий"""
@@ -98,17 +111,31 @@ class SubCategoryForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Настраиваем queryset для выбора категорий
-        if categories:
+        if categories is not None:
             self.fields['category'].queryset = categories
-        else:
-            self.fields['category'].queryset = Category.objects.none()
             
         # Настройка поля категории
         self.fields['category'].empty_label = "Выберите категорию"
-        self.fields['category'].widget.attrs.update({'class': 'form-select'})
+        
+
+class MergeForm(forms.Form):
+    """Выбор записи справочника, с которой объединяется текущая"""
+    target = forms.ModelChoiceField(
+        queryset=Status.objects.none(),
+        label='Объединить с',
+        empty_label='Выберите запись',
+    )
+
+    def __init__(self, *args, source, **kwargs):
+        super().__init__(*args, **kwargs)
+        model = type(source)
+        field = self.fields['target']
+        field.widget = TypeaheadSelect(model._meta.model_name)
+        # queryset задается после виджета: его установка передает варианты виджету
+        field.queryset = model.objects.exclude(pk=source.pk)
         
         
-class CashFlowForm(forms.ModelForm):
+class CashFlowForm(OrganizationChoicesMixin, forms.ModelForm):
     """Основная форма для операций денежного потока"""
     class Meta:
         model = CashFlow
@@ -121,30 +148,14 @@ class CashFlowForm(forms.ModelForm):
                     'value': date.today().strftime('%Y-%m-%d')  # Значение по умолчанию - сегодня
                 }
             ),
-            'status': forms.Select(
-                attrs={
-                    'class': 'form-select',
-                    'placeholder': 'Выберите статус'
-                }
-            ),
-            'type': forms.Select(
-                attrs={
-                    'class': 'form-select',
-                    'placeholder': 'Выберите тип операции'
-                }
-            ),
-            'category': forms.Select(
-                attrs={
-                    'class': 'form-select',
-                    'placeholder': 'Выберите категорию'
-                }
-            ),
-            'subcategory': forms.Select(
-                attrs={
-                    'class': 'form-select',
-                    'placeholder': 'Выберите подкатегорию',
-                    'disabled': True  # Поле будет разблокировано после выбора категории
-                }
+            # Справочники - выпадающие списки с поиском (варианты подгружаются)
+            'status': TypeaheadSelect('status'),
+            'type': TypeaheadSelect('type'),
+            'category': TypeaheadSelect('category'),
+            'subcategory': TypeaheadSelect(
+                'subcategory',
+                depends_on='id_category',
+                attrs={'disabled': True}  # Поле будет разблокировано после выбора категории
             ),
             'amount': forms.NumberInput(
                 attrs={
@@ -180,4 +191,45 @@ class CashFlowForm(forms.ModelForm):
         # Если форма редактирует существующую запись
         elif self.instance.pk:
             self.fields['subcategory'].queryset = self.instance.category.subcategory_set.all()
-            self.fields['subcategory'].widget.attrs['disabled'] = False
\ No newline at end of file
+            self.fields['subcategory'].widget.attrs['disabled'] = False
+
+    def clean_date(self):
+        """Операции нельзя добавлять в закрытые месяцы или переносить в них"""
+        value = self.cleaned_data['date']
+        if value and periods.is_closed(value):
+            raise ValidationError(_('Период %(month)s закрыт, изменения в нем запрещены'),
+                                  params={'month': value.strftime('%m.%Y')})
+        return value
+
+
+class BudgetForm(OrganizationChoicesMixin, forms.ModelForm):
+    """Бюджет расходов на месяц по категории или подкатегории"""
+    month = forms.DateField(
+        label='Месяц',
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(format='%Y-%m', attrs={'type': 'month', 'class': 'form-control'}),
+    )
+
+    class Meta:
+        model = Budget
+        fields = ['month', 'category', 'subcategory', 'amount']
+        widgets = {
+            'category': TypeaheadSelect('category'),
+            'subcategory': TypeaheadSelect('subcategory', depends_on='id_category'),
+            'amount': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Сумма в рублях'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].empty_label = 'Выберите категорию'
+        self.fields['subcategory'].empty_label = 'Вся категория'
+
+    def clean_month(self):
+        return self.cleaned_data['month'].replace(day=1)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        category, subcategory = cleaned_data.get('category'), cleaned_data.get('subcategory')
+        if category and subcategory and subcategory.category_id != category.pk:
+            self.add_error('subcategory', 'Подкатегория не относится к выбранной категории')
+        return cleaned_data
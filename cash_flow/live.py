@@ -0,0 +1,202 @@
+"""
+Поток изменений для открытой страницы операций (Server-Sent Events).
+
+Журнал изменений организации опрашивает один на процесс Broadcaster и
+раздает события всем ее подписчикам через очереди asyncio: число запросов
+к БД не зависит от числа открытых страниц. Поток работает только под ASGI
+(DDS/asgi.py): под WSGI каждая открытая страница занимала бы поток сервера.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.text import Truncator
+
+from . import changefeed, tenancy
+from .models import CashFlowRow, ChangeLogEntry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# Отставший подписчик (переполненная очередь) получает reset и перезагружает страницу
+QUEUE_SIZE = 1000
+HEARTBEAT_SECONDS = 15
+
+ROW_FIELDS = ['cashflow_id', 'date', 'amount', 'is_income', 'status_id', 'type_id', 'category_id',
+              'subcategory_id', 'status_name', 'type_name', 'category_name', 'subcategory_name',
+              'comment_excerpt']
+
+
+def last_seq():
+    """Курсор последней записи журнала изменений"""
+    return ChangeLogEntry.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def compact_events(cursor, limit=BATCH_SIZE):
+    """
+    События после курсора в компактном для страницы виде.
+
+    Для операций передается строка списка в том виде, в каком ее выводит
+    index.html; для справочников - новое название.
+    """
+    changes, next_cursor, has_more = changefeed.read(cursor, limit)
+    row_ids = [change['id'] for change in changes
+               if change['model'] == 'cashflow' and change['action'] == ChangeLogEntry.UPSERT]
+    rows = {row['cashflow_id']: row for row in
+            CashFlowRow.objects.filter(cashflow_id__in=row_ids).values(*ROW_FIELDS)} if row_ids else {}
+
+    events = []
+    for change in changes:
+        event = {key: change[key] for key in ('seq', 'model', 'id', 'action')}
+        if change['action'] == ChangeLogEntry.UPSERT:
+            if change['model'] == 'cashflow':
+                row = rows.get(change['id'])
+                if row is None:
+                    continue
+                row['date'] = row['date'].strftime('%d.%m.%Y')
+                row['amount'] = str(row['amount'])
+                row['comment_excerpt'] = Truncator(row['comment_excerpt']).chars(30)
+                event['row'] = row
+            else:
+                event['name'] = change['data']['name']
+        events.append(event)
+    return events, next_cursor, has_more
+
+
+def _last_seq(organization):
+    with tenancy.activate(organization):
+        return last_seq()
+
+
+def _compact_events(organization, cursor):
+    with tenancy.activate(organization):
+        return compact_events(cursor)
+
+
+def _poll(organization, cursor):
+    try:
+        return _compact_events(organization, cursor)
+    finally:
+        close_old_connections()
+
+
+class Subscription:
+    """Очередь событий одной открытой страницы"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    def push(self, event):
+        """False - очередь переполнена, подписка снимается"""
+        if self.queue.qsize() >= QUEUE_SIZE:
+            self.queue.put_nowait(None)
+            return False
+        self.queue.put_nowait(event)
+        return True
+
+
+class Broadcaster:
+    """
+    Раздача изменений организации ее подписчикам.
+
+    Опрос журнала идет, пока есть подписчики: раз в
+    CASH_FLOW_LIVE_POLL_SECONDS один запрос по индексу (организация, курсор).
+    """
+
+    def __init__(self, organization):
+        self.organization = organization
+        self.subscribers = set()
+        self.cursor = 0
+        self._task = None
+
+    async def subscribe(self):
+        subscription = Subscription()
+        if self._task is None or self._task.done():
+            self.cursor = await sync_to_async(_last_seq)(self.organization)
+            self._task = asyncio.create_task(self._run())
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    async def _run(self):
+        interval = getattr(settings, 'CASH_FLOW_LIVE_POLL_SECONDS', 1)
+        while self.subscribers:
+            await asyncio.sleep(interval)
+            try:
+                events, self.cursor, _ = await sync_to_async(_poll)(self.organization, self.cursor)
+            except Exception:
+                logger.exception('Ошибка чтения журнала изменений')
+                continue
+            if not events:
+                continue
+            for subscription in list(self.subscribers):
+                for event in events:
+                    if not subscription.push(event):
+                        self.unsubscribe(subscription)
+                        break
+
+
+_broadcasters = {}
+_loop = None
+
+
+def get_broadcaster(organization):
+    """Broadcaster организации в текущем цикле событий (один на процесс ASGI-сервера)"""
+    global _loop
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        _broadcasters.clear()
+        _loop = loop
+    broadcaster = _broadcasters.get(organization.pk)
+    if broadcaster is None:
+        broadcaster = _broadcasters[organization.pk] = Broadcaster(organization)
+    return broadcaster
+
+
+def _format(event):
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event['seq']}\nevent: change\ndata: {data}\n\n"
+
+
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+async def stream(organization, cursor=None):
+    """
+    Поток событий SSE организации после курсора.
+
+    Пропущенные с момента отрисовки страницы (или разрыва соединения)
+    изменения досылаются из журнала; если их слишком много - reset.
+    Организация передается явно: поток читается после выхода из middleware.
+    """
+    broadcaster = get_broadcaster(organization)
+    subscription = await broadcaster.subscribe()
+    try:
+        yield 'retry: 3000\n\n'
+        sent = 0
+        if cursor is not None:
+            events, sent, has_more = await sync_to_async(_compact_events)(organization, cursor)
+            if has_more:
+                yield RESET
+                return
+            for event in events:
+                yield _format(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'  # Держит соединение открытым через прокси
+                continue
+            if event is None:
+                yield RESET
+                return
+            if event['seq'] <= sent:
+                continue
+            yield _format(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
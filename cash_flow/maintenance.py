@@ -0,0 +1,210 @@
+"""
+Обслуживание базы SQLite: статистика планировщика, возврат свободного
+места, проверка целостности и отчет о размере.
+
+Каждый шаг выполняется порциями - по таблице или по step страниц, -
+каждая порция отдельным коротким оператором (своей транзакцией) с паузой
+между ними, и останавливается по истечении отведенного времени. Запросы
+приложения ждут блокировку не дольше одной порции; объекты, до которых
+шаг не дошел, выводятся в отчете.
+"""
+import time
+from datetime import date
+
+from django.db import connection
+
+from . import budgets, recurring, tenancy
+from .models import CashFlow, CashFlowRow, ChangeLogEntry, Organization
+
+# Режимы PRAGMA auto_vacuum
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+INCREMENTAL = 2
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def _pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+def _objects(kind):
+    """Таблицы или индексы базы (kind - 'table' или 'index'), кроме служебных"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = %s AND name NOT LIKE 'sqlite_%%' ORDER BY name", [kind])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class Deadline:
+    """Отведенное шагу время: seconds секунд, пауза pause между порциями"""
+
+    def __init__(self, seconds, pause=0):
+        self.until = time.monotonic() + seconds
+        self.pause = pause
+
+    def expired(self):
+        return time.monotonic() >= self.until
+
+    def rest(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+
+# ======================== ОТЧЕТ ========================
+def _analyzed_tables():
+    """Таблицы, для которых есть статистика ANALYZE"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if not cursor.fetchone()[0]:
+            return []
+        cursor.execute('SELECT DISTINCT tbl FROM sqlite_stat1')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def summary():
+    """Размер файла, свободные страницы и режимы базы"""
+    page_size, page_count, freelist = _pragma('page_size'), _pragma('page_count'), _pragma('freelist_count')
+    return {
+        'size': page_size * page_count,
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist,
+        # Доля свободных страниц: место, которое вернет VACUUM
+        'free_ratio': freelist / page_count if page_count else 0,
+        'auto_vacuum': AUTO_VACUUM_MODES.get(_pragma('auto_vacuum'), '?'),
+        'journal_mode': _pragma('journal_mode'),
+        # Пустые таблицы строк статистики не получают
+        'analyzed_tables': len(_analyzed_tables()),
+    }
+
+
+def object_sizes(deadline):
+    """
+    Размер таблиц и индексов по dbstat: (имя, байт, неиспользуемых байт) -
+    по одному объекту за запрос. Неиспользуемое место внутри страниц -
+    фрагментация, которую убирает VACUUM. Возвращает (размеры, не успели).
+    """
+    sizes, names = [], _objects('table') + _objects('index')
+    with connection.cursor() as cursor:
+        for position, name in enumerate(names):
+            if deadline.expired():
+                return sizes, names[position:]
+            cursor.execute(
+                'SELECT sum(pgsize), sum(unused) FROM dbstat WHERE name = %s AND aggregate = 1', [name])
+            size, unused = cursor.fetchone()
+            sizes.append((name, size or 0, unused or 0))
+            deadline.rest()
+    sizes.sort(key=lambda row: row[1], reverse=True)
+    return sizes, []
+
+
+def representative_queries():
+    """Основные запросы приложения - по ним проверяется выбор индексов"""
+    today = date.today()
+    month = today.replace(day=1)
+    return [
+        ('Список операций', CashFlowRow.objects.order_by('-date', '-pk')[:20]),
+        ('Список за период', CashFlowRow.objects.filter(date__range=[month, today]).order_by('-date', '-pk')[:20]),
+        ('Остаток на дату', CashFlow.objects.filter(date__gt=month, date__lte=today).values_list('type', 'amount')),
+        ('Корзина', CashFlow.all_objects.filter(deleted_at__isnull=False).order_by('-deleted_at', '-pk')[:50]),
+        ('Лента изменений', ChangeLogEntry.objects.filter(pk__gt=0).order_by('pk')[:500]),
+        ('Бюджеты операции', budgets.matching(month, 0, 0)),
+        ('Повторяющиеся операции', recurring.due_templates(today)),
+    ]
+
+
+def query_plans():
+    """
+    Планы основных запросов (EXPLAIN QUERY PLAN) от имени первой организации:
+    какие индексы выбирает планировщик. Счетчиков использования индексов
+    SQLite не ведет.
+    """
+    organization = Organization.objects.order_by('pk').first()
+    with tenancy.activate(organization):
+        return [(label, queryset.explain()) for label, queryset in representative_queries()]
+
+
+# ======================== ОБСЛУЖИВАНИЕ ========================
+def analyze(deadline, limit=1000):
+    """
+    Обновление статистики планировщика (sqlite_stat1) по таблице за оператор.
+
+    analysis_limit ограничивает число строк, читаемых по каждому индексу:
+    ANALYZE большой таблицы занимает доли секунды. Таблицы без статистики
+    - первыми. Возвращает (обработанные таблицы, не успели).
+    """
+    analyzed = set(_analyzed_tables())
+    tables = sorted(_objects('table'), key=lambda table: table in analyzed)
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA analysis_limit = {int(limit)}')
+        for position, table in enumerate(tables):
+            if deadline.expired():
+                return tables[:position], tables[position:]
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(table)}')
+            deadline.rest()
+    return tables, []
+
+
+def incremental_vacuum(deadline, step=1000):
+    """
+    Возврат свободных страниц в файловую систему по step страниц за оператор.
+
+    Работает только в режиме auto_vacuum=incremental (enable_incremental_vacuum).
+    Возвращает число освобожденных страниц или None, если режим другой.
+    """
+    if _pragma('auto_vacuum') != INCREMENTAL:
+        return None
+    freed = 0
+    with connection.cursor() as cursor:
+        while not deadline.expired():
+            before = _pragma('freelist_count')
+            if not before:
+                break
+            # Модуль sqlite3 выполняет в execute() один шаг прагмы - одну
+            # страницу; executescript() выполняет ее до конца
+            cursor.cursor.executescript(f'PRAGMA incremental_vacuum({int(step)})')
+            freed += before - _pragma('freelist_count')
+            deadline.rest()
+    return freed
+
+
+def enable_incremental_vacuum():
+    """
+    Перевод базы в режим auto_vacuum=incremental.
+
+    Режим меняется только полным VACUUM: он перезаписывает весь файл и
+    блокирует базу на все время работы - только в окно обслуживания.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+def check_integrity(deadline, full=False):
+    """
+    Проверка целостности по таблице (с ее индексами) за оператор.
+
+    quick_check не сверяет индексы с таблицами, integrity_check (full=True)
+    сверяет, но читает больше. Внешние ключи проверяет foreign_key_check.
+    Возвращает (ошибки [(таблица, сообщение)], не успели).
+    """
+    check = 'integrity_check' if full else 'quick_check'
+    problems, tables = [], _objects('table')
+    with connection.cursor() as cursor:
+        for position, table in enumerate(tables):
+            if deadline.expired():
+                return problems, tables[position:]
+            quoted = connection.ops.quote_name(table)
+            cursor.execute(f'PRAGMA {check}({quoted})')
+            problems += [(table, row[0]) for row in cursor.fetchall() if row[0] != 'ok']
+            cursor.execute(f'PRAGMA foreign_key_check({quoted})')
+            problems += [
+                (table, f'строка {rowid}: нет записи в {parent}')
+                for _, rowid, parent, _ in cursor.fetchall()
+            ]
+            deadline.rest()
+    return problems, []
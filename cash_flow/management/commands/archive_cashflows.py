@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cash_flow import archive, tenancy
+
+
+class Command(BaseCommand):
+    """
+    Перенос операций закрытых месяцев старше горизонта в архив.
+
+    Запускается по расписанию (например, раз в месяц после закрытия
+    периода). Каждый месяц переносится отдельной транзакцией; организации
+    обрабатываются по очереди.
+    """
+    help = 'Переносит операции закрытых месяцев старше горизонта в архив (ArchivedCashFlow)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=None,
+            help='Сколько последних месяцев держать в горячих таблицах '
+                 '(по умолчанию CASH_FLOW_ARCHIVE_MONTHS)',
+        )
+        parser.add_argument(
+            '--restore',
+            action='store_true',
+            help='Вернуть из архива операции последнего архивного месяца',
+        )
+        tenancy.add_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['months'] is not None and options['months'] < 0:
+            raise CommandError('Число месяцев не может быть отрицательным')
+        organizations = tenancy.selected(options['organization'])
+        if not organizations:
+            raise CommandError('Организация не найдена')
+        for organization in organizations:
+            with tenancy.activate(organization):
+                if options['restore']:
+                    self.restore(organization)
+                else:
+                    self.archive(organization, options['months'])
+
+    def restore(self, organization):
+        result = archive.restore_last()
+        if result is None:
+            self.stdout.write(f'{organization}: архив пуст')
+            return
+        month, restored = result
+        self.stdout.write(self.style.SUCCESS(f'{organization}: возвращено операций за {month:%m.%Y}: {restored}'))
+
+    def archive(self, organization, months):
+        total = 0
+        for period in archive.archivable_periods(months):
+            moved = archive.archive_month(period)
+            total += moved
+            self.stdout.write(f'{organization}, {period}: {moved}')
+        self.stdout.write(self.style.SUCCESS(f'{organization}: перенесено в архив операций: {total}'))
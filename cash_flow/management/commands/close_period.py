@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from cash_flow import periods, tenancy
+
+
+class Command(BaseCommand):
+    """
+    Закрытие месяца (или открытие последнего закрытого).
+
+    Без аргументов закрывает следующий по порядку месяц с операциями.
+    Организации обрабатываются по очереди; ошибка в одной из них не
+    останавливает остальные.
+    """
+    help = 'Закрывает месяц: сохраняет итоги и запрещает изменение операций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', nargs='?', help='Месяц в формате ГГГГ-ММ')
+        parser.add_argument(
+            '--reopen',
+            action='store_true',
+            help='Открыть последний закрытый месяц',
+        )
+        tenancy.add_argument(parser)
+
+    def handle(self, *args, **options):
+        month = None
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Месяц должен быть в формате ГГГГ-ММ')
+        organizations = tenancy.selected(options['organization'])
+        if not organizations:
+            raise CommandError('Организация не найдена')
+
+        failed = []
+        for organization in organizations:
+            with tenancy.activate(organization):
+                try:
+                    result = self.reopen() if options['reopen'] else self.close(month)
+                except ValidationError as e:
+                    failed.append(organization)
+                    self.stderr.write(f'{organization}: {e.messages[0]}')
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{organization}: {result}'))
+        if failed:
+            raise CommandError(f'Не обработано организаций: {len(failed)}')
+
+    def reopen(self):
+        month = periods.reopen_last()
+        return f'период {month:%m.%Y} открыт'
+
+    def close(self, month):
+        if month is None:
+            month = periods.next_month_to_close()
+            if month is None:
+                raise ValidationError('Нет операций в открытых периодах')
+        period = periods.close_month(month)
+        return (f'период {period} закрыт: {period.snapshots.count()} строк итогов, '
+                f'остаток {period.closing_balance}')
@@ -0,0 +1,134 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cash_flow import maintenance
+
+STEPS = ('analyze', 'vacuum', 'check', 'sizes', 'plans')
+
+
+def _size(size):
+    if size < 1024 * 1024:
+        return f'{size / 1024:.0f} КБ'
+    return f'{size / 1024 / 1024:.1f} МБ'
+
+
+class Command(BaseCommand):
+    """
+    Обслуживание базы SQLite после массовых загрузок и удалений.
+
+    Шаги по порядку: статистика планировщика (ANALYZE), возврат свободных
+    страниц (incremental_vacuum), проверка целостности, отчет о размере
+    таблиц и индексов и планы основных запросов. Каждый шаг выполняется
+    короткими операторами не дольше --max-seconds. Запускается по
+    расписанию, например раз в сутки в нерабочие часы.
+    """
+    help = 'Обновляет статистику, освобождает место и проверяет целостность базы SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-seconds', type=float, default=30,
+            help='Сколько секунд отводится каждому шагу (по умолчанию 30)',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='Пауза между порциями в секундах (по умолчанию 0.05)',
+        )
+        parser.add_argument(
+            '--analysis-limit', type=int, default=1000,
+            help='Сколько строк каждого индекса читает ANALYZE (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--vacuum-step', type=int, default=1000,
+            help='Сколько страниц освобождать за оператор (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Сколько самых больших таблиц и индексов выводить (по умолчанию 15)',
+        )
+        parser.add_argument(
+            '--skip', action='append', choices=STEPS, default=[],
+            help='Пропустить шаг (можно указать несколько раз)',
+        )
+        parser.add_argument(
+            '--full-check',
+            action='store_true',
+            help='integrity_check вместо quick_check (сверяет индексы с таблицами)',
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum',
+            action='store_true',
+            help='Перевести базу в режим auto_vacuum=incremental полным VACUUM '
+                 '(блокирует базу на все время - только в окно обслуживания)',
+        )
+
+    def handle(self, *args, **options):
+        if not maintenance.is_supported():
+            raise CommandError('Команда поддерживает только SQLite')
+        if options['max_seconds'] <= 0 or options['vacuum_step'] < 1 or options['analysis_limit'] < 0:
+            raise CommandError('Время, размер порции и лимит ANALYZE должны быть положительными')
+        skip = set(options['skip'])
+
+        def deadline():
+            return maintenance.Deadline(options['max_seconds'], options['pause'])
+
+        if options['enable_incremental_vacuum']:
+            self.stdout.write('Полный VACUUM с переводом в режим auto_vacuum=incremental...')
+            maintenance.enable_incremental_vacuum()
+
+        before = maintenance.summary()
+        self.write_summary(before)
+
+        if 'analyze' not in skip:
+            analyzed, rest = maintenance.analyze(deadline(), options['analysis_limit'])
+            self.stdout.write(f'ANALYZE: таблиц {len(analyzed)}')
+            self.write_rest(rest)
+
+        if 'vacuum' not in skip:
+            freed = maintenance.incremental_vacuum(deadline(), options['vacuum_step'])
+            if freed is None:
+                if before['freelist_count']:
+                    self.stdout.write(self.style.WARNING(
+                        f'Свободных страниц: {before["freelist_count"]}, но auto_vacuum={before["auto_vacuum"]}: '
+                        'место вернет только полный VACUUM (--enable-incremental-vacuum)'))
+            else:
+                self.stdout.write(f'Освобождено страниц: {freed} ({_size(freed * before["page_size"])})')
+
+        problems = []
+        if 'check' not in skip:
+            problems, rest = maintenance.check_integrity(deadline(), full=options['full_check'])
+            for table, message in problems:
+                self.stdout.write(self.style.ERROR(f'{table}: {message}'))
+            if not problems:
+                self.stdout.write(self.style.SUCCESS('Целостность: ошибок нет'))
+            self.write_rest(rest)
+
+        if 'sizes' not in skip:
+            sizes, rest = maintenance.object_sizes(deadline())
+            self.stdout.write('\nСамые большие таблицы и индексы (размер, не занято внутри страниц):')
+            for name, size, unused in sizes[:options['top']]:
+                share = unused / size if size else 0
+                self.stdout.write(f'  {name}: {_size(size)}, {share:.0%}')
+            self.write_rest(rest)
+
+        if 'plans' not in skip:
+            self.stdout.write('\nПланы основных запросов:')
+            for label, plan in maintenance.query_plans():
+                self.stdout.write(f'  {label}:')
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        self.stdout.write('')
+        self.write_summary(maintenance.summary())
+        if problems:
+            raise CommandError(f'Найдено ошибок целостности: {len(problems)}')
+
+    def write_summary(self, summary):
+        self.stdout.write(
+            f'Размер: {_size(summary["size"])}, свободных страниц: {summary["freelist_count"]} '
+            f'({summary["free_ratio"]:.1%}), auto_vacuum={summary["auto_vacuum"]}, '
+            f'journal_mode={summary["journal_mode"]}, '
+            f'таблиц со статистикой: {summary["analyzed_tables"]}'
+        )
+
+    def write_rest(self, rest):
+        if rest:
+            self.stdout.write(self.style.WARNING(f'  Не успели (время шага истекло): {", ".join(rest)}'))
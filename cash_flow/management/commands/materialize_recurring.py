@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cash_flow import recurring, tenancy
+from cash_flow.filters import parse_date
+
+
+class Command(BaseCommand):
+    """
+    Создание операций по шаблонам повторяющихся операций.
+
+    Запускается по расписанию (например, раз в сутки). Повторный запуск
+    за тот же день ничего не создает; после простоя создаются все
+    пропущенные повторения. Организации обрабатываются по очереди.
+    """
+    help = 'Создает операции по всем наступившим повторениям шаблонов повторяющихся операций'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until', default=None,
+            help='Создать повторения по эту дату включительно, ГГГГ-ММ-ДД (по умолчанию сегодня)',
+        )
+        tenancy.add_argument(parser)
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            until = parse_date(options['until'])
+            if until is None:
+                raise CommandError('Дата должна быть в формате ГГГГ-ММ-ДД')
+        organizations = tenancy.selected(options['organization'])
+        if not organizations:
+            raise CommandError('Организация не найдена')
+        for organization in organizations:
+            with tenancy.activate(organization):
+                created = recurring.materialize(until)
+            self.stdout.write(self.style.SUCCESS(f'{organization}: создано операций: {created}'))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cash_flow import changefeed
+
+
+class Command(BaseCommand):
+    """
+    Удаление старых записей журнала изменений.
+
+    Граница очистки запоминается: потребители с курсором до нее получат от
+    /api/changes/ ответ 410 и должны выполнить полную выгрузку.
+    """
+    help = 'Удаляет записи журнала изменений старше указанного числа дней'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help='Сколько дней хранить записи (по умолчанию 90)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('Число дней должно быть положительным')
+        border = timezone.now() - timedelta(days=options['days'])
+        deleted = changefeed.prune(border)
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей журнала: {deleted}'))
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cash_flow import services
+
+
+class Command(BaseCommand):
+    """
+    Физическое удаление записей, удаленных (мягко) раньше указанного срока.
+
+    Запускается по расписанию в нерабочие часы: записи удаляются пачками
+    в коротких транзакциях с паузой между ними. До удаления записи можно
+    восстановить из корзины.
+    """
+    help = 'Физически удаляет операции и записи справочников, удаленные раньше указанного числа дней'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Сколько дней хранить удаленные записи в корзине (по умолчанию 30)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки (по умолчанию 1000)',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Пауза между пачками в секундах (по умолчанию 0.1)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('Число дней не может быть отрицательным')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+        border = timezone.now() - timedelta(days=options['days'])
+        purged = services.purge(border, batch_size=options['batch_size'], pause=options['pause'])
+        for name, count in purged.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {sum(purged.values())}'))
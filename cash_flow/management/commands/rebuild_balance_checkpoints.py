@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cash_flow import tenancy
+from cash_flow.balances import rebuild_checkpoints
+from cash_flow.filters import parse_date
+
+
+class Command(BaseCommand):
+    """
+    Пересоздание контрольных точек остатка на конец каждого месяца.
+
+    Запускается по расписанию (например, раз в сутки) и после массовых
+    изменений операций. По умолчанию точки строятся до конца прошлого месяца:
+    текущий месяц часто меняется, и точки в нем быстро устаревали бы.
+    Точки у каждой организации свои.
+    """
+    help = 'Пересоздает контрольные точки остатка на конец каждого месяца'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until',
+            help='Последняя дата для точек (ГГГГ-ММ-ДД), по умолчанию - конец прошлого месяца',
+        )
+        tenancy.add_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['until']:
+            until = parse_date(options['until'])
+            if until is None:
+                raise CommandError('Дата должна быть в формате ГГГГ-ММ-ДД')
+        else:
+            until = date.today().replace(day=1) - timedelta(days=1)
+
+        organizations = tenancy.selected(options['organization'])
+        if not organizations:
+            raise CommandError('Организация не найдена')
+        for organization in organizations:
+            with tenancy.activate(organization):
+                created = rebuild_checkpoints(until)
+            self.stdout.write(self.style.SUCCESS(
+                f'{organization}: создано контрольных точек: {created} (до {until})'))
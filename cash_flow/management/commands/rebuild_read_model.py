@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from cash_flow import read_model
+
+
+class Command(BaseCommand):
+    """
+    Проверка и восстановление денормализованной модели чтения CashFlowRow.
+
+    По умолчанию пересобираются только отсутствующие и устаревшие строки.
+    """
+    help = 'Проверяет и пересобирает строки списка операций (CashFlowRow)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить, без исправления (код выхода 1 при расхождениях)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересобрать все строки',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Размер пачки при пересборке (по умолчанию 2000)',
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            written = read_model.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Пересобрано строк: {written}'))
+            return
+
+        ids = read_model.inconsistent_ids()
+        if not ids:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'Отсутствующих или устаревших строк: {len(ids)}'))
+        if options['check']:
+            raise SystemExit(1)
+        written = read_model.rebuild(ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано строк: {written}'))
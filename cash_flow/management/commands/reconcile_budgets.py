@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from cash_flow import budgets
+
+
+class Command(BaseCommand):
+    """
+    Сверка фактов бюджетов с операциями.
+
+    Факты обновляются приращениями при изменении операций; команда
+    пересчитывает их целиком (например, после загрузки данных в обход
+    приложения) и исправляет расходящиеся.
+    """
+    help = 'Сверяет и исправляет факты бюджетов по операциям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить, без исправления (код выхода 1 при расхождениях)',
+        )
+
+    def handle(self, *args, **options):
+        wrong = budgets.reconcile(fix=not options['check'])
+        if not wrong:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+
+        for budget in wrong:
+            self.stdout.write(f'{budget}: факт {budget.actual}')
+        if options['check']:
+            self.stdout.write(self.style.WARNING(f'Бюджетов с расхождениями: {len(wrong)}'))
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS(f'Исправлено бюджетов: {len(wrong)}'))
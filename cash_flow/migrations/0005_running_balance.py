@@ -0,0 +1,107 @@
+# Generated by Django 5.2 on 2026-10-19 09:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+INCOME_TYPE_NAMES = {'пополнение', 'доход', 'поступление'}
+
+
+def mark_income_types(apps, schema_editor):
+    """Существующие типы пополнения увеличивают остаток"""
+    Type = apps.get_model('cash_flow', 'Type')
+    income_ids = [pk for pk, name in Type.objects.values_list('pk', 'name') if name.lower() in INCOME_TYPE_NAMES]
+    Type.objects.filter(pk__in=income_ids).update(is_income=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0004_alter_category_unique_together_alter_category_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата точки')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Остаток на конец дня')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата расчета')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка остатка',
+                'verbose_name_plural': 'Контрольные точки остатка',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='cashflow',
+            options={'ordering': ['-date'], 'verbose_name': 'Денежный поток', 'verbose_name_plural': 'Денежные потоки'},
+        ),
+        migrations.AlterModelOptions(
+            name='subcategory',
+            options={'verbose_name': 'Подкатегория', 'verbose_name_plural': 'Подкатегории'},
+        ),
+        migrations.AddField(
+            model_name='type',
+            name='is_income',
+            field=models.BooleanField(default=False, verbose_name='Пополнение (увеличивает остаток)'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='comment',
+            field=models.TextField(blank=True, null=True, verbose_name='Комментарий'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='date',
+            field=models.DateField(db_index=True, verbose_name='Дата операции'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cash_flow.type', verbose_name='Тип операции'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Название категории'),
+        ),
+        migrations.AlterField(
+            model_name='status',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Название статуса'),
+        ),
+        migrations.AlterField(
+            model_name='subcategory',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cash_flow.category', verbose_name='Родительская категория'),
+        ),
+        migrations.AlterField(
+            model_name='subcategory',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название подкатегории'),
+        ),
+        migrations.AlterField(
+            model_name='type',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Тип операции'),
+        ),
+        migrations.RunPython(mark_income_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-19 09:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0005_running_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Месяц')),
+                ('closing_balance', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Остаток на конец месяца')),
+                ('closed_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата закрытия')),
+            ],
+            options={
+                'verbose_name': 'Закрытый период',
+                'verbose_name_plural': 'Закрытые периоды',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PeriodSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Сумма операций')),
+                ('count', models.PositiveIntegerField(verbose_name='Количество операций')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cash_flow.category', verbose_name='Категория')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='cash_flow.closedperiod', verbose_name='Период')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cash_flow.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cash_flow.subcategory', verbose_name='Подкатегория')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cash_flow.type', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Итоги закрытого периода',
+                'verbose_name_plural': 'Итоги закрытых периодов',
+            },
+        ),
+    ]
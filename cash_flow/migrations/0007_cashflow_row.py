@@ -0,0 +1,69 @@
+# Generated by Django 5.2 on 2026-10-19 09:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_rows(apps, schema_editor):
+    """Заполнение строк списка для существующих операций пачками"""
+    CashFlow = apps.get_model('cash_flow', 'CashFlow')
+    CashFlowRow = apps.get_model('cash_flow', 'CashFlowRow')
+    operations = CashFlow.objects.select_related('status', 'type', 'category', 'subcategory').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(operations.filter(pk__gt=last_pk)[:2000])
+        if not batch:
+            break
+        CashFlowRow.objects.bulk_create(
+            CashFlowRow(
+                cashflow_id=cashflow.pk,
+                date=cashflow.date,
+                amount=cashflow.amount,
+                is_income=cashflow.type.is_income,
+                comment_excerpt=(cashflow.comment or '')[:255],
+                status_id=cashflow.status_id,
+                type_id=cashflow.type_id,
+                category_id=cashflow.category_id,
+                subcategory_id=cashflow.subcategory_id,
+                status_name=cashflow.status.name,
+                type_name=cashflow.type.name,
+                category_name=cashflow.category.name,
+                subcategory_name=cashflow.subcategory.name,
+            )
+            for cashflow in batch
+        )
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0006_closed_periods'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowRow',
+            fields=[
+                ('cashflow', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='row', serialize=False, to='cash_flow.cashflow', verbose_name='Операция')),
+                ('date', models.DateField(db_index=True, verbose_name='Дата операции')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('is_income', models.BooleanField(verbose_name='Пополнение')),
+                ('comment_excerpt', models.CharField(blank=True, max_length=255, verbose_name='Комментарий (начало)')),
+                ('status_name', models.CharField(max_length=100, verbose_name='Статус (название)')),
+                ('type_name', models.CharField(max_length=100, verbose_name='Тип (название)')),
+                ('category_name', models.CharField(max_length=100, verbose_name='Категория (название)')),
+                ('subcategory_name', models.CharField(max_length=100, verbose_name='Подкатегория (название)')),
+                ('category', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.subcategory', verbose_name='Подкатегория')),
+                ('type', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.type', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Строка списка операций',
+                'verbose_name_plural': 'Строки списка операций',
+                'ordering': ['-date', '-cashflow'],
+            },
+        ),
+        migrations.RunPython(fill_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 09:53
+
+from django.db import migrations, models
+
+
+def fill_changelog(apps, schema_editor):
+    """Начальная лента: существующие объекты как изменения (справочники первыми)"""
+    ChangeLogEntry = apps.get_model('cash_flow', 'ChangeLogEntry')
+    for name, model_name in [('status', 'Status'), ('type', 'Type'), ('category', 'Category'),
+                             ('subcategory', 'SubCategory'), ('cashflow', 'CashFlow')]:
+        ids = apps.get_model('cash_flow', model_name).objects.order_by('pk').values_list('pk', flat=True)
+        batch = []
+        for pk in ids.iterator(chunk_size=2000):
+            batch.append(ChangeLogEntry(model=name, object_id=pk, action='upsert'))
+            if len(batch) >= 2000:
+                ChangeLogEntry.objects.bulk_create(batch)
+                batch = []
+        ChangeLogEntry.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0007_cashflow_row'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('action', models.CharField(choices=[('upsert', 'Создание или изменение'), ('delete', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала изменений',
+                'verbose_name_plural': 'Журнал изменений',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(fill_changelog, migrations.RunPython.noop),
+    ]
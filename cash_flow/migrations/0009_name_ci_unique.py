@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-19 09:56
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0008_changelog'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='subcategory',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название категории'),
+        ),
+        migrations.AlterField(
+            model_name='status',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название статуса'),
+        ),
+        migrations.AlterField(
+            model_name='type',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Тип операции'),
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='category_name_ci_unique', violation_error_message='Категория с таким названием уже существует'),
+        ),
+        migrations.AddConstraint(
+            model_name='status',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='status_name_ci_unique', violation_error_message='Статус с таким названием уже существует'),
+        ),
+        migrations.AddConstraint(
+            model_name='subcategory',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), models.F('category'), name='subcategory_name_ci_unique', violation_error_message='Подкатегория с таким названием уже существует в выбранной категории'),
+        ),
+        migrations.AddConstraint(
+            model_name='type',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='type_name_ci_unique', violation_error_message='Тип с таким названием уже существует'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 09:58
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0009_name_ci_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='subcategory',
+            name='subcategory_name_ci_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='subcategory',
+            constraint=models.UniqueConstraint(models.F('category'), django.db.models.functions.text.Lower('name'), name='subcategory_name_ci_unique', violation_error_message='Подкатегория с таким названием уже существует в выбранной категории'),
+        ),
+    ]
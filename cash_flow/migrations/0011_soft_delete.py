@@ -0,0 +1,84 @@
+# Generated by Django 5.2 on 2026-10-19 10:08
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0010_subcategory_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='category',
+            name='category_name_ci_unique',
+        ),
+        migrations.RemoveConstraint(
+            model_name='status',
+            name='status_name_ci_unique',
+        ),
+        migrations.RemoveConstraint(
+            model_name='subcategory',
+            name='subcategory_name_ci_unique',
+        ),
+        migrations.RemoveConstraint(
+            model_name='type',
+            name='type_name_ci_unique',
+        ),
+        migrations.AddField(
+            model_name='cashflow',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалено'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалено'),
+        ),
+        migrations.AddField(
+            model_name='status',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалено'),
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалено'),
+        ),
+        migrations.AddField(
+            model_name='type',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Удалено'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='date',
+            field=models.DateField(verbose_name='Дата операции'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['date'], name='cashflow_alive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='cashflow_deleted_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='category_name_ci_unique', violation_error_message='Категория с таким названием уже существует'),
+        ),
+        migrations.AddConstraint(
+            model_name='status',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='status_name_ci_unique', violation_error_message='Статус с таким названием уже существует'),
+        ),
+        migrations.AddConstraint(
+            model_name='subcategory',
+            constraint=models.UniqueConstraint(models.F('category'), django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='subcategory_name_ci_unique', violation_error_message='Подкатегория с таким названием уже существует в выбранной категории'),
+        ),
+        migrations.AddConstraint(
+            model_name='type',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='type_name_ci_unique', violation_error_message='Тип с таким названием уже существует'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-19 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0011_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='closedperiod',
+            name='archived',
+            field=models.BooleanField(default=False, verbose_name='В архиве'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedCashFlow',
+            fields=[
+                ('date', models.DateField(db_index=True, verbose_name='Дата операции')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('is_income', models.BooleanField(verbose_name='Пополнение')),
+                ('comment_excerpt', models.CharField(blank=True, max_length=255, verbose_name='Комментарий (начало)')),
+                ('status_name', models.CharField(max_length=100, verbose_name='Статус (название)')),
+                ('type_name', models.CharField(max_length=100, verbose_name='Тип (название)')),
+                ('category_name', models.CharField(max_length=100, verbose_name='Категория (название)')),
+                ('subcategory_name', models.CharField(max_length=100, verbose_name='Подкатегория (название)')),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID операции')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('category', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.subcategory', verbose_name='Подкатегория')),
+                ('type', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cash_flow.type', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Архивная операция',
+                'verbose_name_plural': 'Архив операций',
+                'ordering': ['-date', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2 on 2026-10-19 10:16
+
+import cash_flow.models
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+# Денежные поля: суммы переводятся из рублей в целые копейки
+MONEY_FIELDS = [
+    ('CashFlow', 'amount'),
+    ('CashFlowRow', 'amount'),
+    ('ArchivedCashFlow', 'amount'),
+    ('BalanceCheckpoint', 'balance'),
+    ('ClosedPeriod', 'closing_balance'),
+    ('PeriodSnapshot', 'total'),
+]
+
+
+def to_kopecks(apps, schema_editor):
+    """Рубли -> копейки (до смены типа столбцов)"""
+    for model_name, field in MONEY_FIELDS:
+        model = apps.get_model('cash_flow', model_name)
+        model.objects.update(**{field: Round(F(field) * 100)})
+
+
+def to_rubles(apps, schema_editor):
+    """Копейки -> рубли (после возврата типа столбцов)"""
+    for model_name, field in MONEY_FIELDS:
+        model = apps.get_model('cash_flow', model_name)
+        model.objects.update(**{field: F(field) / 100.0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0012_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_kopecks, to_rubles),
+        migrations.RemoveIndex(
+            model_name='cashflow',
+            name='cashflow_alive_date_idx',
+        ),
+        migrations.AlterField(
+            model_name='archivedcashflow',
+            name='amount',
+            field=cash_flow.models.MoneyField(max_digits=12, verbose_name='Сумма'),
+        ),
+        migrations.AlterField(
+            model_name='archivedcashflow',
+            name='date',
+            field=models.DateField(verbose_name='Дата операции'),
+        ),
+        migrations.AlterField(
+            model_name='balancecheckpoint',
+            name='balance',
+            field=cash_flow.models.MoneyField(max_digits=16, verbose_name='Остаток на конец дня'),
+        ),
+        migrations.AlterField(
+            model_name='cashflow',
+            name='amount',
+            field=cash_flow.models.MoneyField(max_digits=12, verbose_name='Сумма'),
+        ),
+        migrations.AlterField(
+            model_name='cashflowrow',
+            name='amount',
+            field=cash_flow.models.MoneyField(max_digits=12, verbose_name='Сумма'),
+        ),
+        migrations.AlterField(
+            model_name='cashflowrow',
+            name='date',
+            field=models.DateField(verbose_name='Дата операции'),
+        ),
+        migrations.AlterField(
+            model_name='closedperiod',
+            name='closing_balance',
+            field=cash_flow.models.MoneyField(max_digits=16, verbose_name='Остаток на конец месяца'),
+        ),
+        migrations.AlterField(
+            model_name='periodsnapshot',
+            name='total',
+            field=cash_flow.models.MoneyField(max_digits=16, verbose_name='Сумма операций'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcashflow',
+            index=models.Index(fields=['date', 'is_income', 'amount'], name='archivedcashflow_date_sum_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['date', 'type', 'amount'], name='cashflow_alive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflowrow',
+            index=models.Index(fields=['date', 'is_income', 'amount'], name='cashflowrow_date_sum_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-19 10:31
+
+import cash_flow.models
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0013_integer_amounts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('amount', cash_flow.models.MoneyField(max_digits=12, verbose_name='Сумма')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('period', models.CharField(choices=[('day', 'День'), ('week', 'Неделя'), ('month', 'Месяц'), ('year', 'Год')], default='month', max_length=5, verbose_name='Период')),
+                ('interval', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Каждые N периодов')),
+                ('start_date', models.DateField(verbose_name='Первое повторение')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Последний день повторений')),
+                ('next_date', models.DateField(editable=False, verbose_name='Следующее повторение')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_operations', to='cash_flow.category', verbose_name='Категория')),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_operations', to='cash_flow.status', verbose_name='Статус')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_operations', to='cash_flow.subcategory', verbose_name='Подкатегория')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_operations', to='cash_flow.type', verbose_name='Тип операции')),
+            ],
+            options={
+                'verbose_name': 'Повторяющаяся операция',
+                'verbose_name_plural': 'Повторяющиеся операции',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cashflow',
+            name='recurring',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='operations', to='cash_flow.recurringoperation', verbose_name='Шаблон повторения'),
+        ),
+        migrations.AddConstraint(
+            model_name='cashflow',
+            constraint=models.UniqueConstraint(fields=('recurring', 'date'), name='cashflow_recurring_date_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringoperation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_date'], name='recurring_due_idx'),
+        ),
+    ]
@@ -0,0 +1,201 @@
+# Generated by Django 5.2 on 2026-10-19 10:43
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Существующие данные относятся к организации по умолчанию - первой
+# записи новой таблицы
+DEFAULT_ORGANIZATION_ID = 1
+
+
+def create_default_organization(apps, schema_editor):
+    Organization = apps.get_model('cash_flow', 'Organization')
+    Organization.objects.create(name='Основная организация', slug='main')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0014_recurring_operations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Organization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+                ('slug', models.SlugField(help_text='Поддомен или значение заголовка X-Organization', unique=True, verbose_name='Код')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Организация',
+                'verbose_name_plural': 'Организации',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(create_default_organization, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='category',
+            name='category_name_ci_unique',
+        ),
+        migrations.RemoveConstraint(
+            model_name='status',
+            name='status_name_ci_unique',
+        ),
+        migrations.RemoveConstraint(
+            model_name='type',
+            name='type_name_ci_unique',
+        ),
+        migrations.RemoveIndex(
+            model_name='archivedcashflow',
+            name='archivedcashflow_date_sum_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cashflow',
+            name='cashflow_deleted_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cashflow',
+            name='cashflow_alive_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cashflowrow',
+            name='cashflowrow_date_sum_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recurringoperation',
+            name='recurring_due_idx',
+        ),
+        migrations.AlterField(
+            model_name='balancecheckpoint',
+            name='date',
+            field=models.DateField(verbose_name='Дата точки'),
+        ),
+        migrations.AlterField(
+            model_name='closedperiod',
+            name='month',
+            field=models.DateField(verbose_name='Месяц'),
+        ),
+        migrations.AddField(
+            model_name='archivedcashflow',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='balancecheckpoint',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='cashflow',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='cashflowrow',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='changelogentry',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='closedperiod',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='periodsnapshot',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recurringoperation',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='status',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='type',
+            name='organization',
+            field=models.ForeignKey(db_index=False, default=DEFAULT_ORGANIZATION_ID, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='archivedcashflow',
+            index=models.Index(fields=['organization', 'date', 'is_income', 'amount'], name='archivedcashflow_date_sum_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['organization', 'date', 'type', 'amount'], name='cashflow_alive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflow',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['organization', 'deleted_at'], name='cashflow_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashflowrow',
+            index=models.Index(fields=['organization', 'date', 'is_income', 'amount'], name='cashflowrow_date_sum_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['organization', 'id'], name='changelog_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='periodsnapshot',
+            index=models.Index(fields=['organization', 'period'], name='periodsnapshot_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringoperation',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['organization', 'next_date'], name='recurring_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='balancecheckpoint',
+            constraint=models.UniqueConstraint(fields=('organization', 'date'), name='checkpoint_date_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(models.F('organization'), django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='category_name_ci_unique', violation_error_message='Категория с таким названием уже существует'),
+        ),
+        migrations.AddConstraint(
+            model_name='closedperiod',
+            constraint=models.UniqueConstraint(fields=('organization', 'month'), name='closedperiod_month_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='status',
+            constraint=models.UniqueConstraint(models.F('organization'), django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='status_name_ci_unique', violation_error_message='Статус с таким названием уже существует'),
+        ),
+        migrations.AddConstraint(
+            model_name='type',
+            constraint=models.UniqueConstraint(models.F('organization'), django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='type_name_ci_unique', violation_error_message='Тип с таким названием уже существует'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 10:51
+
+import cash_flow.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0015_organizations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('amount', cash_flow.models.MoneyField(max_digits=12, verbose_name='Бюджет')),
+                ('actual', cash_flow.models.MoneyField(default=0, editable=False, max_digits=16, verbose_name='Факт')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to='cash_flow.category', verbose_name='Категория')),
+                ('organization', models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cash_flow.organization', verbose_name='Организация')),
+                ('subcategory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to='cash_flow.subcategory', verbose_name='Подкатегория')),
+            ],
+            options={
+                'verbose_name': 'Бюджет',
+                'verbose_name_plural': 'Бюджеты',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'month', 'category', 'subcategory'), name='budget_unique', violation_error_message='Бюджет на этот месяц уже задан'), models.UniqueConstraint(condition=models.Q(('subcategory__isnull', True)), fields=('organization', 'month', 'category'), name='budget_category_unique', violation_error_message='Бюджет категории на этот месяц уже задан')],
+            },
+        ),
+    ]
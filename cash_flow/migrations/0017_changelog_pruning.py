@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_flow', '0016_budgets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogPruning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pruned_until', models.BigIntegerField(default=0, verbose_name='Очищено по курсор')),
+                ('pruned_at', models.DateTimeField(auto_now=True, verbose_name='Дата очистки')),
+            ],
+            options={
+                'verbose_name': 'Очистка журнала изменений',
+                'verbose_name_plural': 'Очистка журнала изменений',
+            },
+        ),
+    ]
@@ -1,46 +1,264 @@
-from django.db import models
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
 
-class Status(models.Model):
+from django import forms
+from django.core import validators
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
+
+from . import tenancy
+
+class MoneyField(models.BigIntegerField):
+    """
+    Денежная сумма: в базе - целое число копеек, в Python - Decimal в рублях.
+
+    Суммы, остатки и нарастающие итоги считаются в SQL целочисленно -
+    точно и без чисел с плавающей точкой; Decimal создается только из
+    выбранного значения (from_db_value). В формах - DecimalField с двумя
+    знаками после запятой, max_digits - как у DecimalField.
+    """
+    description = "Денежная сумма (копейки)"
+    default_error_messages = {
+        'invalid': '«%(value)s» - не денежная сумма',
+    }
+
+    def __init__(self, *args, max_digits=12, **kwargs):
+        self.max_digits = max_digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['max_digits'] = self.max_digits
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        # Ограничение по числу цифр в рублях вместо диапазона BigIntegerField
+        return [*self._validators, validators.DecimalValidator(self.max_digits, 2)]
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(int(value)).scaleb(-2)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        except (InvalidOperation, ValueError):
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        return int((self.to_python(value) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+class Organization(models.Model):
+    """
+    Организация (подразделение): все данные приложения разделены по
+    организациям (cash_flow.tenancy).
+    """
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name="Название"
+    )
+    slug = models.SlugField(
+        max_length=50,
+        unique=True,
+        verbose_name="Код",
+        help_text="Поддомен или значение заголовка X-Organization"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата создания"
+    )
+
+    class Meta:
+        verbose_name = "Организация"
+        verbose_name_plural = "Организации"
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+class TenantManager(models.Manager):
+    """Менеджер записей текущей организации (без нее - всех организаций)"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        organization_id = tenancy.current_id()
+        if organization_id is not None:
+            queryset = queryset.filter(organization_id=organization_id)
+        return queryset
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_organization()
+        return super().bulk_create(objs, *args, **kwargs)
+
+class TenantModel(models.Model):
+    """
+    Базовая модель данных организации.
+
+    Индексы моделей начинаются с организации. Без FK-индекса по одной
+    организации: его заменяют составные индексы.
+    """
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.PROTECT,
+        editable=False,
+        db_index=False,
+        related_name='+',
+        verbose_name="Организация"
+    )
+
+    objects = TenantManager()
+
+    class Meta:
+        abstract = True
+
+    def set_organization(self):
+        """Новая запись относится к текущей организации"""
+        if self.organization_id is None:
+            organization_id = tenancy.current_id()
+            if organization_id is None:
+                raise ValidationError('Организация не выбрана')
+            self.organization_id = organization_id
+
+    def save(self, *args, **kwargs):
+        self.set_organization()
+        super().save(*args, **kwargs)
+
+class AtomicSaveModel(models.Model):
+    """
+    Базовая модель с сохранением в транзакции.
+
+    Обработчики post_save (строки CashFlowRow и т.п.) выполняются в той же
+    транзакции, что и сохранение записи.
+    """
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+class SoftDeleteManager(TenantManager):
+    """Менеджер по умолчанию: только неудаленные записи"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+class SoftDeleteModel(TenantModel, AtomicSaveModel):
+    """
+    Базовая модель с мягким удалением.
+
+    Удаленная запись помечается deleted_at и пропадает из objects (и из
+    форм, связанных менеджеров, админки); все записи - all_objects.
+    Физически удаляется командой purge_deleted, до этого может быть
+    восстановлена из корзины.
+    """
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Удалено"
+    )
+
+    objects = SoftDeleteManager()
+    all_objects = TenantManager()
+
+    class Meta:
+        abstract = True
+
+class Status(SoftDeleteModel):
     """
     Модель статуса операции (например: Бизнес, Личное, Налог)
     """
     name = models.CharField(
         max_length=100, 
-        unique=True,  # Гарантирует уникальность названий
         verbose_name="Название статуса"
     )
+
+    class Meta:
+        constraints = [
+            # Уникальность названия в организации без учета регистра - индекс
+            # по (организация, LOWER(name)); частичный: название удаленной
+            # записи можно занять снова
+            models.UniqueConstraint(
+                'organization', Lower('name'),
+                name='status_name_ci_unique',
+                condition=models.Q(deleted_at__isnull=True),
+                violation_error_message='Статус с таким названием уже существует',
+            ),
+        ]
     
     def __str__(self):
         """Строковое представление объекта (используется в админке и формах)"""
         return self.name
 
-class Type(models.Model):
+class Type(SoftDeleteModel):
     """
     Модель типа операции (например: Пополнение, Списание)
     """
     name = models.CharField(
         max_length=100, 
-        unique=True,
         verbose_name="Тип операции"
     )
+    is_income = models.BooleanField(
+        default=False,  # По умолчанию тип уменьшает остаток (списание)
+        verbose_name="Пополнение (увеличивает остаток)"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                'organization', Lower('name'),
+                name='type_name_ci_unique',
+                condition=models.Q(deleted_at__isnull=True),
+                violation_error_message='Тип с таким названием уже существует',
+            ),
+        ]
     
     def __str__(self):
         return self.name
 
-class Category(models.Model):
+class Category(SoftDeleteModel):
     """
     Модель категории операций (например: Инфраструктура, Маркетинг)
     """
     name = models.CharField(
         max_length=100, 
-        unique=True,
         verbose_name="Название категории"
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                'organization', Lower('name'),
+                name='category_name_ci_unique',
+                condition=models.Q(deleted_at__isnull=True),
+                violation_error_message='Категория с таким названием уже существует',
+            ),
+        ]
     
     def __str__(self):
         return self.name
 
-class SubCategory(models.Model):
+class SubCategory(SoftDeleteModel):
     """
     Модель подкатегории, связанная с категорией
     (например: для категории "Маркетинг" - "Farpost", "Avito")
@@ -56,15 +274,126 @@ class SubCategory(models.Model):
     )
     
     class Meta:
-        # Уникальность комбинации названия и категории
-        unique_together = ('name', 'category')
+        constraints = [
+            # Уникальность названия в категории без учета регистра (категория
+            # принадлежит одной организации); категория первой - поиск по
+            # префиксу названия внутри категории (typeahead)
+            models.UniqueConstraint(
+                'category', Lower('name'),
+                name='subcategory_name_ci_unique',
+                condition=models.Q(deleted_at__isnull=True),
+                violation_error_message='Подкатегория с таким названием уже существует в выбранной категории',
+            ),
+        ]
         verbose_name = "Подкатегория"
         verbose_name_plural = "Подкатегории"
     
     def __str__(self):
         return f"{self.name} ({self.category})"  # Формат: "Название (Категория)"
 
-class CashFlow(models.Model):
+class RecurringOperation(TenantModel, AtomicSaveModel):
+    """
+    Шаблон повторяющейся операции: аренда, зарплата, подписки.
+
+    Повторения - каждые interval периодов начиная с start_date (для
+    месяцев и лет - в тот же день месяца, в коротких месяцах - в последний).
+    Операции по шаблону создает команда materialize_recurring
+    (cash_flow.recurring); next_date - дата следующего несозданного повторения.
+    """
+    DAY, WEEK, MONTH, YEAR = 'day', 'week', 'month', 'year'
+    PERIOD_CHOICES = [
+        (DAY, 'День'),
+        (WEEK, 'Неделя'),
+        (MONTH, 'Месяц'),
+        (YEAR, 'Год'),
+    ]
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name="Название"
+    )
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.CASCADE,
+        related_name='recurring_operations',
+        verbose_name="Статус"
+    )
+    type = models.ForeignKey(
+        Type,
+        on_delete=models.CASCADE,
+        related_name='recurring_operations',
+        verbose_name="Тип операции"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='recurring_operations',
+        verbose_name="Категория"
+    )
+    subcategory = models.ForeignKey(
+        SubCategory,
+        on_delete=models.CASCADE,
+        related_name='recurring_operations',
+        verbose_name="Подкатегория"
+    )
+    amount = MoneyField(
+        max_digits=12,
+        verbose_name="Сумма"
+    )
+    comment = models.TextField(
+        blank=True,
+        verbose_name="Комментарий"
+    )
+    period = models.CharField(
+        max_length=5,
+        choices=PERIOD_CHOICES,
+        default=MONTH,
+        verbose_name="Период"
+    )
+    interval = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[validators.MinValueValidator(1)],
+        verbose_name="Каждые N периодов"
+    )
+    start_date = models.DateField(
+        verbose_name="Первое повторение"
+    )
+    end_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name="Последний день повторений"
+    )
+    next_date = models.DateField(
+        editable=False,
+        verbose_name="Следующее повторение"
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name="Активен"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата создания"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата обновления"
+    )
+
+    class Meta:
+        verbose_name = "Повторяющаяся операция"
+        verbose_name_plural = "Повторяющиеся операции"
+        ordering = ['name']
+        indexes = [
+            # Отбор шаблонов организации с наступившими повторениями
+            models.Index(fields=['organization', 'next_date'], name='recurring_due_idx',
+                         condition=models.Q(is_active=True)),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class CashFlow(SoftDeleteModel):
     """
     Основная модель для учета денежных потоков (доходы/расходы)
     """
@@ -91,9 +420,8 @@ class CashFlow(models.Model):
         on_delete=models.CASCADE,
         verbose_name="Подкатегория"
     )
-    amount = models.DecimalField(
-        max_digits=12,  # Максимум 12 цифр
-        decimal_places=2,  # 2 знака после запятой
+    amount = MoneyField(
+        max_digits=12,  # Максимум 12 цифр, 2 знака после запятой
         verbose_name="Сумма"
     )
     comment = models.TextField(
@@ -101,6 +429,16 @@ class CashFlow(models.Model):
         null=True,  # Может быть NULL в БД
         verbose_name="Комментарий"
     )
+    recurring = models.ForeignKey(
+        RecurringOperation,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,  # Индекс - уникальное ограничение (recurring, date)
+        on_delete=models.SET_NULL,  # Созданные операции остаются при удалении шаблона
+        related_name='operations',
+        verbose_name="Шаблон повторения"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,  # Устанавливается при создании
         verbose_name="Дата создания"
@@ -114,7 +452,398 @@ class CashFlow(models.Model):
         verbose_name = "Денежный поток"
         verbose_name_plural = "Денежные потоки"
         ordering = ['-date']  # Сортировка по дате (новые сверху)
+        indexes = [
+            # Сортировка, фильтр по периоду, расчет остатков - только по
+            # неудаленным операциям организации, с тем же условием, что у
+            # objects. Тип и сумма в индексе: суммы за период читаются из него
+            models.Index(fields=['organization', 'date', 'type', 'amount'], name='cashflow_alive_date_idx',
+                         condition=models.Q(deleted_at__isnull=True)),
+            # Отбор удаленных для корзины и purge_deleted
+            models.Index(fields=['organization', 'deleted_at'], name='cashflow_deleted_idx',
+                         condition=models.Q(deleted_at__isnull=False)),
+        ]
+        constraints = [
+            # Одно повторение шаблона на дату: повторный запуск
+            # materialize_recurring не создает дублей
+            models.UniqueConstraint(fields=['recurring', 'date'], name='cashflow_recurring_date_unique'),
+        ]
     
     def __str__(self):
         """Формат: "Дата - Тип - Сумма" (например: 2023-01-15 - Пополнение - 1000.00)"""
-        return f"{self.date} - {self.type} - {self.amount}"
\ No newline at end of file
+        return f"{self.date} - {self.type} - {self.amount}"
+
+class OperationRow(TenantModel):
+    """
+    Денормализованная строка операции: дата, сумма, знак и справочники
+    с названиями. Общие поля строк списка (CashFlowRow) и архива
+    (ArchivedCashFlow) - список, экспорт и API читают их одинаково.
+    """
+    date = models.DateField(
+        verbose_name="Дата операции"
+    )
+    amount = MoneyField(
+        max_digits=12,
+        verbose_name="Сумма"
+    )
+    is_income = models.BooleanField(
+        verbose_name="Пополнение"
+    )
+    comment_excerpt = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Комментарий (начало)"
+    )
+    # Идентификаторы справочников для фильтрации. Без ограничений FK и каскада:
+    # строки удаляются вместе с операциями
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name="Статус"
+    )
+    type = models.ForeignKey(
+        Type,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name="Тип операции"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name="Категория"
+    )
+    subcategory = models.ForeignKey(
+        SubCategory,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name="Подкатегория"
+    )
+    status_name = models.CharField(max_length=100, verbose_name="Статус (название)")
+    type_name = models.CharField(max_length=100, verbose_name="Тип (название)")
+    category_name = models.CharField(max_length=100, verbose_name="Категория (название)")
+    subcategory_name = models.CharField(max_length=100, verbose_name="Подкатегория (название)")
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.date} - {self.type_name} - {self.amount}"
+
+class CashFlowRow(OperationRow):
+    """
+    Денормализованная строка списка операций (модель для чтения).
+
+    Содержит названия справочников, чтобы список, экспорт и API читали
+    одну таблицу без соединений. Поддерживается обработчиками сигналов
+    (cash_flow.read_model), проверяется и пересобирается командой
+    rebuild_read_model.
+    """
+    cashflow = models.OneToOneField(
+        CashFlow,
+        on_delete=models.CASCADE,  # Строка удаляется вместе с операцией
+        primary_key=True,
+        related_name='row',
+        verbose_name="Операция"
+    )
+
+    class Meta:
+        verbose_name = "Строка списка операций"
+        verbose_name_plural = "Строки списка операций"
+        ordering = ['-date', '-cashflow']
+        indexes = [
+            # Покрывающий индекс: остатки и суммы организации за период без чтения строк
+            models.Index(fields=['organization', 'date', 'is_income', 'amount'], name='cashflowrow_date_sum_idx'),
+        ]
+
+class ArchivedCashFlow(OperationRow):
+    """
+    Операция архивного месяца (холодное хранилище).
+
+    Закрытые месяцы старше горизонта CASH_FLOW_ARCHIVE_MONTHS переносятся
+    сюда из CashFlow и CashFlowRow (cash_flow.archive): строка списка и
+    остальные данные операции, идентификатор сохраняется. Горячие таблицы
+    и их индексы остаются небольшими; архив читается, только когда
+    период фильтра захватывает архивные месяцы.
+    """
+    id = models.BigIntegerField(
+        primary_key=True,  # Идентификатор операции в CashFlow
+        verbose_name="ID операции"
+    )
+    comment = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Комментарий"
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Дата создания"
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата обновления"
+    )
+
+    class Meta:
+        verbose_name = "Архивная операция"
+        verbose_name_plural = "Архив операций"
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['organization', 'date', 'is_income', 'amount'],
+                         name='archivedcashflow_date_sum_idx'),
+        ]
+
+class BalanceCheckpoint(TenantModel):
+    """
+    Контрольная точка остатка: итоговый остаток по всем операциям на конец периода.
+
+    Позволяет считать остаток на дату как "ближайшая точка + операции после нее"
+    без пересчета всей истории. Точки, затронутые изменением операций,
+    удаляются и пересоздаются командой rebuild_balance_checkpoints.
+    """
+    date = models.DateField(
+        verbose_name="Дата точки"
+    )
+    balance = MoneyField(
+        max_digits=16,
+        verbose_name="Остаток на конец дня"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата расчета"
+    )
+
+    class Meta:
+        verbose_name = "Контрольная точка остатка"
+        verbose_name_plural = "Контрольные точки остатка"
+        ordering = ['-date']
+        constraints = [
+            # Одна точка организации на дату (конец месяца)
+            models.UniqueConstraint(fields=['organization', 'date'], name='checkpoint_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}: {self.balance}"
+
+class ClosedPeriod(TenantModel):
+    """
+    Закрытый месяц: операции в нем больше не меняются.
+
+    Месяцы закрываются строго по порядку, поэтому остаток на конец
+    закрытого месяца не устаревает. Итоги хранятся в PeriodSnapshot.
+    """
+    month = models.DateField(
+        verbose_name="Месяц"  # Первый день закрытого месяца
+    )
+    closing_balance = MoneyField(
+        max_digits=16,
+        verbose_name="Остаток на конец месяца"
+    )
+    closed_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата закрытия"
+    )
+    archived = models.BooleanField(
+        default=False,  # Операции месяца перенесены в ArchivedCashFlow
+        verbose_name="В архиве"
+    )
+
+    class Meta:
+        verbose_name = "Закрытый период"
+        verbose_name_plural = "Закрытые периоды"
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'month'], name='closedperiod_month_unique'),
+        ]
+
+    def __str__(self):
+        return self.month.strftime('%m.%Y')
+
+class PeriodSnapshot(TenantModel):
+    """
+    Итоги закрытого месяца по комбинации статус/тип/категория/подкатегория.
+
+    Отчеты по закрытым месяцам строятся по этим строкам, а не по операциям.
+    """
+    period = models.ForeignKey(
+        ClosedPeriod,
+        on_delete=models.CASCADE,  # Снимки удаляются при открытии периода
+        related_name='snapshots',
+        verbose_name="Период"
+    )
+    status = models.ForeignKey(
+        Status,
+        on_delete=models.CASCADE,
+        verbose_name="Статус"
+    )
+    type = models.ForeignKey(
+        Type,
+        on_delete=models.CASCADE,
+        verbose_name="Тип операции"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        verbose_name="Категория"
+    )
+    subcategory = models.ForeignKey(
+        SubCategory,
+        on_delete=models.CASCADE,
+        verbose_name="Подкатегория"
+    )
+    total = MoneyField(
+        max_digits=16,
+        verbose_name="Сумма операций"
+    )
+    count = models.PositiveIntegerField(
+        verbose_name="Количество операций"
+    )
+
+    class Meta:
+        verbose_name = "Итоги закрытого периода"
+        verbose_name_plural = "Итоги закрытых периодов"
+        indexes = [
+            models.Index(fields=['organization', 'period'], name='periodsnapshot_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period}: {self.category} - {self.total}"
+
+class ChangeLogEntry(TenantModel):
+    """
+    Журнал изменений операций и справочников для инкрементальной выгрузки.
+
+    Идентификатор записи - монотонный курсор ленты изменений (в SQLite
+    AUTOINCREMENT не переиспользует номера). Записи с действием "delete"
+    - надгробия удаленных объектов, включая каскадно удаленные.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    ]
+
+    model = models.CharField(
+        max_length=20,
+        verbose_name="Модель"
+    )
+    object_id = models.BigIntegerField(
+        verbose_name="ID объекта"
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=ACTION_CHOICES,
+        verbose_name="Действие"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,  # Очистка старых записей (prune_changelog)
+        verbose_name="Дата изменения"
+    )
+
+    class Meta:
+        verbose_name = "Запись журнала изменений"
+        verbose_name_plural = "Журнал изменений"
+        ordering = ['id']
+        indexes = [
+            # Лента организации после курсора
+            models.Index(fields=['organization', 'id'], name='changelog_cursor_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.model}:{self.object_id}"
+
+class ChangeLogPruning(models.Model):
+    """
+    Граница очистки журнала изменений (одна запись на базу).
+
+    Курсор ленты общий для организаций, поэтому граница тоже общая. Лента с
+    курсора меньше pruned_until неполна, даже если журнал удален целиком и
+    первой оставшейся записи нет.
+    """
+    pruned_until = models.BigIntegerField(
+        default=0,  # Наибольший id удаленной записи журнала
+        verbose_name="Очищено по курсор"
+    )
+    pruned_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата очистки"
+    )
+
+    class Meta:
+        verbose_name = "Очистка журнала изменений"
+        verbose_name_plural = "Очистка журнала изменений"
+
+    def __str__(self):
+        return f"по #{self.pruned_until}"
+
+class Budget(TenantModel):
+    """
+    Бюджет расходов на месяц по категории или подкатегории.
+
+    Факт (actual) - сумма расходных операций месяца - хранится в записи и
+    обновляется приращениями при каждом изменении операций (cash_flow.budgets).
+    """
+    month = models.DateField(
+        verbose_name="Месяц"  # Первый день месяца
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='budgets',
+        verbose_name="Категория"
+    )
+    subcategory = models.ForeignKey(
+        SubCategory,
+        null=True,
+        blank=True,  # Без подкатегории - бюджет всей категории
+        on_delete=models.CASCADE,
+        related_name='budgets',
+        verbose_name="Подкатегория"
+    )
+    amount = MoneyField(
+        max_digits=12,
+        verbose_name="Бюджет"
+    )
+    actual = MoneyField(
+        max_digits=16,
+        default=0,
+        editable=False,
+        verbose_name="Факт"
+    )
+
+    class Meta:
+        verbose_name = "Бюджет"
+        verbose_name_plural = "Бюджеты"
+        ordering = ['-month']
+        constraints = [
+            # Индекс (организация, месяц, ...) - поиск бюджетов, затронутых
+            # изменением операции, среди бюджетов одного месяца
+            models.UniqueConstraint(
+                fields=['organization', 'month', 'category', 'subcategory'],
+                name='budget_unique',
+                violation_error_message='Бюджет на этот месяц уже задан',
+            ),
+            # NULL в уникальном индексе не совпадают: отдельно - бюджет всей категории
+            models.UniqueConstraint(
+                fields=['organization', 'month', 'category'],
+                name='budget_category_unique',
+                condition=models.Q(subcategory__isnull=True),
+                violation_error_message='Бюджет категории на этот месяц уже задан',
+            ),
+        ]
+
+    def __str__(self):
+        name = self.subcategory.name if self.subcategory_id else self.category.name
+        return f"{name} {self.month:%m.%Y}"
+
+    @property
+    def remaining(self):
+        return self.amount - self.actual
+
+    @property
+    def is_overspent(self):
+        return self.actual > self.amount
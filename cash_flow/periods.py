@@ -0,0 +1,134 @@
+"""
+Закрытие месяцев: итоги закрытых периодов и запрет изменения их операций.
+
+Месяцы закрываются по порядку: месяц можно закрыть, только если до него
+нет операций в открытых месяцах. Закрытыми считаются все даты до конца
+последнего закрытого месяца, в том числе пропущенные при закрытии пустые
+месяцы: иначе операция в таком месяце изменила бы остаток закрытых
+периодов после него. Открыть заново можно только последний закрытый месяц.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from . import balances
+from .models import CashFlow, ClosedPeriod, PeriodSnapshot
+
+
+def month_start(day):
+    """Первый день месяца, в котором находится дата day"""
+    return day.replace(day=1)
+
+
+def last_closed():
+    """Последний закрытый месяц или None"""
+    return ClosedPeriod.objects.order_by('-month').first()
+
+
+def closed_until():
+    """Последний день закрытой части истории или None, если закрытых месяцев нет"""
+    last = last_closed()
+    return balances.month_end(last.month) if last else None
+
+
+def is_closed(day):
+    """Попадает ли дата в закрытую часть истории (см. closed_until)"""
+    until = closed_until()
+    return until is not None and day <= until
+
+
+def next_month_to_close():
+    """
+    Следующий месяц, который можно закрыть, или None, если операций нет.
+
+    Пустые месяцы пропускаются: закрывается месяц первой операции
+    после последнего закрытого периода.
+    """
+    operations = CashFlow.objects.all()
+    until = closed_until()
+    if until:
+        operations = operations.filter(date__gt=until)
+    first_date = operations.order_by('date').values_list('date', flat=True).first()
+    return month_start(first_date) if first_date else None
+
+
+@transaction.atomic
+def close_month(month):
+    """
+    Закрытие месяца: итоги по справочникам и остаток на конец месяца.
+
+    Возвращает созданный ClosedPeriod.
+    """
+    month = month_start(month)
+    month_end = balances.month_end(month)
+    last = last_closed()
+    if last and month <= last.month:
+        raise ValidationError(f'Месяц {month:%m.%Y} уже закрыт или предшествует закрытому')
+    earlier = CashFlow.objects.filter(date__lt=month)
+    if last:
+        earlier = earlier.filter(date__gt=balances.month_end(last.month))
+    if earlier.exists():
+        raise ValidationError('Сначала закройте предыдущие месяцы с операциями')
+
+    operations = CashFlow.objects.filter(date__range=[month, month_end])
+    groups = (
+        operations.order_by()
+        .values('status_id', 'type_id', 'category_id', 'subcategory_id')
+        .annotate(total=Sum('amount'), count=Count('pk'))
+    )
+    # До месяца нет операций в открытых периодах, остаток берется из прошлого закрытия
+    opening = last.closing_balance if last else Decimal('0')
+    period = ClosedPeriod.objects.create(
+        month=month,
+        closing_balance=opening + balances.total(operations),
+    )
+    PeriodSnapshot.objects.bulk_create(
+        PeriodSnapshot(period=period, total=group.pop('total'), **group)
+        for group in groups
+    )
+    return period
+
+
+@transaction.atomic
+def reopen_last():
+    """Открытие последнего закрытого месяца (итоги удаляются каскадно)"""
+    last = last_closed()
+    if last is None:
+        raise ValidationError('Нет закрытых периодов')
+    if last.archived:
+        raise ValidationError(
+            f'Операции {last} в архиве: сначала верните их командой archive_cashflows --restore')
+    last.delete()
+    return last.month
+
+
+def closed_segments(date_from=None, date_to=None):
+    """
+    Закрытые месяцы, целиком попадающие в период [date_from, date_to].
+
+    Возвращает (месяцы, диапазоны дат открытой части периода). Диапазоны -
+    пары (начало, конец), None означает отсутствие границы.
+    """
+    periods = ClosedPeriod.objects.order_by('month')
+    if date_from:
+        periods = periods.filter(month__gte=date_from)
+    if date_to:
+        periods = periods.filter(month__lte=date_to)
+    months = [
+        month for month in periods.values_list('month', flat=True)
+        if not date_to or balances.month_end(month) <= date_to
+    ]
+
+    # Открытые промежутки между подряд идущими закрытыми месяцами
+    segments = []
+    start = date_from
+    for month in months:
+        if start is None or start < month:
+            segments.append((start, month - timedelta(days=1)))
+        start = balances.month_end(month) + timedelta(days=1)
+    if date_to is None or start is None or start <= date_to:
+        segments.append((start, date_to))
+    return months, segments
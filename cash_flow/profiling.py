@@ -0,0 +1,147 @@
+"""
+Профилирование отдельного запроса по требованию.
+
+Включается настройкой CASH_FLOW_PROFILING_ENABLED. Профилируется только
+запрос сотрудника (is_staff) с параметром ?_profile=1: он выполняется под
+cProfile, SQL-запросы собираются через execute_wrapper. В каталог
+CASH_FLOW_PROFILE_DIR сохраняются профиль (.prof - для pstats и snakeviz)
+и отчет (.txt - запрос, SQL, самые дорогие функции); хранятся последние
+CASH_FLOW_PROFILE_KEEP профилей.
+
+Без настройки middleware отключается при запуске (MiddlewareNotUsed) и в
+обработке запросов не участвует. Для потоковых ответов (экспорт CSV)
+профилируется только подготовка ответа, а не выдача строк.
+"""
+import cProfile
+import io
+import pstats
+import re
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+PROFILE_PARAMETER = '_profile'
+TOP_FUNCTIONS = 60
+# Имя профиля - время запроса: 20250131-235959-123456
+NAME_RE = re.compile(r'^\d{8}-\d{6}-\d{6}$')
+KINDS = ('prof', 'txt')
+
+
+def is_enabled():
+    return getattr(settings, 'CASH_FLOW_PROFILING_ENABLED', False)
+
+
+def profile_dir():
+    return Path(getattr(settings, 'CASH_FLOW_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+class QueryLog:
+    """Обертка выполнения SQL: время, текст и параметры каждого запроса"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - start, sql, params))
+
+
+class ProfilerMiddleware:
+    """Профилирование запроса сотрудника с параметром ?_profile=1"""
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROFILE_PARAMETER not in request.GET or not request.user.is_staff:
+            return self.get_response(request)
+
+        log = QueryLog()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - started
+        response['X-Profile'] = save(request, profiler, log.queries, elapsed)
+        return response
+
+
+def save(request, profiler, queries, elapsed):
+    """Сохранение профиля и отчета, удаление старых профилей. Возвращает имя профиля"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    profiler.dump_stats(directory / f'{name}.prof')
+
+    sql_time = sum(duration for duration, _, _ in queries)
+    report = io.StringIO()
+    # Первые две строки - сводка для списка профилей
+    report.write(f'{request.method} {request.get_full_path()}\n')
+    report.write(f'Время: {elapsed * 1000:.1f} мс, SQL: {len(queries)} запросов, {sql_time * 1000:.1f} мс\n\n')
+    report.write('SQL-запросы (мс):\n')
+    for duration, sql, params in queries:
+        report.write(f'{duration * 1000:9.2f}  {sql}  {params!r}\n')
+    report.write('\n')
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    (directory / f'{name}.txt').write_text(report.getvalue(), encoding='utf-8')
+
+    prune(getattr(settings, 'CASH_FLOW_PROFILE_KEEP', 50))
+    return name
+
+
+def _names():
+    """Имена сохраненных профилей, новые первыми"""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    names = {path.stem for path in directory.iterdir() if NAME_RE.match(path.stem)}
+    return sorted(names, reverse=True)
+
+
+def prune(keep):
+    """Удаление профилей сверх последних keep"""
+    for name in _names()[keep:]:
+        for kind in KINDS:
+            profile_dir().joinpath(f'{name}.{kind}').unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Сохраненные профили: имя, время, запрос и сводка из отчета"""
+    profiles = []
+    for name in _names():
+        request_line, summary = '', ''
+        report = profile_dir() / f'{name}.txt'
+        if report.exists():
+            with report.open(encoding='utf-8') as file:
+                request_line, summary = file.readline().strip(), file.readline().strip()
+        profiles.append({
+            'name': name,
+            'created_at': datetime.strptime(name, '%Y%m%d-%H%M%S-%f'),
+            'request': request_line,
+            'summary': summary,
+        })
+    return profiles
+
+
+def profile_path(name, kind):
+    """Путь к файлу профиля или None, если имя некорректно или файла нет"""
+    if not NAME_RE.match(name) or kind not in KINDS:
+        return None
+    path = profile_dir() / f'{name}.{kind}'
+    return path if path.exists() else None
@@ -0,0 +1,173 @@
+"""
+Поддержка денормализованной модели чтения CashFlowRow.
+
+Строка пересобирается при каждом сохранении операции; переименование
+записи справочника обновляет все зависимые строки (и строки архива
+ArchivedCashFlow) одним UPDATE на таблицу.
+Строки удаленных (мягко) операций удаляются services вместе с пометкой
+операций, восстановленных - пересобираются.
+"""
+from django.db import connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Substr
+
+from .models import ArchivedCashFlow, CashFlow, CashFlowRow, Status, Type, Category, SubCategory
+
+COMMENT_EXCERPT_LENGTH = 255
+
+# Поле строки для каждого справочника
+DICTIONARY_FIELDS = {
+    Status: 'status',
+    Type: 'type',
+    Category: 'category',
+    SubCategory: 'subcategory',
+}
+
+# Поля строки и выражения над CashFlow, из которых они заполняются
+ROW_COLUMNS = {
+    'cashflow': F('pk'),
+    'organization': F('organization_id'),
+    'date': F('date'),
+    'amount': F('amount'),
+    'is_income': F('type__is_income'),
+    'comment_excerpt': Substr(Coalesce('comment', Value('')), 1, COMMENT_EXCERPT_LENGTH),
+    'status': F('status_id'),
+    'type': F('type_id'),
+    'category': F('category_id'),
+    'subcategory': F('subcategory_id'),
+    'status_name': F('status__name'),
+    'type_name': F('type__name'),
+    'category_name': F('category__name'),
+    'subcategory_name': F('subcategory__name'),
+}
+
+
+def copy_rows(queryset, columns, model):
+    """INSERT INTO model (columns) SELECT ... из queryset одним запросом"""
+    select = queryset.order_by().values(**{f'src_{name}': expression for name, expression in columns.items()})
+    sql, params = select.query.sql_with_params()
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    target = ', '.join(quote(model._meta.get_field(name).column) for name in columns)
+    source = ', '.join(quote(f'src_{name}') for name in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} ({target}) SELECT {source} FROM ({sql}) src',
+            params,
+        )
+        return cursor.rowcount
+
+
+def insert_rows(queryset):
+    """Строки для новых операций queryset одним INSERT ... SELECT, без загрузки операций"""
+    return copy_rows(queryset, ROW_COLUMNS, CashFlowRow)
+
+
+def build_row(cashflow):
+    """Строка модели чтения для операции (справочники должны быть загружены)"""
+    return CashFlowRow(
+        cashflow_id=cashflow.pk,
+        organization_id=cashflow.organization_id,
+        date=cashflow.date,
+        amount=cashflow.amount,
+        is_income=cashflow.type.is_income,
+        comment_excerpt=(cashflow.comment or '')[:COMMENT_EXCERPT_LENGTH],
+        status_id=cashflow.status_id,
+        type_id=cashflow.type_id,
+        category_id=cashflow.category_id,
+        subcategory_id=cashflow.subcategory_id,
+        status_name=cashflow.status.name,
+        type_name=cashflow.type.name,
+        category_name=cashflow.category.name,
+        subcategory_name=cashflow.subcategory.name,
+    )
+
+
+def sync(cashflow):
+    """Запись строки для сохраненной операции (UPDATE, при отсутствии - INSERT)"""
+    build_row(cashflow).save()
+
+
+def rename(instance):
+    """Обновление названия (и знака для типа) во всех строках записи справочника"""
+    field = DICTIONARY_FIELDS[type(instance)]
+    updates = {f'{field}_name': instance.name}
+    if isinstance(instance, Type):
+        updates['is_income'] = instance.is_income
+    ArchivedCashFlow.objects.filter(**{f'{field}_id': instance.pk}).update(**updates)
+    return CashFlowRow.objects.filter(**{f'{field}_id': instance.pk}).update(**updates)
+
+
+def row_values(values):
+    """
+    Значения полей строки для перепривязки к записям справочников.
+
+    values - {поле: запись справочника}, например {'status': status}.
+    """
+    updates = {}
+    for field, instance in values.items():
+        updates[f'{field}_id'] = instance.pk
+        updates[f'{field}_name'] = instance.name
+        if isinstance(instance, Type):
+            updates['is_income'] = instance.is_income
+    return updates
+
+
+def reassign(queryset, values):
+    """Перепривязка строк операций queryset к другим записям справочников одним UPDATE"""
+    return CashFlowRow.objects.filter(
+        cashflow__in=queryset.order_by().values('pk')).update(**row_values(values))
+
+
+def inconsistent_ids():
+    """
+    Идентификаторы операций, строки которых отсутствуют или устарели.
+
+    Три запроса: операции без строк, строки удаленных операций и строки,
+    расходящиеся с операцией и справочниками.
+    """
+    missing = CashFlow.objects.filter(row__isnull=True).values_list('pk', flat=True)
+    deleted = CashFlowRow.objects.filter(cashflow__deleted_at__isnull=False).values_list('pk', flat=True)
+    stale = CashFlowRow.objects.exclude(
+        organization_id=F('cashflow__organization_id'),
+        date=F('cashflow__date'),
+        amount=F('cashflow__amount'),
+        is_income=F('cashflow__type__is_income'),
+        comment_excerpt=Substr(Coalesce('cashflow__comment', Value('')), 1, COMMENT_EXCERPT_LENGTH),
+        status_id=F('cashflow__status_id'),
+        type_id=F('cashflow__type_id'),
+        category_id=F('cashflow__category_id'),
+        subcategory_id=F('cashflow__subcategory_id'),
+        status_name=F('cashflow__status__name'),
+        type_name=F('cashflow__type__name'),
+        category_name=F('cashflow__category__name'),
+        subcategory_name=F('cashflow__subcategory__name'),
+    ).values_list('pk', flat=True)
+    return sorted(set(missing) | set(deleted) | set(stale))
+
+
+def rebuild(ids=None, batch_size=2000):
+    """
+    Пересборка строк пачками по batch_size (все строки, если ids не указаны).
+
+    Каждая пачка - отдельная транзакция: удаление старых строк и bulk_create
+    новых. Строки удаленных операций удаляются. Возвращает количество
+    записанных строк.
+    """
+    orphaned = CashFlowRow.objects.filter(cashflow__deleted_at__isnull=False)
+    operations = CashFlow.objects.select_related('status', 'type', 'category', 'subcategory').order_by('pk')
+    if ids is not None:
+        orphaned = orphaned.filter(pk__in=ids)
+        operations = operations.filter(pk__in=ids)
+    orphaned.delete()
+    written = 0
+    last_pk = 0
+    while True:
+        batch = list(operations.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return written
+        with transaction.atomic():
+            CashFlowRow.objects.filter(pk__in=[cashflow.pk for cashflow in batch]).delete()
+            CashFlowRow.objects.bulk_create(build_row(cashflow) for cashflow in batch)
+        written += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,199 @@
+"""
+Отчеты по операциям: суммы пополнений и списаний в разрезе справочников.
+
+Закрытые месяцы, целиком попадающие в период отчета, берутся из итогов
+PeriodSnapshot; по операциям агрегируются только открытые месяцы. Архив
+операций читается, только если период отчета начинается внутри
+архивного месяца.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.db.models.functions import TruncMonth
+
+from . import analytics, archive, periods
+from .filters import apply_filters
+from .models import ArchivedCashFlow, CashFlow, MoneyField, PeriodSnapshot, Status, Type, Category, SubCategory
+
+# Разрезы отчетов и модели справочников для них
+DIMENSIONS = {
+    'status': Status,
+    'type': Type,
+    'category': Category,
+    'subcategory': SubCategory,
+}
+
+# Суммы в копейках: агрегаты считаются в целых числах
+SUM_FIELD = MoneyField(max_digits=16)
+
+
+def _split_sum(field, income, income_field='type__is_income'):
+    """Сумма только пополнений (income=True) или только списаний"""
+    return Sum(
+        Case(When(**{income_field: income}, then=F(field)), default=0, output_field=SUM_FIELD),
+        output_field=SUM_FIELD,
+    )
+
+
+def _date_q(segments):
+    """Условие на дату операции: попадание в один из открытых диапазонов"""
+    condition = None
+    for start, end in segments:
+        part = Q()
+        if start:
+            part &= Q(date__gte=start)
+        if end:
+            part &= Q(date__lte=end)
+        if not part:
+            return Q()  # Диапазон без границ - условие не нужно
+        condition = part if condition is None else condition | part
+    return condition
+
+
+def _snapshot_totals(snapshots, keys):
+    """Суммы по месяцам из итогов закрытых периодов"""
+    return list(
+        snapshots.values(*keys, month=F('period__month'))
+        .annotate(income=_split_sum('total', True), expense=_split_sum('total', False),
+                  count=Sum('count'))
+        .order_by()
+    )
+
+
+def _operation_totals(operations, keys, income_field='type__is_income'):
+    """Суммы по месяцам по операциям (CashFlow или ArchivedCashFlow)"""
+    return list(
+        operations.values(*keys, month=TruncMonth('date'))
+        .annotate(income=_split_sum('amount', True, income_field),
+                  expense=_split_sum('amount', False, income_field),
+                  count=Count('pk'))
+        .order_by()
+    )
+
+
+def monthly_totals(filters, group_by=()):
+    """
+    Суммы по месяцам в разрезе group_by (имена из DIMENSIONS).
+
+    Возвращает список словарей: month, <разрез>_id, income, expense, count.
+    При включенном аналитическом движке горячие операции считаются по
+    колонкам в памяти, архивные месяцы - по итогам периодов.
+    """
+    keys = [f'{dimension}_id' for dimension in group_by]
+    closed_months, segments = periods.closed_segments(filters['date_from'], filters['date_to'])
+    border = archive.boundary()
+
+    rows = []
+    if analytics.is_enabled():
+        rows += analytics.get_store().monthly_totals(filters, group_by)
+        # В движке только операции горячих таблиц
+        archived_months = [month for month in closed_months if border and month <= border]
+        if archived_months:
+            snapshots = apply_filters(PeriodSnapshot.objects.all(), filters, dates=False)
+            rows += _snapshot_totals(snapshots.filter(period__month__in=archived_months), keys)
+    else:
+        if closed_months:
+            snapshots = apply_filters(PeriodSnapshot.objects.all(), filters, dates=False)
+            rows += _snapshot_totals(snapshots.filter(period__month__in=closed_months), keys)
+        if segments:
+            operations = apply_filters(CashFlow.objects.all(), filters, dates=False)
+            rows += _operation_totals(operations.filter(_date_q(segments)), keys)
+    if segments and archive.reaches(filters, border):
+        # Начало периода внутри архивного месяца: его часть - из архива
+        operations = apply_filters(ArchivedCashFlow.objects.all(), filters, dates=False)
+        rows += _operation_totals(operations.filter(_date_q(segments)), keys, 'is_income')
+    return rows
+
+
+def totals(filters, group_by):
+    """
+    Итоги за период в разрезе group_by, строки отсортированы по названиям.
+
+    Каждая строка: идентификаторы и названия разрезов, income, expense,
+    balance (income - expense), count.
+    """
+    keys = [f'{dimension}_id' for dimension in group_by]
+    merged = {}
+    for row in monthly_totals(filters, group_by):
+        key = tuple(row[k] for k in keys)
+        target = merged.setdefault(key, {'income': Decimal('0'), 'expense': Decimal('0'), 'count': 0})
+        target['income'] += row['income']
+        target['expense'] += row['expense']
+        target['count'] += row['count']
+
+    names = {
+        dimension: dict(DIMENSIONS[dimension].objects.filter(
+            pk__in={key[i] for key in merged}).values_list('pk', 'name'))
+        for i, dimension in enumerate(group_by)
+    }
+    result = []
+    for key, values in merged.items():
+        row = {}
+        for i, dimension in enumerate(group_by):
+            row[f'{dimension}_id'] = key[i]
+            row[dimension] = names[dimension].get(key[i], '')
+        row.update(values, balance=values['income'] - values['expense'])
+        result.append(row)
+    result.sort(key=lambda row: [row[dimension] for dimension in group_by])
+    return result
+
+
+def _month_range(first, last):
+    """Все месяцы от first до last включительно (первые числа)"""
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append(first.replace(year=year, month=month, day=1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def pivot(filters, row_dimension='category'):
+    """
+    Матрица "справочник x месяц" с суммами пополнений и списаний.
+
+    Данные - один сгруппированный запрос (monthly_totals), матрица
+    заполняется за один проход по его строкам. Возвращает словарь:
+    months - список месяцев, rows - строки матрицы (id, name, income, expense
+    по месяцам, total_income, total_expense), totals - итоги по месяцам.
+    """
+    data = monthly_totals(filters, [row_dimension])
+    key = f'{row_dimension}_id'
+
+    months_present = [row['month'] for row in data]
+    first = filters['date_from'] or (min(months_present) if months_present else None)
+    last = filters['date_to'] or (max(months_present) if months_present else None)
+    months = _month_range(first, last) if first else []
+    column = {month: i for i, month in enumerate(months)}
+    zero = Decimal('0.00')
+
+    matrix = {}
+    totals = {'income': [zero] * len(months), 'expense': [zero] * len(months)}
+    for row in data:
+        i = column[row['month']]
+        line = matrix.get(row[key])
+        if line is None:
+            line = matrix[row[key]] = {
+                'id': row[key], 'income': [zero] * len(months), 'expense': [zero] * len(months),
+            }
+        line['income'][i] += row['income']
+        line['expense'][i] += row['expense']
+        totals['income'][i] += row['income']
+        totals['expense'][i] += row['expense']
+
+    model = DIMENSIONS[row_dimension]
+    objects = model.objects.filter(pk__in=matrix)
+    if model is SubCategory:
+        objects = objects.select_related('category')
+    names = {obj.pk: str(obj) for obj in objects}
+
+    rows = []
+    for line in matrix.values():
+        line['name'] = names.get(line['id'], '')
+        line['total_income'] = sum(line['income'], zero)
+        line['total_expense'] = sum(line['expense'], zero)
+        rows.append(line)
+    rows.sort(key=lambda line: line['name'])
+    totals['total_income'] = sum(totals['income'], zero)
+    totals['total_expense'] = sum(totals['expense'], zero)
+    return {'dimension': row_dimension, 'months': months, 'rows': rows, 'totals': totals}
@@ -0,0 +1,334 @@
+"""
+Массовые изменения операций.
+
+Изменения выполняются над набором строк (один UPDATE или DELETE) в одной
+транзакции, без загрузки и сохранения операций по одной. Удаление - мягкое:
+записи помечаются deleted_at, физически их удаляет команда purge_deleted. Производные
+данные - строки CashFlowRow, журнал изменений, версии кэша, контрольные
+точки остатков и факты бюджетов - обновляются так же, как при сохранении
+одной операции.
+"""
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, Min, OuterRef, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import balances, budgets, caching, changefeed, periods, read_model
+from .models import (
+    ArchivedCashFlow, Budget, CashFlow, CashFlowRow, ChangeLogEntry, PeriodSnapshot, RecurringOperation,
+    Status, Type, Category, SubCategory,
+)
+
+
+def check_open(queryset):
+    """Запрет массовых изменений операций закрытых месяцев"""
+    until = periods.closed_until()
+    if until and queryset.filter(date__lte=until).exists():
+        raise ValidationError(
+            f'Среди операций есть операции закрытых периодов (по {until:%m.%Y}), изменения в них запрещены')
+
+
+def update_cashflows(queryset, **values):
+    """
+    Смена записей справочников у всех операций queryset.
+
+    values - {поле: запись справочника}: status, type, category, subcategory.
+    При смене подкатегории категория берется из нее. Возвращает число операций.
+    """
+    if 'subcategory' in values:
+        values['category'] = values['subcategory'].category
+    with transaction.atomic():
+        check_open(queryset)
+        since = queryset.aggregate(since=Min('date'))['since']
+        if since is None:
+            return 0
+        # Журнал и строки списка - до UPDATE: после него queryset может
+        # уже не выбирать эти операции (например, отбор по старому статусу)
+        ids = queryset.order_by().values('pk')
+        changefeed.record_queryset('cashflow', ids, ChangeLogEntry.UPSERT)
+        read_model.reassign(ids, values)
+        budgets.reassign(CashFlow.objects.filter(pk__in=ids), values)
+        # updated_at - для догрузки изменений аналитическим движком
+        updated = queryset.update(updated_at=timezone.now(), **values)
+    caching.bump_version(caching.DICTIONARIES, caching.CASHFLOWS)
+    if 'type' in values:
+        # Смена типа может сменить знак операций
+        balances.invalidate_checkpoints(since)
+    return updated
+
+
+def delete_cashflows(queryset):
+    """
+    Мягкое удаление всех операций queryset одним UPDATE.
+
+    Строки CashFlowRow удаляются отдельным DELETE - список и отчеты по
+    модели чтения удаленные операции не видят. Возвращает число операций.
+    """
+    with transaction.atomic():
+        check_open(queryset)
+        since = queryset.aggregate(since=Min('date'))['since']
+        if since is None:
+            return 0
+        ids = queryset.order_by().values('pk')
+        changefeed.record_queryset('cashflow', ids, ChangeLogEntry.DELETE)
+        CashFlowRow.objects.filter(cashflow__in=ids).delete()
+        budgets.apply(CashFlow.objects.filter(pk__in=ids), sign=-1)
+        now = timezone.now()
+        deleted = queryset.update(deleted_at=now, updated_at=now)
+    caching.bump_version(caching.DICTIONARIES, caching.CASHFLOWS)
+    balances.invalidate_checkpoints(since)
+    return deleted
+
+
+# ======================== ОБЪЕДИНЕНИЕ СПРАВОЧНИКОВ ========================
+def _reassign(lookup, values):
+    """
+    Перепривязка операций, итогов закрытых периодов и шаблонов повторяющихся
+    операций, отобранных lookup.
+
+    Итоги периодов и архивные операции перепривязываются вместе с
+    операциями, поэтому перенос допустим и для закрытых месяцев: суммы
+    периодов не меняются.
+    """
+    # Вместе с удаленными: после объединения их можно восстановить
+    operations = CashFlow.all_objects.filter(**lookup)
+    changefeed.record_queryset('cashflow', operations, ChangeLogEntry.UPSERT)
+    read_model.reassign(operations, values)
+    budgets.reassign(CashFlow.objects.filter(**lookup), values)
+    budgets.reassign(ArchivedCashFlow.objects.filter(**lookup), values)
+    updated = operations.update(updated_at=timezone.now(), **values)
+    PeriodSnapshot.objects.filter(**lookup).update(**values)
+    RecurringOperation.objects.filter(**lookup).update(**values)
+    ArchivedCashFlow.objects.filter(**lookup).update(**read_model.row_values(values))
+    return updated
+
+
+def move_subcategory_operations(subcategory):
+    """Перенос операций и бюджетов подкатегории в ее (новую) категорию"""
+    with transaction.atomic():
+        moved = _reassign({'subcategory': subcategory}, {'category': subcategory.category})
+        Budget.objects.filter(subcategory=subcategory).update(category=subcategory.category)
+    caching.bump_version(caching.DICTIONARIES, caching.CASHFLOWS)
+    return moved
+
+
+def _merge_subcategories(source, target):
+    """Объединение подкатегорий: операции source переходят в target и ее категорию"""
+    moved = _reassign({'subcategory': source}, {'subcategory': target, 'category': target.category})
+    source.delete()
+    return moved
+
+
+def merge(source, target):
+    """
+    Объединение записи справочника source с target.
+
+    Зависимые операции перепривязываются UPDATE-ами по набору строк, после
+    чего source удаляется - зависимых строк у него уже нет, и каскадное
+    удаление ORM ничего не обходит. Подкатегории объединяемой категории
+    переносятся в target, одноименные - объединяются с подкатегориями target.
+    Возвращает число перепривязанных операций.
+    """
+    model = type(source)
+    if type(target) is not model:
+        raise ValidationError('Объединять можно только записи одного справочника')
+    if source.pk == target.pk:
+        raise ValidationError('Нельзя объединить запись саму с собой')
+    if model is Type and source.is_income != target.is_income:
+        raise ValidationError('Нельзя объединить тип пополнения с типом списания: изменятся остатки')
+
+    with transaction.atomic():
+        if model is SubCategory:
+            moved = _merge_subcategories(source, target)
+        else:
+            field = read_model.DICTIONARY_FIELDS[model]
+            moved = 0
+            if model is Category:
+                target_names = target.subcategory_set.annotate(name_lower=Lower('name'))
+                clashing = source.subcategory_set.annotate(name_lower=Lower('name')).filter(
+                    name_lower__in=target_names.values('name_lower'))
+                for subcategory in clashing:
+                    moved += _merge_subcategories(
+                        subcategory, target_names.get(name_lower=subcategory.name_lower))
+                subcategories = SubCategory.all_objects.filter(category=source)
+                changefeed.record_queryset('subcategory', subcategories, ChangeLogEntry.UPSERT)
+                subcategories.update(category=target)
+                # Бюджеты подкатегорий переходят вместе с ними, бюджеты самой
+                # категории удаляются вместе с ней
+                Budget.objects.filter(category=source, subcategory__isnull=False).update(category=target)
+            moved += _reassign({field: source}, {field: target})
+            source.delete()
+    caching.bump_version(caching.DICTIONARIES, caching.CASHFLOWS)
+    return moved
+
+
+# ======================== УДАЛЕНИЕ И ВОССТАНОВЛЕНИЕ ========================
+def dependent_operations(instance, manager='objects'):
+    """Операции записи справочника (для категории - и операции ее подкатегорий)"""
+    operations = getattr(CashFlow, manager)
+    if isinstance(instance, Category):
+        return operations.filter(Q(category=instance) | Q(subcategory__category=instance))
+    return operations.filter(**{read_model.DICTIONARY_FIELDS[type(instance)]: instance})
+
+
+def delete_dictionary(instance):
+    """
+    Мягкое удаление записи справочника вместе с зависимыми операциями
+    (и подкатегориями - для категории).
+
+    Все помечаются одной отметкой deleted_at набором UPDATE по индексам
+    внешних ключей, без загрузки строк и каскада ORM; по этой отметке
+    restore восстанавливает ровно то, что было удалено вместе с записью.
+    Записи с операциями закрытых периодов не удаляются: изменились бы
+    итоги периодов. Возвращает число удаленных операций.
+    """
+    model = type(instance)
+    operations = dependent_operations(instance)
+    with transaction.atomic():
+        # Итоги есть у каждой комбинации справочников с операциями в закрытом
+        # месяце - в том числе перенесенными в архив
+        if PeriodSnapshot.objects.filter(**{read_model.DICTIONARY_FIELDS[model]: instance}).exists():
+            raise ValidationError(
+                'У записи есть операции закрытых периодов: удалить ее нельзя, объедините ее с другой записью')
+        since = operations.aggregate(since=Min('date'))['since']
+        now = timezone.now()
+        ids = operations.order_by().values('pk')
+        changefeed.record_queryset('cashflow', ids, ChangeLogEntry.DELETE)
+        CashFlowRow.objects.filter(cashflow__in=ids).delete()
+        budgets.apply(operations, sign=-1)
+        deleted = operations.update(deleted_at=now, updated_at=now)
+        if model is Category:
+            subcategories = SubCategory.objects.filter(category=instance)
+            changefeed.record_queryset('subcategory', subcategories, ChangeLogEntry.DELETE)
+            subcategories.update(deleted_at=now)
+        changefeed.record(instance, ChangeLogEntry.DELETE)
+        model.objects.filter(pk=instance.pk).update(deleted_at=now)
+        instance.deleted_at = now
+    caching.bump_version(caching.DICTIONARIES, caching.CASHFLOWS)
+    if since is not None:
+        balances.invalidate_checkpoints(since)
+    return deleted
+
+
+def _restore_operations(instance, deleted_at):
+    """
+    Восстановление операций, удаленных вместе с instance (отметка deleted_at).
+
+    Пропускаются операции закрытых периодов и операции, у которых удалена
+    еще какая-то запись справочника. Возвращает число операций.
+    """
+    if isinstance(instance, CashFlow):
+        scope = CashFlow.all_objects.filter(pk=instance.pk)
+    else:
+        scope = dependent_operations(instance, 'all_objects')
+    operations = scope.filter(
+        deleted_at=deleted_at,
+        status__deleted_at__isnull=True,
+        type__deleted_at__isnull=True,
+        category__deleted_at__isnull=True,
+        subcategory__deleted_at__isnull=True,
+    )
+    until = periods.closed_until()
+    if until:
+        operations = operations.filter(date__gt=until)
+    since = operations.aggregate(since=Min('date'))['since']
+    if since is None:
+        return 0
+    changefeed.record_queryset('cashflow', operations, ChangeLogEntry.UPSERT)
+    budgets.apply(operations)
+    restored = operations.update(deleted_at=None, updated_at=timezone.now())
+    read_model.rebuild(scope.filter(deleted_at__isnull=True, row__isnull=True).values('pk'))
+    balances.invalidate_checkpoints(since)
+    return restored
+
+
+def restore(instance):
+    """
+    Восстановление удаленной записи из корзины.
+
+    Операция восстанавливается одна, запись справочника - вместе со всем,
+    что было удалено с ней (та же отметка deleted_at). Возвращает число
+    восстановленных операций.
+    """
+    model = type(instance)
+    deleted_at = instance.deleted_at
+    if deleted_at is None:
+        raise ValidationError('Запись не удалена')
+    if model is CashFlow:
+        for field in read_model.DICTIONARY_FIELDS.values():
+            related = getattr(instance, field)
+            if related.deleted_at is not None:
+                raise ValidationError(f'Сначала восстановите запись "{related.name}"')
+        if periods.is_closed(instance.date):
+            raise ValidationError(f'Период {instance.date:%m.%Y} закрыт, изменения в нем запрещены')
+    elif model is SubCategory and instance.category.deleted_at is not None:
+        raise ValidationError(f'Сначала восстановите категорию "{instance.category.name}"')
+
+    with transaction.atomic():
+        if model is not CashFlow:
+            try:
+                with transaction.atomic():
+                    model.all_objects.filter(pk=instance.pk).update(deleted_at=None)
+                    if model is Category:
+                        subcategories = SubCategory.all_objects.filter(category=instance, deleted_at=deleted_at)
+                        subcategories.update(deleted_at=None)
+            except IntegrityError:
+                # Название заняла запись, созданная после удаления
+                raise ValidationError(f'Нельзя восстановить "{instance.name}": запись с таким названием уже есть')
+            changefeed.record(instance, ChangeLogEntry.UPSERT)
+            if model is Category:
+                changefeed.record_queryset(
+                    'subcategory', SubCategory.objects.filter(category=instance), ChangeLogEntry.UPSERT)
+        instance.deleted_at = None
+        restored = _restore_operations(instance, deleted_at)
+    caching.bump_version(caching.DICTIONARIES, caching.CASHFLOWS)
+    return restored
+
+
+def purge(older_than, batch_size=1000, pause=0):
+    """
+    Физическое удаление записей, удаленных раньше older_than, пачками.
+
+    Каждая пачка - отдельная короткая транзакция (DELETE по первичным
+    ключам), между пачками - пауза pause секунд, чтобы не блокировать
+    запись в базу надолго. Записи справочников удаляются, когда на них
+    не осталось ссылок, в том числе из архива: его ссылки без ограничений
+    FK, а restore_last возвращает их в CashFlow. Бюджеты удаляются вместе
+    с записью. Возвращает {модель: число удаленных записей}.
+    """
+    purged = {}
+    references = [
+        (CashFlow, 'cashflow', []),
+        (SubCategory, 'subcategory', [(CashFlow, 'subcategory'), (ArchivedCashFlow, 'subcategory'),
+                                      (PeriodSnapshot, 'subcategory'), (RecurringOperation, 'subcategory')]),
+        (Category, 'category', [(CashFlow, 'category'), (ArchivedCashFlow, 'category'), (SubCategory, 'category'),
+                                (PeriodSnapshot, 'category'), (RecurringOperation, 'category')]),
+        (Type, 'type', [(CashFlow, 'type'), (ArchivedCashFlow, 'type'), (PeriodSnapshot, 'type'),
+                        (RecurringOperation, 'type')]),
+        (Status, 'status', [(CashFlow, 'status'), (ArchivedCashFlow, 'status'), (PeriodSnapshot, 'status'),
+                            (RecurringOperation, 'status')]),
+    ]
+    for model, name, referencing in references:
+        candidates = model.all_objects.filter(deleted_at__lt=older_than)
+        for referencing_model, field in referencing:
+            manager = getattr(referencing_model, 'all_objects', referencing_model.objects)
+            candidates = candidates.filter(~Exists(manager.filter(**{field: OuterRef('pk')})))
+        purged[name] = 0
+        while True:
+            batch = list(candidates.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                if model is CashFlow:
+                    CashFlowRow.objects.filter(pk__in=batch).delete()
+                elif model in (Category, SubCategory):
+                    # Бюджеты удаляемых записей - вместе с ними
+                    Budget.objects.filter(**{f'{name}__in': batch}).delete()
+                doomed = model.all_objects.filter(pk__in=batch)
+                purged[name] += doomed._raw_delete(doomed.db)
+            if pause:
+                time.sleep(pause)
+    return purged
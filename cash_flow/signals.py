@@ -0,0 +1,98 @@
+"""
+Обработчики сигналов моделей приложения.
+
+Подключаются в CashFlowConfig.ready().
+"""
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import balances, budgets, caching, changefeed, read_model
+from .models import Budget, CashFlow, ChangeLogEntry, Status, Type, Category, SubCategory
+
+DICTIONARY_MODELS = (Status, Type, Category, SubCategory)
+
+
+@receiver(pre_save, sender=CashFlow)
+def cashflow_pre_save(sender, instance, raw=False, **kwargs):
+    """
+    Запоминаем прежние значения операции (одним запросом): остатки меняются
+    начиная с прежней даты, из бюджетов вычитается прежний вклад.
+    """
+    instance._previous_date = instance._previous_budget_state = None
+    if instance.pk and not instance._state.adding and not raw:
+        previous = CashFlow.all_objects.filter(pk=instance.pk).values_list(*budgets.STATE_FIELDS).first()
+        if previous:
+            instance._previous_date = previous[0]
+            instance._previous_budget_state = budgets.state(*previous)
+
+
+@receiver(post_save, sender=CashFlow)
+def cashflow_saved(sender, instance, raw=False, **kwargs):
+    """Изменение операции меняет строку списка, счетчики использования и остатки"""
+    if not raw:
+        # При загрузке фикстур справочники могут быть еще не загружены -
+        # строки восстанавливаются командой rebuild_read_model
+        read_model.sync(instance)
+        budgets.apply_change(getattr(instance, '_previous_budget_state', None), budgets.cashflow_state(instance))
+    changefeed.record(instance, ChangeLogEntry.UPSERT)
+    caching.bump_version(caching.CASHFLOWS)
+    previous_date = getattr(instance, '_previous_date', None)
+    balances.invalidate_checkpoints(min(filter(None, (instance.date, previous_date))))
+
+
+@receiver(pre_save, sender=Type)
+def type_pre_save(sender, instance, raw=False, **kwargs):
+    """Запоминаем прежний знак типа: его смена меняет факты бюджетов"""
+    instance._previous_is_income = None
+    if instance.pk and not instance._state.adding and not raw:
+        instance._previous_is_income = (
+            Type.all_objects.filter(pk=instance.pk).values_list('is_income', flat=True).first()
+        )
+
+
+@receiver(pre_save, sender=Budget)
+def budget_pre_save(sender, instance, raw=False, **kwargs):
+    """Бюджет - на месяц целиком; факт нового или измененного бюджета считается по операциям"""
+    if not raw:
+        instance.month = instance.month.replace(day=1)
+        instance.actual = budgets.compute(instance)
+
+
+def dictionary_changed(sender, instance, **kwargs):
+    """
+    Изменение или удаление записи справочника.
+
+    Удаление каскадно удаляет операции, поэтому меняется и версия операций.
+    Обработчик post_delete для CashFlow намеренно не подключается: он заставил
+    бы Django загружать и обрабатывать каждую каскадно удаляемую операцию.
+    """
+    caching.bump_version(caching.DICTIONARIES, caching.CASHFLOWS)
+    if kwargs.get('signal') is post_save and not kwargs.get('created') and not kwargs.get('raw'):
+        # Переименование - одним UPDATE по строкам списка операций
+        read_model.rename(instance)
+    if kwargs.get('signal') is post_save:
+        changefeed.record(instance, ChangeLogEntry.UPSERT)
+    if (kwargs.get('signal') is post_save and sender is Type
+            and getattr(instance, '_previous_is_income', None) not in (None, instance.is_income)):
+        # Смена знака типа: его операции входят в факты бюджетов или выходят из них
+        budgets.type_sign_changed(instance)
+    if sender is Type or kwargs.get('signal') is post_delete:
+        # Смена знака типа или каскадное удаление операций меняет все остатки
+        balances.invalidate_checkpoints()
+
+
+def dictionary_deleting(sender, instance, origin=None, **kwargs):
+    """
+    Надгробия в ленте изменений для записи справочника и каскадно удаляемых объектов.
+
+    Подкатегории, удаляемые вместе с категорией, уже учтены обработчиком категории.
+    """
+    if sender is SubCategory and getattr(origin, 'model', type(origin)) is Category:
+        return
+    changefeed.record_cascade_delete(instance)
+
+
+for model in DICTIONARY_MODELS:
+    pre_delete.connect(dictionary_deleting, sender=model, dispatch_uid=f'dictionary_deleting_{model.__name__}')
+    post_save.connect(dictionary_changed, sender=model, dispatch_uid=f'dictionary_saved_{model.__name__}')
+    post_delete.connect(dictionary_changed, sender=model, dispatch_uid=f'dictionary_deleted_{model.__name__}')
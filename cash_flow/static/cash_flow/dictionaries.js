@@ -0,0 +1,8 @@
+// Активация таба справочника из адреса страницы (#statuses, #types, ...)
+document.addEventListener('DOMContentLoaded', function() {
+    const hash = window.location.hash;
+    if (hash) {
+        const tabTrigger = new bootstrap.Tab(document.querySelector(`[data-bs-target="${hash}"]`));
+        tabTrigger.show();
+    }
+});
@@ -0,0 +1,89 @@
+// Обновление строк списка по потоку изменений (Server-Sent Events).
+// Адрес потока с начальным курсором - в атрибуте data-url тега script.
+(function() {
+    const url = document.currentScript.dataset.url;
+    if (!window.EventSource) {
+        return;
+    }
+    const table = document.querySelector('table tbody');
+    const notice = document.getElementById('live-notice');
+    const noticeText = document.getElementById('live-notice-text');
+    const rowFields = ['date', 'status_name', 'type_name', 'category_name', 'subcategory_name', 'comment_excerpt'];
+    let created = 0;
+    let balancesChanged = false;
+
+    function showNotice(text) {
+        const parts = [];
+        if (created) {
+            parts.push('Новых операций: ' + created + '.');
+        }
+        if (balancesChanged) {
+            parts.push('Остатки изменились.');
+        }
+        if (text) {
+            parts.push(text);
+        }
+        noticeText.textContent = parts.join(' ');
+        notice.classList.remove('d-none');
+    }
+
+    function highlight(row) {
+        row.classList.add('table-warning');
+        setTimeout(function() { row.classList.remove('table-warning'); }, 3000);
+    }
+
+    function applyCashflow(event) {
+        const row = table.querySelector('tr[data-id="' + event.id + '"]');
+        if (event.action === 'delete') {
+            if (row) {
+                row.remove();
+                balancesChanged = true;
+                showNotice();
+            }
+            return;
+        }
+        if (!row) {
+            created += 1;
+            showNotice();
+            return;
+        }
+        const data = event.row;
+        rowFields.forEach(function(field) {
+            row.querySelector('[data-field="' + field + '"]').textContent = data[field];
+        });
+        ['status', 'type', 'category', 'subcategory'].forEach(function(model) {
+            row.querySelector('[data-field="' + model + '_name"]').dataset[model + 'Id'] = data[model + '_id'];
+        });
+        row.querySelector('[data-field="amount"]').textContent = data.amount + ' ₽';
+        balancesChanged = true;
+        highlight(row);
+        showNotice();
+    }
+
+    function applyDictionary(event) {
+        if (event.action !== 'upsert') {
+            return;  // Каскадно удаленные операции приходят отдельными событиями
+        }
+        table.querySelectorAll('[data-' + event.model + '-id="' + event.id + '"]').forEach(function(cell) {
+            cell.textContent = event.name;
+        });
+        if (event.model === 'type') {
+            balancesChanged = true;  // Мог измениться знак операций типа
+            showNotice();
+        }
+    }
+
+    const source = new EventSource(url);
+    source.addEventListener('change', function(message) {
+        const event = JSON.parse(message.data);
+        if (event.model === 'cashflow') {
+            applyCashflow(event);
+        } else {
+            applyDictionary(event);
+        }
+    });
+    source.addEventListener('reset', function() {
+        source.close();
+        showNotice('Изменений слишком много для обновления на месте.');
+    });
+})();
@@ -0,0 +1,107 @@
+// Выпадающие списки справочников с поиском (атрибут data-typeahead).
+// Варианты загружаются порциями из /api/dictionaries/search/ при открытии
+// списка и при вводе в поле поиска; первый вариант (пустой) сохраняется всегда.
+(function() {
+    'use strict';
+    const LIMIT = 20;
+    const DEBOUNCE_MS = 250;
+
+    function initTypeahead(select) {
+        const placeholder = select.options.length ? select.options[0] : null;
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-control form-control-sm mb-1';
+        search.placeholder = 'Поиск по названию';
+        search.disabled = select.disabled;
+        select.parentNode.insertBefore(search, select);
+
+        const more = document.createElement('button');
+        more.type = 'button';
+        more.className = 'btn btn-link btn-sm p-0 d-none';
+        more.textContent = 'Показать еще';
+        select.after(more);
+
+        const depends = select.dataset.typeaheadDepends
+            ? document.getElementById(select.dataset.typeaheadDepends)
+            : null;
+        let loaded = false;
+        let next = null;
+        let timer = null;
+        let request = 0;
+
+        function reset() {
+            // Оставляем пустой вариант и выбранную запись
+            Array.from(select.options).forEach(function(option) {
+                if (option !== placeholder && !option.selected) {
+                    option.remove();
+                }
+            });
+        }
+
+        function load(append) {
+            const params = new URLSearchParams({model: select.dataset.typeahead, q: search.value, limit: LIMIT});
+            if (append && next) {
+                params.set('after', next);
+            }
+            if (depends) {
+                if (!depends.value || depends.value === 'all') {
+                    return;
+                }
+                params.set('category', depends.value);
+            }
+            const current = ++request;
+            fetch(select.dataset.typeaheadUrl + '?' + params)
+                .then(response => response.json())
+                .then(data => {
+                    if (current !== request) {
+                        return;  // Ответ на устаревший запрос
+                    }
+                    if (!append) {
+                        reset();
+                    }
+                    const present = new Set(Array.from(select.options).map(option => option.value));
+                    data.results.forEach(item => {
+                        if (!present.has(String(item.id))) {
+                            select.add(new Option(item.name, item.id));
+                        }
+                    });
+                    next = data.next;
+                    more.classList.toggle('d-none', !next);
+                    loaded = true;
+                });
+        }
+
+        // Первая порция - при первом открытии списка
+        ['focus', 'mousedown'].forEach(function(type) {
+            select.addEventListener(type, function() {
+                if (!loaded) {
+                    load(false);
+                }
+            });
+        });
+        search.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() { load(false); }, DEBOUNCE_MS);
+        });
+        more.addEventListener('click', function() { load(true); });
+
+        if (depends) {
+            // Смена категории сбрасывает выбранную подкатегорию
+            depends.addEventListener('change', function() {
+                select.value = placeholder ? placeholder.value : '';
+                reset();
+                loaded = false;
+                next = null;
+                more.classList.add('d-none');
+                search.value = '';
+                const enabled = Boolean(depends.value) && depends.value !== 'all';
+                select.disabled = !enabled;
+                search.disabled = !enabled;
+            });
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('select[data-typeahead]').forEach(initTypeahead);
+    });
+})();
@@ -0,0 +1,119 @@
+"""
+Организации: данные нескольких подразделений в одном экземпляре приложения.
+
+Все модели приложения содержат организацию (TenantModel), менеджеры
+objects и all_objects отбирают записи текущей организации, новые записи
+получают ее при сохранении. Индексы и уникальные ограничения начинаются
+с организации: запросы одной организации читают только ее диапазон
+индекса, названия справочников уникальны в пределах организации.
+
+Текущая организация хранится в contextvar: для запроса ее выбирает
+OrganizationMiddleware, в командах и shell - activate(). Без текущей
+организации менеджеры возвращают записи всех организаций.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import Http404
+
+# Заголовок с кодом организации для API-клиентов
+ORGANIZATION_HEADER = 'X-Organization'
+SESSION_KEY = 'cash_flow_organization'
+
+_current = contextvars.ContextVar('cash_flow_organization', default=None)
+
+
+def get_current():
+    """Текущая организация или None"""
+    return _current.get()
+
+
+def current_id():
+    """id текущей организации или None"""
+    organization = _current.get()
+    return organization.pk if organization is not None else None
+
+
+@contextmanager
+def activate(organization):
+    """Выполнение блока от имени организации"""
+    token = _current.set(organization)
+    try:
+        yield organization
+    finally:
+        _current.reset(token)
+
+
+def default_slug():
+    return getattr(settings, 'CASH_FLOW_DEFAULT_ORGANIZATION', 'main')
+
+
+def resolve(request, organizations):
+    """
+    Организация запроса из списка organizations или None.
+
+    Заголовок X-Organization (для API) определяет организацию однозначно;
+    иначе - выбранная на сайте (сессия), поддомен, организация по умолчанию
+    CASH_FLOW_DEFAULT_ORGANIZATION.
+    """
+    by_slug = {organization.slug: organization for organization in organizations}
+    slug = request.headers.get(ORGANIZATION_HEADER)
+    if slug:
+        return by_slug.get(slug)
+    candidates = [
+        request.session.get(SESSION_KEY) if hasattr(request, 'session') else None,
+        request.get_host().partition(':')[0].split('.')[0],
+        default_slug(),
+    ]
+    return next((by_slug[slug] for slug in candidates if slug in by_slug), None)
+
+
+class OrganizationMiddleware:
+    """
+    Выбор текущей организации на время обработки запроса.
+
+    Организаций немного: список читается одним запросом и остается в
+    request.organizations - для переключателя в base.html.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .models import Organization
+
+        request.organizations = list(Organization.objects.all())
+        organization = resolve(request, request.organizations)
+        if organization is None:
+            raise Http404('Организация не найдена')
+        request.organization = organization
+        with activate(organization):
+            return self.get_response(request)
+
+
+def organizations_context(request):
+    """Текущая организация и список организаций для переключателя в base.html"""
+    return {
+        'organization': getattr(request, 'organization', None),
+        'organizations': getattr(request, 'organizations', []),
+    }
+
+
+# ======================== КОМАНДЫ ========================
+def add_argument(parser):
+    """Параметр --organization команды, выполняемой по организациям"""
+    parser.add_argument(
+        '--organization',
+        help='Код организации (по умолчанию - все организации по очереди)',
+    )
+
+
+def selected(slug=None):
+    """Организации для команды: одна по коду или все"""
+    from .models import Organization
+
+    organizations = Organization.objects.order_by('pk')
+    if slug:
+        organizations = organizations.filter(slug=slug)
+    return list(organizations)
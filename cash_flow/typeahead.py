@@ -0,0 +1,76 @@
+"""
+Поиск по справочникам для выпадающих списков с подгрузкой (typeahead).
+
+Поиск по префиксу - диапазон по индексу LOWER(name) (уникальные индексы
+справочников), выдача порциями с продолжением по ключу (name, id), поэтому
+время ответа не зависит от размера справочника.
+"""
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import Status, Type, Category, SubCategory
+
+SEARCH_MODELS = {
+    'status': Status,
+    'type': Type,
+    'category': Category,
+    'subcategory': SubCategory,
+}
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _prefix_range(prefix):
+    """Диапазон строк с префиксом: 'мар' -> ['мар', 'маса')"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _variants(query):
+    """
+    Варианты префикса для сравнения с LOWER(name).
+
+    LOWER() в SQLite меняет регистр только латиницы: кириллические названия
+    лежат в индексе как есть, обычно с заглавной буквы.
+    """
+    return {query.lower(), query[:1].upper() + query[1:].lower()}
+
+
+def prefix_filter(queryset, query):
+    """Отбор записей с названием, начинающимся с query (аннотация name_lower)"""
+    queryset = queryset.annotate(name_lower=Lower('name'))
+    query = query.strip()
+    if not query:
+        return queryset
+    condition = Q()
+    for variant in _variants(query):
+        low, high = _prefix_range(variant)
+        condition |= Q(name_lower__gte=low, name_lower__lt=high)
+    return queryset.filter(condition)
+
+
+def search(model, query='', limit=DEFAULT_LIMIT, after=None, category=None):
+    """
+    Записи справочника, название которых начинается с query.
+
+    Точное совпадение выводится первым, остальные - по алфавиту.
+    after - id последней записи предыдущей порции. Возвращает
+    (записи [{'id', 'name'}], id для следующей порции или None).
+    """
+    queryset = model.objects.all()
+    if category is not None:
+        queryset = queryset.filter(category_id=category)
+    query = query.strip()
+    queryset = prefix_filter(queryset, query)
+
+    if after is not None:
+        last = queryset.filter(pk=after).values_list('name_lower', flat=True).first()
+        if last is not None:
+            queryset = queryset.filter(Q(name_lower__gt=last) | Q(name_lower=last, pk__gt=after))
+
+    rows = list(queryset.order_by('name_lower', 'pk').values('pk', 'name')[:limit + 1])
+    next_after = rows[limit - 1]['pk'] if len(rows) > limit else None
+    rows = rows[:limit]
+    if query and after is None:
+        exact = query.lower()
+        rows.sort(key=lambda row: row['name'].lower() != exact)
+    return [{'id': row['pk'], 'name': row['name']} for row in rows], next_after
@@ -1,6 +1,13 @@
 from django.urls import path
+from .models import Status, Type, Category, SubCategory
 from .views import (
-    create_cashflow, edit_cashflow, delete_cashflow, get_subcategories,    
+    create_cashflow, edit_cashflow, delete_cashflow, get_subcategories, get_balance,
+    search_dictionary, merge_dictionary,
+    TrashView, restore_deleted,
+    ClosedPeriodListView, close_period, reopen_period, report_totals,
+    export_cashflows, get_cashflows, get_changes, live_events, report_pivot, pivot_page,
+    profile_list, download_profile, select_organization,
+    BudgetListView, BudgetCreateView, BudgetUpdateView, BudgetDeleteView,
     DictionaryListView, CashFlowListView,
     StatusCreateView, StatusUpdateView, StatusDeleteView,
     TypeCreateView, TypeUpdateView, TypeDeleteView,
@@ -29,6 +36,12 @@ urlpatterns = [
          StatusDeleteView.as_view(), 
          name='status_delete'),
     
+    # Объединение статуса с другой записью
+    path('dictionaries/status/<int:pk>/merge/', 
+         merge_dictionary, 
+         {'model': Status}, 
+         name='status_merge'),
+    
     # ---------- Типы операций ----------
     # Создание нового типа операции
     path('dictionaries/type/add/', 
@@ -45,6 +58,12 @@ urlpatterns = [
          TypeDeleteView.as_view(), 
          name='type_delete'),
     
+    # Объединение типа с другой записью
+    path('dictionaries/type/<int:pk>/merge/', 
+         merge_dictionary, 
+         {'model': Type}, 
+         name='type_merge'),
+    
     # ---------- Категории ----------
     # Создание новой категории
     path('dictionaries/category/add/', 
@@ -61,6 +80,12 @@ urlpatterns = [
          CategoryDeleteView.as_view(), 
          name='category_delete'),
     
+    # Объединение категории (с подкатегориями) с другой записью
+    path('dictionaries/category/<int:pk>/merge/', 
+         merge_dictionary, 
+         {'model': Category}, 
+         name='category_merge'),
+    
     # ---------- Подкатегории ----------
     # Создание подкатегории (с выбором родительской категории)
     path('dictionaries/subcategory/add/', 
@@ -77,6 +102,12 @@ urlpatterns = [
          SubCategoryDeleteView.as_view(), 
          name='subcategory_delete'),
     
+    # Объединение подкатегории с другой записью
+    path('dictionaries/subcategory/<int:pk>/merge/', 
+         merge_dictionary, 
+         {'model': SubCategory}, 
+         name='subcategory_merge'),
+    
     # ==================== ОСНОВНЫЕ СТРАНИЦЫ ====================
     # Главная страница - список денежных операций
     path('', 
@@ -98,9 +129,118 @@ urlpatterns = [
          delete_cashflow, 
          name='delete'),
     
+    # Корзина: удаленные операции и записи справочников
+    path('trash/', 
+         TrashView.as_view(), 
+         name='trash'),
+    
+    # Восстановление записи из корзины (POST)
+    path('trash/<str:model_name>/<int:pk>/restore/', 
+         restore_deleted, 
+         name='restore_deleted'),
+    
+    # Экспорт операций в CSV (с текущими фильтрами)
+    path('export/', 
+         export_cashflows, 
+         name='export'),
+    
+    # Матрица "категория x месяц"
+    path('reports/pivot/', 
+         pivot_page, 
+         name='pivot'),
+    
+    # ==================== ЗАКРЫТИЕ ПЕРИОДОВ ====================
+    # Список закрытых месяцев
+    path('periods/', 
+         ClosedPeriodListView.as_view(), 
+         name='periods'),
+    
+    # Закрытие следующего месяца (POST)
+    path('periods/close/', 
+         close_period, 
+         name='period_close'),
+    
+    # Открытие последнего закрытого месяца (POST)
+    path('periods/reopen/', 
+         reopen_period, 
+         name='period_reopen'),
+    
+    # ==================== БЮДЖЕТЫ ====================
+    # Бюджеты месяца: план и факт (?month=ГГГГ-ММ)
+    path('budgets/', 
+         BudgetListView.as_view(), 
+         name='budgets'),
+    
+    # Новый бюджет
+    path('budgets/add/', 
+         BudgetCreateView.as_view(), 
+         name='budget_create'),
+    
+    # Изменение бюджета
+    path('budgets/<int:pk>/edit/', 
+         BudgetUpdateView.as_view(), 
+         name='budget_update'),
+    
+    # Удаление бюджета (требует подтверждения)
+    path('budgets/<int:pk>/delete/', 
+         BudgetDeleteView.as_view(), 
+         name='budget_delete'),
+    
     # ==================== API ЭНДПОИНТЫ ====================
     # AJAX-запрос для получения подкатегорий по выбранной категории
     path('api/subcategories/', 
          get_subcategories, 
          name='get_subcategories'),
+    
+    # Поиск по справочникам для выпадающих списков (по префиксу названия)
+    path('api/dictionaries/search/', 
+         search_dictionary, 
+         name='search_dictionary'),
+    
+    # Список операций в JSON (с фильтрами списка)
+    path('api/cashflows/', 
+         get_cashflows, 
+         name='get_cashflows'),
+    
+    # Лента изменений для синхронизации (курсор по журналу изменений)
+    path('api/changes/', 
+         get_changes, 
+         name='get_changes'),
+    
+    # Поток изменений для страницы операций (SSE, только под ASGI)
+    path('api/live/', 
+         live_events, 
+         name='live_events'),
+    
+    # Остаток на дату (по контрольным точкам)
+    path('api/balance/', 
+         get_balance, 
+         name='get_balance'),
+    
+    # Итоги в разрезе справочников (закрытые месяцы - из итогов периодов)
+    path('api/report/totals/', 
+         report_totals, 
+         name='report_totals'),
+    
+    # Матрица "категория (подкатегория) x месяц" в JSON или CSV
+    path('api/report/pivot/', 
+         report_pivot, 
+         name='report_pivot'),
+    
+    # ==================== ОРГАНИЗАЦИИ ====================
+    # Выбор организации (сохраняется в сессии)
+    path('organizations/select/', 
+         select_organization, 
+         name='select_organization'),
+    
+    # ==================== ПРОФИЛИРОВАНИЕ ====================
+    # Сохраненные профили запросов (для сотрудников)
+    path('profiles/', 
+         profile_list, 
+         name='profiles'),
+    
+    # Скачивание профиля или отчета
+    path('profiles/<str:name>.<str:kind>', 
+         download_profile, 
+         name='download_profile'),
 ]
\ No newline at end of file
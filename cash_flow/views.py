@@ -1,16 +1,44 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView
-from .models import CashFlow, Status, Type, Category, SubCategory
-from .forms import CashFlowForm, CategoryForm, SubCategoryForm, StatusForm, TypeForm
-from django.http import JsonResponse
-from datetime import datetime
+from .models import ArchivedCashFlow, Budget, CashFlow, CashFlowRow, Status, Type, Category, SubCategory, ClosedPeriod, Organization
+from .forms import BudgetForm, CashFlowForm, CategoryForm, SubCategoryForm, StatusForm, TypeForm, MergeForm
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+import csv
+from datetime import date, timedelta
+from decimal import Decimal
 from django.views.generic import ListView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.views.decorators.http import require_POST
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from . import archive, balances, budgets, caching, changefeed, live, periods, profiling, reports, services, tenancy, typeahead
+from .filters import get_filters, apply_filters, parse_date
 
 
 # ======================== СПРАВОЧНИКИ ========================
+def _related_count(model, field):
+    """
+    Подзапрос с количеством связанных записей для аннотации справочника.
+
+    В отличие от нескольких Count() в одном запросе не размножает строки
+    соединениями и не требует GROUP BY по всему справочнику.
+    """
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
 class DictionaryListView(ListView):
     """Главная страница управления справочниками"""
     template_name = 'cash_flow/dictionaries.html'
@@ -20,17 +48,86 @@ class DictionaryListView(ListView):
         return None
     
     def get_context_data(self, **kwargs):
-        """Добавляем все справочники в контекст шаблона"""
+        """
+        Добавляем все справочники в контекст шаблона.
+
+        Querysets ленивые: при попадании в кэш фрагмента вкладок
+        запросы к базе не выполняются.
+        """
         context = super().get_context_data(**kwargs)
-        context['statuses'] = Status.objects.all()
-        context['types'] = Type.objects.all()
-        context['categories'] = Category.objects.all()
-        context['subcategories'] = SubCategory.objects.all()
+        context['statuses'] = Status.objects.annotate(
+            cashflow_count=_related_count(CashFlow, 'status'))
+        context['types'] = Type.objects.annotate(
+            cashflow_count=_related_count(CashFlow, 'type'))
+        context['categories'] = Category.objects.annotate(
+            cashflow_count=_related_count(CashFlow, 'category'),
+            subcategory_count=_related_count(SubCategory, 'category'))
+        context['subcategories'] = SubCategory.objects.select_related('category').annotate(
+            cashflow_count=_related_count(CashFlow, 'subcategory'))
+        context.update(caching.fragment_cache_context())
         return context
 
 
+class UniqueNameViewMixin:
+    """
+    Сохранение записи справочника с проверкой уникальности индексом БД.
+
+    Запись выполняется в точке сохранения: нарушение уникального индекса
+    названия откатывает только ее и выводится как ошибка поля unique_field
+    (None - ошибка формы) с текстом из violation_error_message ограничения.
+    """
+    unique_field = 'name'
+
+    def _violated(self, constraint, message):
+        """
+        Нарушено ли ограничение: SQLite называет индекс по выражению, а для
+        индекса по полям перечисляет его столбцы.
+        """
+        if constraint.name in message:
+            return True
+        meta = self.model._meta
+        columns = ', '.join(f'{meta.db_table}.{meta.get_field(name).column}' for name in constraint.fields)
+        return bool(constraint.fields) and message.endswith(columns)
+
+    def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError as exc:
+            constraint = next(
+                (c for c in self.model._meta.constraints if self._violated(c, str(exc))), None)
+            if constraint is None:
+                raise
+            form.add_error(self.unique_field, constraint.violation_error_message)
+            return self.form_invalid(form)
+
+
+class SoftDeleteViewMixin:
+    """
+    Удаление записи справочника в корзину (services.delete_dictionary).
+
+    Запись и зависимые операции помечаются удаленными несколькими UPDATE,
+    физически их удаляет команда purge_deleted. deleted_message - текст
+    сообщения с подстановками {name} и {count} (число операций).
+    """
+    deleted_message = '"{name}" и {count} связанных записей удалены'
+
+    def form_valid(self, form):
+        self.object = self.get_object()
+        try:
+            count = services.delete_dictionary(self.object)
+        except ValidationError as e:
+            messages.error(self.request, e.messages[0])
+        else:
+            messages.success(
+                self.request,
+                self.deleted_message.format(name=self.object.name, count=count) + '. Восстановить можно в корзине',
+            )
+        return redirect(f"{self.get_success_url()}?tab={DICTIONARY_TABS[self.model]}")
+
+
 # ======================== CRUD ДЛЯ СТАТУСОВ ========================
-class StatusCreateView(CreateView):
+class StatusCreateView(UniqueNameViewMixin, CreateView):
     """Создание нового статуса"""
     model = Status
     form_class = StatusForm
@@ -44,18 +141,19 @@ class StatusCreateView(CreateView):
                 messages.error(self.request, str(error))
         return super().form_invalid(form)
     
-class StatusUpdateView(UpdateView):
+class StatusUpdateView(UniqueNameViewMixin, UpdateView):
     """Редактирование существующего статуса"""
     model = Status
-    fields = ['name']  # Поля для редактирования
+    form_class = StatusForm
     template_name = 'cash_flow/status_edit.html'
     success_url = reverse_lazy('dictionaries')
 
-class StatusDeleteView(DeleteView):
+class StatusDeleteView(SoftDeleteViewMixin, DeleteView):
     """Удаление статуса с подтверждением"""
     model = Status
     template_name = 'cash_flow/status_delete.html'
     success_url = reverse_lazy('dictionaries')
+    deleted_message = 'Статус "{name}" и {count} связанных записей удалены'
 
     def get_context_data(self, **kwargs):
         """Добавляем количество связанных записей в контекст"""
@@ -64,29 +162,9 @@ class StatusDeleteView(DeleteView):
         context['related_records_count'] = obj.cashflow_set.count() if obj and obj.pk else 0
         return context
 
-    def delete(self, request, *args, **kwargs):
-        """Обработка удаления с выводом сообщения"""
-        try:
-            self.object = self.get_object()
-            if not self.object.pk:
-                raise ValueError("Не удалось получить объект для удаления")
-                
-            related_count = self.object.cashflow_set.count()
-            response = super().delete(request, *args, **kwargs)
-            
-            messages.success(
-                request,
-                f'Статус "{self.object.name}" и {related_count} связанных записей успешно удалены'
-            )
-            return response
-            
-        except Exception as e:
-            messages.error(request, f'Ошибка при удалении: {str(e)}')
-            return redirect('dictionaries')
-
 
 # ======================== CRUD ДЛЯ ТИПОВ ========================
-class TypeCreateView(CreateView):
+class TypeCreateView(UniqueNameViewMixin, CreateView):
     """Создание нового типа операции"""
     model = Type
     form_class = TypeForm
@@ -100,18 +178,19 @@ class TypeCreateView(CreateView):
                 messages.error(self.request, str(error))
         return super().form_invalid(form)
 
-class TypeUpdateView(UpdateView):
+class TypeUpdateView(UniqueNameViewMixin, UpdateView):
     """Редактирование типа операции"""
     model = Type
-    fields = ['name']
+    form_class = TypeForm
     template_name = 'cash_flow/type_edit.html'
     success_url = reverse_lazy('dictionaries')
 
-class TypeDeleteView(DeleteView):
+class TypeDeleteView(SoftDeleteViewMixin, DeleteView):
     """Удаление типа операции"""
     model = Type
     template_name = 'cash_flow/type_delete.html'
     success_url = reverse_lazy('dictionaries')
+    deleted_message = 'Тип "{name}" и {count} связанных записей удалены'
     
     def get_context_data(self, **kwargs):
         """Добавление информации о связанных записях"""
@@ -120,26 +199,9 @@ class TypeDeleteView(DeleteView):
         context['related_records_count'] = obj.cashflow_set.count() if obj.pk else 0
         return context
 
-    def delete(self, request, *args, **kwargs):
-        """Обработка удаления с информированием пользователя"""
-        try:
-            self.object = self.get_object()
-            related_count = self.object.cashflow_set.count()
-            response = super().delete(request, *args, **kwargs)
-            
-            messages.success(
-                request,
-                f'Тип "{self.object.name}" и {related_count} связанных записей успешно удалены'
-            )
-            return response
-            
-        except Exception as e:
-            messages.error(request, f'Ошибка при удалении: {str(e)}')
-            return redirect('dictionaries')
-
 
 # ======================== CRUD ДЛЯ КАТЕГОРИЙ ========================
-class CategoryCreateView(CreateView):
+class CategoryCreateView(UniqueNameViewMixin, CreateView):
     """Создание новой категории"""
     model = Category
     form_class = CategoryForm
@@ -153,24 +215,19 @@ class CategoryCreateView(CreateView):
                 messages.error(self.request, str(error))
         return super().form_invalid(form)
     
-class CategoryUpdateView(UpdateView):
+class CategoryUpdateView(UniqueNameViewMixin, UpdateView):
     """Редактирование существующей категории"""
     model = Category
     form_class = CategoryForm
     template_name = 'cash_flow/category_edit.html'
     success_url = reverse_lazy('dictionaries')
 
-    def form_valid(self, form):
-        """Обработка случая, когда тип не выбран"""
-        if not form.cleaned_data['type']:
-            form.instance.type = None
-        return super().form_valid(form)
-
-class CategoryDeleteView(DeleteView):
+class CategoryDeleteView(SoftDeleteViewMixin, DeleteView):
     """Удаление категории с подтверждением"""
     model = Category
     template_name = 'cash_flow/category_delete.html'
     success_url = reverse_lazy('dictionaries')
+    deleted_message = 'Категория "{name}" и {count} связанных операций удалены'
     
     def get_context_data(self, **kwargs):
         """Подготовка данных о связанных объектах"""
@@ -186,30 +243,9 @@ class CategoryDeleteView(DeleteView):
         
         return context
 
-    def delete(self, request, *args, **kwargs):
-        """Обработка удаления с подробным сообщением"""
-        try:
-            self.object = self.get_object()
-            cashflow_count = self.object.cashflow_set.count()
-            subcategory_count = self.object.subcategory_set.count()
-            total_count = cashflow_count + subcategory_count
-            
-            response = super().delete(request, *args, **kwargs)
-            
-            messages.success(
-                request,
-                f'Категория "{self.object.name}" и {total_count} связанных элементов удалены '
-                f'({cashflow_count} операций, {subcategory_count} подкатегорий)'
-            )
-            return response
-            
-        except Exception as e:
-            messages.error(request, f'Ошибка при удалении: {str(e)}')
-            return redirect('dictionaries')
-
 
 # ======================== CRUD ДЛЯ ПОДКАТЕГОРИЙ ========================
-class SubCategoryCreateView(CreateView):
+class SubCategoryCreateView(UniqueNameViewMixin, CreateView):
     """Создание новой подкатегории"""
     model = SubCategory
     form_class = SubCategoryForm
@@ -222,25 +258,30 @@ class SubCategoryCreateView(CreateView):
             for error in errors:
                 messages.error(self.request, str(error))
         return super().form_invalid(form)
-    
-    def get_form_kwargs(self):
-        """Добавляем список категорий для формы"""
-        kwargs = super().get_form_kwargs()
-        kwargs['categories'] = Category.objects.all()
-        return kwargs
 
-class SubCategoryUpdateView(UpdateView):
+class SubCategoryUpdateView(UniqueNameViewMixin, UpdateView):
     """Редактирование подкатегории"""
     model = SubCategory
     form_class = SubCategoryForm
     template_name = 'cash_flow/subcategory_edit.html'
     success_url = reverse_lazy('dictionaries')
 
-class SubCategoryDeleteView(DeleteView):
+    def form_valid(self, form):
+        """Смена категории переносит в нее и операции подкатегории"""
+        with transaction.atomic():
+            response = super().form_valid(form)
+            # Ошибка уникальности названия добавляется в форму - тогда ничего не сохранено
+            if form.is_valid() and 'category' in form.changed_data:
+                moved = services.move_subcategory_operations(self.object)
+                messages.success(self.request, f'Операций перенесено в категорию "{self.object.category}": {moved}')
+        return response
+
+class SubCategoryDeleteView(SoftDeleteViewMixin, DeleteView):
     """Удаление подкатегории"""
     model = SubCategory
     template_name = 'cash_flow/subcategory_delete.html'
     success_url = reverse_lazy('dictionaries')
+    deleted_message = 'Подкатегория "{name}" и {count} связанных записей удалены'
     
     def get_context_data(self, **kwargs):
         """Добавление информации о связанных записях"""
@@ -249,72 +290,126 @@ class SubCategoryDeleteView(DeleteView):
         context['related_records_count'] = obj.cashflow_set.count() if obj.pk else 0
         return context
 
-    def delete(self, request, *args, **kwargs):
-        """Обработка удаления с информированием пользователя"""
+
+# ======================== ОБЪЕДИНЕНИЕ СПРАВОЧНИКОВ ========================
+DICTIONARY_TABS = {
+    Status: 'statuses',
+    Type: 'types',
+    Category: 'categories',
+    SubCategory: 'subcategories',
+}
+
+def merge_dictionary(request, model, pk):
+    """
+    Объединение записи справочника с другой записью того же справочника.
+
+    Операции перепривязываются одним UPDATE, после чего запись удаляется.
+    """
+    source = get_object_or_404(model, pk=pk)
+    form = MergeForm(request.POST or None, source=source)
+    if request.method == 'POST' and form.is_valid():
+        target = form.cleaned_data['target']
         try:
-            self.object = self.get_object()
-            related_count = self.object.cashflow_set.count()
-            response = super().delete(request, *args, **kwargs)
-            
-            messages.success(
-                request,
-                f'Подкатегория "{self.object.name}" и {related_count} связанных записей успешно удалены'
-            )
-            return response
-            
-        except Exception as e:
-            messages.error(request, f'Ошибка при удалении: {str(e)}')
-            return redirect('dictionaries')
+            moved = services.merge(source, target)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            messages.success(request, f'Запись "{source.name}" объединена с "{target.name}", перенесено операций: {moved}')
+            return redirect(f"{reverse('dictionaries')}?tab={DICTIONARY_TABS[model]}")
+    else:
+        _form_errors_to_messages(request, form)
+
+    return render(request, 'cash_flow/dictionary_merge.html', {
+        'form': form,
+        'object': source,
+        'tab': DICTIONARY_TABS[model],
+        'related_records_count': CashFlow.objects.filter(**{model._meta.model_name: source}).count(),
+    })
 
 
 # ======================== ОПЕРАЦИИ С ДЕНЕЖНЫМИ ПОТОКАМИ ========================
 class CashFlowListView(ListView):
-    """Список денежных операций с фильтрацией"""
-    model = CashFlow
+    """
+    Список денежных операций с фильтрацией.
+
+    Читает денормализованную модель CashFlowRow: одна таблица без соединений.
+    """
+    model = CashFlowRow
     template_name = 'cash_flow/index.html'
     context_object_name = 'cashflows'
     paginate_by = 20
     ordering = ['-date']  # Сортировка по дате (новые сверху)
     
     def get_queryset(self):
-        """Применение фильтров к списку операций"""
+        """
+        Применение фильтров к списку операций.
+
+        Без периода и при периоде после архива читаются только горячие строки.
+        Если период начинается в архиве, за горячими строками следуют архивные
+        (они старше). Остаток после операции считается только для строк
+        страницы (paginate_queryset).
+        """
         queryset = super().get_queryset()
-        request = self.request
-        
-        # Фильтрация по дате (период)
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        if date_from and date_to:
-            try:
-                date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
-                date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__range=[date_from, date_to])
-            except ValueError:
-                pass  # Неверный формат даты - игнорируем фильтр
-
-        # Фильтрация по статусу
-        status = request.GET.get('status')
-        if status and status != 'all':
-            queryset = queryset.filter(status_id=status)
-
-        # Фильтрация по типу операции
-        type_id = request.GET.get('type')
-        if type_id and type_id != 'all':
-            queryset = queryset.filter(type_id=type_id)
-
-        # Фильтрация по категории
-        category_id = request.GET.get('category')
-        if category_id and category_id != 'all':
-            queryset = queryset.filter(category_id=category_id)
-
-        return queryset.order_by('-date')
+        self.filters = get_filters(self.request.GET)
+        queryset = apply_filters(queryset, self.filters).order_by('-date', '-pk')
+        self.archive_boundary = archive.boundary()
+
+        if archive.reaches(self.filters, self.archive_boundary):
+            return archive.ChainedRows(queryset, archive.rows(self.filters).order_by('-date', '-pk'))
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Пагинация по ключам (дата, id), затем строки страницы с running_balance.
+
+        Оконная функция проходит только по строкам от самой старой строки
+        страницы до самой новой и начинается с остатка перед самой старой:
+        его дают контрольные точки или итоги закрытых месяцев, поэтому
+        глубокие страницы не пересчитывают всю историю.
+        """
+        parts = queryset.parts if isinstance(queryset, archive.ChainedRows) else [queryset]
+        keys = archive.ChainedRows(*(part.values_list('date', 'pk') for part in parts))
+        paginator, page, keys, is_paginated = super().paginate_queryset(keys, page_size)
+        page.object_list = self.get_page_rows(parts, list(keys))
+        return paginator, page, page.object_list, is_paginated
+
+    def get_page_rows(self, parts, keys):
+        """Строки страницы между ключами keys (новые сверху) с нарастающим остатком"""
+        if not keys:
+            return []
+        (last_date, last_pk), (first_date, first_pk) = keys[0], keys[-1]
+        opening = self.get_balance_before(first_date, first_pk)
+        rows = []
+        # Части от старых строк к новым: остаток архивной части переходит в горячую
+        for part in reversed(parts):
+            page_part = part.filter(
+                Q(date__gt=first_date) | Q(pk__gte=first_pk),
+                Q(date__lt=last_date) | Q(pk__lte=last_pk),
+                date__range=[first_date, last_date],
+            )
+            part_rows = list(balances.with_running_balance(page_part, opening).order_by('-date', '-pk'))
+            if part_rows:
+                opening = part_rows[0].running_balance
+            rows = part_rows + rows
+        return rows
+
+    def get_balance_before(self, day, pk):
+        """Остаток по выбранным справочникам перед операцией (day, pk)"""
+        balance = balances.filtered_balance_as_of(self.filters, day - timedelta(days=1))
+        # Операции одного дня - все в горячих строках или все в архиве
+        model = ArchivedCashFlow if self.archive_boundary and day <= self.archive_boundary else CashFlowRow
+        same_day = apply_filters(model.objects.filter(date=day, pk__lt=pk), self.filters, dates=False)
+        return balance + balances.total(same_day)
 
     def get_context_data(self, **kwargs):
         """Добавление данных для фильтров в контекст"""
         context = super().get_context_data(**kwargs)
-        context['statuses'] = Status.objects.all()
-        context['types'] = Type.objects.all()
-        context['categories'] = Category.objects.all()
+        # В фильтрах выводятся только выбранные записи, остальные подгружает поиск.
+        # Ленивые querysets: при попадании в кэш фрагмента фильтров не выполняются
+        filters = get_filters(self.request.GET)
+        for key, model in (('statuses', Status), ('types', Type), ('categories', Category)):
+            pk = filters[model._meta.model_name]
+            context[key] = model.objects.filter(pk=pk) if pk else model.objects.none()
         
         # Сохранение текущих параметров фильтрации
         context['current_filters'] = {
@@ -324,15 +419,46 @@ class CashFlowListView(ListView):
             'type': self.request.GET.get('type', 'all'),
             'category': self.request.GET.get('category', 'all'),
         }
+
+        # Параметры фильтрации для ссылок пагинации (вычисляются один раз)
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        context['pagination_query'] = f'&{query.urlencode()}' if query else ''
+
+        context.update(caching.fragment_cache_context())
+        # Курсор журнала на момент отрисовки: с него страница получает изменения
+        context['live_cursor'] = live.last_seq()
+        # Подсказка, что старые операции видны только при фильтре по периоду
+        if self.archive_boundary and not archive.reaches(filters, self.archive_boundary):
+            context['archive_boundary'] = self.archive_boundary
         return context
 
+def _form_errors_to_messages(request, form):
+    """Вывод ошибок валидации формы через сообщения"""
+    for field, errors in form.errors.items():
+        for error in errors:
+            messages.error(request, str(error))
+
+def _closed_period_redirect(request, cashflow):
+    """Редирект на список, если операция относится к закрытому месяцу"""
+    if periods.is_closed(cashflow.date):
+        messages.error(request, f'Период {cashflow.date:%m.%Y} закрыт, изменения в нем запрещены')
+        return redirect('index')
+    return None
+
+def _overspent_messages(request, cashflow):
+    """Предупреждения о бюджетах, превышенных операцией"""
+    for budget in budgets.overspent(cashflow):
+        messages.warning(request, f'Бюджет "{budget}" превышен: {budget.actual} из {budget.amount} ₽')
+
 def create_cashflow(request):
     """Создание новой денежной операции (функциональное представление)"""
     if request.method == 'POST':
         form = CashFlowForm(request.POST)
         if form.is_valid():
-            form.save()
+            _overspent_messages(request, form.save())
             return redirect('index')
+        _form_errors_to_messages(request, form)
     else:
         form = CashFlowForm()
     
@@ -341,11 +467,15 @@ def create_cashflow(request):
 def edit_cashflow(request, pk):
     """Редактирование существующей операции"""
     cashflow = get_object_or_404(CashFlow, pk=pk)
+    closed = _closed_period_redirect(request, cashflow)
+    if closed:
+        return closed
     if request.method == 'POST':
         form = CashFlowForm(request.POST, instance=cashflow)
         if form.is_valid():
-            form.save()
+            _overspent_messages(request, form.save())
             return redirect('index')
+        _form_errors_to_messages(request, form)
     else:
         form = CashFlowForm(instance=cashflow)
     
@@ -359,11 +489,437 @@ def get_subcategories(request):
         return JsonResponse(list(subcategories), safe=False)
     return JsonResponse([], safe=False)
 
+def search_dictionary(request):
+    """
+    Поиск по справочнику для выпадающих списков (typeahead).
+
+    GET /api/dictionaries/search/?model=category&q=мар&limit=20&after=<id>
+    Для подкатегорий можно передать category=<id>.
+    """
+    model = typeahead.SEARCH_MODELS.get(request.GET.get('model'))
+    if model is None:
+        return JsonResponse({'error': 'Неизвестный справочник'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', typeahead.DEFAULT_LIMIT)), 1), typeahead.MAX_LIMIT)
+        after = int(request.GET['after']) if request.GET.get('after') else None
+        category = int(request.GET['category']) if request.GET.get('category') else None
+    except ValueError:
+        return JsonResponse({'error': 'limit, after и category должны быть числами'}, status=400)
+
+    results, next_after = typeahead.search(model, request.GET.get('q', ''), limit, after, category)
+    return JsonResponse({'results': results, 'next': next_after})
+
+def _filtered_rows(request):
+    """
+    Строки списка операций с фильтрами из запроса, новые сверху: горячие
+    и, если период начинается в архиве, архивные.
+    """
+    filters = get_filters(request.GET)
+    parts = [apply_filters(CashFlowRow.objects.all(), filters)]
+    if archive.reaches(filters):
+        parts.append(archive.rows(filters))
+    return [part.order_by('-date', '-pk') for part in parts]
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает записанную строку"""
+    def write(self, value):
+        return value
+
+EXPORT_COLUMNS = [
+    ('ID', 'pk'),
+    ('Дата', 'date'),
+    ('Статус', 'status_name'),
+    ('Тип', 'type_name'),
+    ('Категория', 'category_name'),
+    ('Подкатегория', 'subcategory_name'),
+    ('Сумма', 'amount'),
+    ('Комментарий', 'comment_excerpt'),
+]
+
+def export_cashflows(request):
+    """
+    Экспорт операций в CSV с фильтрами списка.
+
+    Потоковая выдача: строки читаются из CashFlowRow (и архива) порциями,
+    весь файл в памяти не собирается.
+    """
+    writer = csv.writer(_Echo(), delimiter=';')
+    fields = [field for _, field in EXPORT_COLUMNS]
+    rows = archive.ChainedRows(*(part.values_list(*fields) for part in _filtered_rows(request)))
+
+    def generate():
+        yield '\ufeff'  # BOM для корректного открытия в Excel
+        yield writer.writerow([title for title, _ in EXPORT_COLUMNS])
+        for row in rows.iterator(chunk_size=2000):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(generate(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="cashflows.csv"'
+    return response
+
+def get_cashflows(request):
+    """
+    Список операций в JSON с фильтрами списка.
+
+    GET /api/cashflows/?limit=100&offset=0&date_from=...&status=...
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 1000)
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except ValueError:
+        return JsonResponse({'error': 'limit и offset должны быть числами'}, status=400)
+
+    fields = [field for _, field in EXPORT_COLUMNS]
+    rows = archive.ChainedRows(*(part.values(*fields) for part in _filtered_rows(request)))
+    rows = rows[offset:offset + limit]
+    for row in rows:
+        row['id'] = row.pop('pk')
+        row['amount'] = str(row['amount'])
+    return JsonResponse({'results': rows, 'limit': limit, 'offset': offset})
+
+def get_changes(request):
+    """
+    Лента изменений операций и справочников после курсора.
+
+    GET /api/changes/?cursor=0&limit=500
+    Следующий запрос делается с cursor=next_cursor, пока has_more истинно.
+    Если журнал очищен дальше курсора, возвращается 410 - нужна полная выгрузка.
+    """
+    try:
+        cursor = max(int(request.GET.get('cursor', 0)), 0)
+        limit = min(max(int(request.GET.get('limit', 500)), 1), 5000)
+    except ValueError:
+        return JsonResponse({'error': 'cursor и limit должны быть числами'}, status=400)
+
+    oldest = changefeed.oldest_cursor()
+    if cursor < oldest:
+        return JsonResponse({
+            'error': 'Журнал изменений очищен, требуется полная выгрузка',
+            'oldest_cursor': oldest,
+        }, status=410)
+
+    changes, next_cursor, has_more = changefeed.read(cursor, limit)
+    return JsonResponse({'changes': changes, 'next_cursor': next_cursor, 'has_more': has_more})
+
+async def live_events(request):
+    """
+    Поток изменений для страницы операций (Server-Sent Events).
+
+    GET /api/live/?cursor=<курсор страницы>; при переподключении браузер
+    сам передает Last-Event-ID. Под WSGI поток не поддерживается: ответ 204
+    останавливает переподключения EventSource.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    cursor = int(cursor) if cursor and cursor.isdigit() else None
+
+    response = StreamingHttpResponse(live.stream(request.organization, cursor), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Отключение буферизации в nginx
+    return response
+
+def get_balance(request):
+    """
+    Остаток на конец указанной даты (по умолчанию - на сегодня).
+
+    GET /api/balance/?date=ГГГГ-ММ-ДД
+    """
+    as_of = date.today()
+    if request.GET.get('date'):
+        as_of = parse_date(request.GET['date'])
+        if as_of is None:
+            return JsonResponse({'error': 'Дата должна быть в формате ГГГГ-ММ-ДД'}, status=400)
+
+    balance, base_date = balances.balance_as_of(as_of)
+    return JsonResponse({
+        'date': as_of.isoformat(),
+        'balance': str(balance),
+        'checkpoint': base_date.isoformat() if base_date else None,
+    })
+
 def delete_cashflow(request, pk):
-    """Удаление денежной операции"""
+    """Удаление денежной операции (в корзину)"""
     cashflow = get_object_or_404(CashFlow, pk=pk)
+    closed = _closed_period_redirect(request, cashflow)
+    if closed:
+        return closed
     if request.method == 'POST':
-        cashflow.delete()
+        try:
+            services.delete_cashflows(CashFlow.objects.filter(pk=cashflow.pk))
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            messages.success(request, 'Операция удалена. Восстановить ее можно в корзине')
         return redirect('index')
     
-    return render(request, 'cash_flow/delete.html', {'cashflow': cashflow})
\ No newline at end of file
+    return render(request, 'cash_flow/delete.html', {'cashflow': cashflow})
+
+
+# ======================== КОРЗИНА ========================
+class TrashView(ListView):
+    """
+    Удаленные записи: операции (постранично) и записи справочников.
+
+    Хранятся до запуска purge_deleted; отсюда их можно восстановить.
+    """
+    template_name = 'cash_flow/trash.html'
+    context_object_name = 'cashflows'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return (CashFlow.all_objects.filter(deleted_at__isnull=False)
+                .select_related('status', 'type', 'category', 'subcategory')
+                .order_by('-deleted_at', '-pk'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['dictionaries'] = [
+            (model._meta.model_name, label,
+             model.all_objects.filter(deleted_at__isnull=False).order_by('-deleted_at'))
+            for model, label in ((Status, 'Статусы'), (Type, 'Типы'),
+                                 (Category, 'Категории'), (SubCategory, 'Подкатегории'))
+        ]
+        return context
+
+@require_POST
+def restore_deleted(request, model_name, pk):
+    """Восстановление записи из корзины (для справочника - с удаленными вместе с ней операциями)"""
+    model = changefeed.FEED_MODELS.get(model_name)
+    if model is None:
+        raise Http404
+    instance = get_object_or_404(model.all_objects.filter(deleted_at__isnull=False), pk=pk)
+    try:
+        restored = services.restore(instance)
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
+    else:
+        messages.success(request, f'Запись "{instance}" восстановлена, восстановлено операций: {restored}')
+    return redirect('trash')
+
+
+# ======================== ЗАКРЫТИЕ ПЕРИОДОВ ========================
+class ClosedPeriodListView(ListView):
+    """Список закрытых месяцев с закрытием следующего"""
+    model = ClosedPeriod
+    template_name = 'cash_flow/periods.html'
+    context_object_name = 'periods'
+    paginate_by = 24
+
+    def get_context_data(self, **kwargs):
+        """Следующий месяц для закрытия"""
+        context = super().get_context_data(**kwargs)
+        context['next_month'] = periods.next_month_to_close()
+        return context
+
+@require_POST
+def close_period(request):
+    """Закрытие следующего по порядку месяца"""
+    month = periods.next_month_to_close()
+    if month is None:
+        messages.error(request, 'Нет операций в открытых периодах')
+        return redirect('periods')
+    try:
+        period = periods.close_month(month)
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
+    else:
+        messages.success(request, f'Период {period} закрыт, остаток {period.closing_balance} ₽')
+    return redirect('periods')
+
+@require_POST
+def reopen_period(request):
+    """Открытие последнего закрытого месяца"""
+    try:
+        month = periods.reopen_last()
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
+    else:
+        messages.success(request, f'Период {month:%m.%Y} открыт')
+    return redirect('periods')
+
+
+# ======================== ОТЧЕТЫ ========================
+def report_totals(request):
+    """
+    Итоги пополнений и списаний в разрезе справочника.
+
+    GET /api/report/totals/?group_by=category&date_from=...&date_to=...
+    Принимает те же фильтры, что и список операций. group_by - один
+    или несколько разрезов через запятую (status, type, category, subcategory).
+    """
+    group_by = [g for g in request.GET.get('group_by', 'category').split(',') if g]
+    if not group_by or any(g not in reports.DIMENSIONS for g in group_by):
+        return JsonResponse(
+            {'error': f'group_by: допустимые значения {", ".join(reports.DIMENSIONS)}'}, status=400)
+
+    rows = reports.totals(get_filters(request.GET), group_by)
+    for row in rows:
+        for key in ('income', 'expense', 'balance'):
+            row[key] = str(row[key])
+    return JsonResponse({'group_by': group_by, 'rows': rows})
+
+PIVOT_DIMENSIONS = ('category', 'subcategory')
+
+def _pivot_dimension(request):
+    """Разрез строк матрицы из параметра rows (по умолчанию - категории)"""
+    dimension = request.GET.get('rows', 'category')
+    return dimension if dimension in PIVOT_DIMENSIONS else None
+
+def report_pivot(request):
+    """
+    Матрица "категория (подкатегория) x месяц" с пополнениями и списаниями.
+
+    GET /api/report/pivot/?rows=category|subcategory&format=json|csv и фильтры списка.
+    """
+    dimension = _pivot_dimension(request)
+    if dimension is None:
+        return JsonResponse({'error': 'rows: допустимые значения category, subcategory'}, status=400)
+    data = reports.pivot(get_filters(request.GET), dimension)
+    months = [f'{month:%Y-%m}' for month in data['months']]
+
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="pivot_{dimension}.csv"'
+        response.write('\ufeff')  # BOM для корректного открытия в Excel
+        writer = csv.writer(response, delimiter=';')
+        header = ['Категория' if dimension == 'category' else 'Подкатегория']
+        for month in months:
+            header += [f'{month} пополнения', f'{month} списания']
+        writer.writerow(header + ['Итого пополнения', 'Итого списания'])
+        for line in data['rows'] + [dict(data['totals'], name='Итого')]:
+            cells = [line['name']]
+            for income, expense in zip(line['income'], line['expense']):
+                cells += [income, expense]
+            writer.writerow(cells + [line['total_income'], line['total_expense']])
+        return response
+
+    def serialize(line):
+        return {
+            **line,
+            'income': [str(value) for value in line['income']],
+            'expense': [str(value) for value in line['expense']],
+            'total_income': str(line['total_income']),
+            'total_expense': str(line['total_expense']),
+        }
+
+    return JsonResponse({
+        'rows_dimension': dimension,
+        'months': months,
+        'rows': [serialize(line) for line in data['rows']],
+        'totals': serialize(data['totals']),
+    })
+
+def pivot_page(request):
+    """HTML-страница матрицы "категория x месяц" с фильтрами списка"""
+    dimension = _pivot_dimension(request) or 'category'
+    data = reports.pivot(get_filters(request.GET), dimension)
+    for line in data['rows'] + [data['totals']]:
+        line['cells'] = list(zip(line['income'], line['expense']))
+    query = request.GET.copy()
+    query.pop('format', None)
+    return render(request, 'cash_flow/pivot.html', {
+        'pivot': data,
+        'dimension': dimension,
+        'query_string': query.urlencode(),
+        'current_filters': {
+            'date_from': request.GET.get('date_from', ''),
+            'date_to': request.GET.get('date_to', ''),
+        },
+    })
+
+
+# ======================== БЮДЖЕТЫ ========================
+def _budget_month(request):
+    """Месяц из параметра month (ГГГГ-ММ), по умолчанию - текущий"""
+    try:
+        return date.fromisoformat(f"{request.GET.get('month', '')}-01")
+    except ValueError:
+        return date.today().replace(day=1)
+
+class BudgetListView(ListView):
+    """
+    Бюджеты месяца: план, факт и остаток.
+
+    Факты хранятся в бюджетах и обновляются при изменении операций -
+    страница читает только строки бюджетов месяца.
+    """
+    template_name = 'cash_flow/budgets.html'
+    context_object_name = 'budgets'
+
+    def get_queryset(self):
+        self.month = _budget_month(self.request)
+        return (
+            Budget.objects.filter(month=self.month, category__deleted_at__isnull=True)
+            .exclude(subcategory__deleted_at__isnull=False)
+            .select_related('category', 'subcategory')
+            .order_by('category__name', 'subcategory__name')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        rows = context['budgets']
+        context.update({
+            'month': self.month,
+            'previous_month': (self.month - timedelta(days=1)).replace(day=1),
+            'next_month': balances.month_end(self.month) + timedelta(days=1),
+            'total_amount': sum((budget.amount for budget in rows), Decimal('0.00')),
+            'total_actual': sum((budget.actual for budget in rows), Decimal('0.00')),
+        })
+        return context
+
+class BudgetFormViewMixin(UniqueNameViewMixin):
+    """Создание и редактирование бюджета: после сохранения - бюджеты его месяца"""
+    model = Budget
+    form_class = BudgetForm
+    template_name = 'cash_flow/budget_form.html'
+    unique_field = None
+
+    def get_success_url(self):
+        return f"{reverse('budgets')}?month={self.object.month:%Y-%m}"
+
+class BudgetCreateView(BudgetFormViewMixin, CreateView):
+    """Новый бюджет (месяц - из параметра month)"""
+
+    def get_initial(self):
+        return {'month': _budget_month(self.request)}
+
+class BudgetUpdateView(BudgetFormViewMixin, UpdateView):
+    """Изменение бюджета: факт пересчитывается при сохранении"""
+
+class BudgetDeleteView(DeleteView):
+    """Удаление бюджета"""
+    model = Budget
+    template_name = 'cash_flow/budget_delete.html'
+
+    def get_success_url(self):
+        return f"{reverse('budgets')}?month={self.object.month:%Y-%m}"
+
+
+# ======================== ОРГАНИЗАЦИИ ========================
+@require_POST
+def select_organization(request):
+    """Выбор организации для сайта (хранится в сессии)"""
+    organization = get_object_or_404(Organization, slug=request.POST.get('organization'))
+    request.session[tenancy.SESSION_KEY] = organization.slug
+    messages.success(request, f'Выбрана организация "{organization}"')
+    return redirect('index')
+
+
+# ======================== ПРОФИЛИРОВАНИЕ ========================
+@staff_member_required
+def profile_list(request):
+    """Сохраненные профили запросов (для сотрудников)"""
+    return render(request, 'cash_flow/profiles.html', {
+        'profiles': profiling.list_profiles(),
+        'enabled': profiling.is_enabled(),
+        'parameter': profiling.PROFILE_PARAMETER,
+    })
+
+@staff_member_required
+def download_profile(request, name, kind):
+    """Скачивание профиля (.prof) или отчета (.txt)"""
+    path = profiling.profile_path(name, kind)
+    if path is None:
+        raise Http404
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)